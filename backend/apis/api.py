@@ -1,34 +1,52 @@
+import base64
+import csv
+import hashlib
+import io
+import itertools
 import json
 import os
-import re
 import socket
+import tempfile
 import time
 import uuid
 from functools import wraps
 from pathlib import Path
 
-import joblib
 from google.auth.transport import requests as googl
 from configs import configurations
-from flask import Flask, jsonify, request, redirect, send_file, url_for, session, make_response
+from flask import Flask, jsonify, request, redirect, send_file, url_for, session, make_response, Response, \
+    stream_with_context
 from flask_wtf.csrf import CSRFProtect, generate_csrf
-from nltk.stem import PorterStemmer
 from google.oauth2 import id_token
 from flask_cors import CORS
-from apis.model import App
+from apis.model import App, read_texts
+from classes.db_providers.sqlite_pool import default_max_connections
 from classes.db_providers.sqlite_provider import SQLiteProvider
+from classes.db_providers.temp_provider import TempProvider
+from classes.jobQueue import JobQueue, finished_statuses, interrupted_constant, worker_exited_constant
+from classes.modelCache import model_cache
+from classes.modelRegistry import model_registry, default_interval
+from classes.modelStorage import ModelStorage
+from classes.sessionCache import session_cache
+from classes.visualizationCache import visualization_cache
+from classes.textPreprocessing import preprocess_text
 
 data = None
 global visualize_option
 model_directory = None
 model_route_constant = '/model'
+batch_mimetypes = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+visualization_mimetypes = {'svg': 'image/svg+xml', 'json': 'application/json'}
+db_providers = ('sqlite', 'memory')
+models_page_size = 100
+max_models_page_size = 1000
 
 def get_flow(secure, address, port):
     return configurations.google_flow(f"{'https://' if secure else 'http://'}{address}:{port}")
 
 def make_pipeline(model_path):
     if check_path(model_path):
-        pipeline = joblib.load(model_path)
+        pipeline = model_cache.get(model_path)
         from sklearn.svm import SVR
         if 'model' in pipeline.named_steps and isinstance(pipeline.named_steps['model'], SVR):
             print(' ! Attention: This model will not be able to visualize the model, so the /visualize GET '
@@ -36,6 +54,14 @@ def make_pipeline(model_path):
         return pipeline
 
 
+def make_provider(db_provider, db_pool_size=default_max_connections):
+    if db_provider == 'sqlite':
+        return SQLiteProvider(db_file='sqlite.db', max_connections=db_pool_size)
+    if db_provider == 'memory':
+        return TempProvider()
+    raise ValueError(f"Database provider must be one of {', '.join(db_providers)}.")
+
+
 def protect(app, app_ref):
     csrf = CSRFProtect(app)
     csrf.init_app(app)
@@ -89,10 +115,7 @@ def text_preprocessing():
     text = request.args.get("text", "").lower()
     if text == "" or text is None:
         raise ValueError("No text provided")
-    stemmer = PorterStemmer()
-    text = ' '.join(
-        [stemmer.stem(word) for word in re.sub(r'[!"#$%&\'()*+,-./:;<=>?@[\\]^_`{|}~]]', '', text.lower()).split()])
-    return text
+    return preprocess_text(text)
 
 
 def validate_data(host, port):
@@ -126,7 +149,90 @@ def validate_data(host, port):
         raise ValueError("Invalid port")
 
 
-def create_app(address: str, port: int, model_dir='./tmp', secure=False) -> Flask:
+def prepare_workers(model_dir='./tmp', model_cache_size: int = None, db_provider: str = 'sqlite',
+                    preload: str = 'all'):
+    """
+    Prepares the parent process of a pre-forked server before it forks the workers running create_app. The training jobs
+    left unfinished by a previous server are marked as failed once, as the workers share the jobs, and the models are
+    preloaded, so the workers share their pages instead of loading them each.
+
+    Parameters
+    ----------
+    model_dir : str, optional
+        The directory the models are saved in. Default is './tmp'.
+    model_cache_size : int, optional
+        Memory budget of the model cache in bytes. Default is the budget of the model cache.
+    db_provider : str, optional
+        'sqlite' to store the users, models and jobs in sqlite.db. Default is 'sqlite'.
+    preload : str, optional
+        'all' to load every model of the model directory within the budget of the model cache, 'none' to load the
+        models on their first request, or the number of most requested models to load. Default is 'all'.
+
+    Raises
+    ------
+    ValueError
+        If the database provider is not supported or is not shared by the worker processes, or the preload option is
+        not supported.
+    """
+    if db_provider == 'memory':
+        raise ValueError("The memory database provider is not shared by worker processes, use sqlite.")
+    provider = make_provider(db_provider, 1)
+    provider.interrupt_jobs(interrupted_constant)
+    # No connection may be inherited by the workers
+    provider.close()
+    model_dir = fix_dir(model_dir)
+    if model_cache_size is not None:
+        model_cache.resize(model_cache_size)
+    print(f" * Load models from {model_dir} before starting the workers (preload: {preload})")
+    model_registry.load(model_dir, preload=preload)
+
+
+def interrupt_worker_jobs(pid: int, db_provider: str = 'sqlite') -> int:
+    """
+    Marks the training jobs left queued or running by an exited worker process of a pre-forked server as failed.
+
+    Parameters
+    ----------
+    pid : int
+        Process ID of the worker.
+    db_provider : str, optional
+        Database provider shared by the workers. Default is 'sqlite'.
+
+    Returns
+    -------
+    int
+        The number of jobs marked as failed.
+    """
+    provider = make_provider(db_provider, 1)
+    try:
+        interrupted = provider.interrupt_jobs(worker_exited_constant, worker=pid)
+    finally:
+        provider.close()
+    if interrupted:
+        print(f" ! {interrupted} training jobs of worker {pid} were interrupted")
+    return interrupted
+
+
+def stop_app(app: Flask):
+    """
+    Stops the background work of an application created by create_app before its process exits: the model registry
+    stops watching the model directory and saves the model usage, and the training jobs are terminated and marked as
+    failed.
+
+    Parameters
+    ----------
+    app : Flask
+        The Flask application.
+    """
+    model_registry.stop()
+    app.extensions['job_queue'].shutdown()
+
+
+def create_app(address: str, port: int, model_dir='./tmp', secure=False, model_cache_size: int = None,
+               job_workers: int = 2, visualization_cache_size: int = None,
+               visualization_cache_dir: str = None, session_ttl: float = None, db_provider: str = 'sqlite',
+               db_pool_size: int = default_max_connections, preload: str = 'all',
+               watch_interval: float = default_interval, worker: bool = False) -> Flask:
     """
     Runs the Flask application for model prediction and visualization.
 
@@ -140,23 +246,66 @@ def create_app(address: str, port: int, model_dir='./tmp', secure=False) -> Flas
         The port to run the application on.
     model_dir : str
         The directory to save the models in.
+    model_cache_size : int, optional
+        Memory budget of the model cache in bytes. Default is the budget of the model cache.
+    job_workers : int, optional
+        Maximum number of background training jobs running at the same time. Default is 2.
+    visualization_cache_size : int, optional
+        Memory budget of the visualization cache in bytes. Default is the budget of the visualization cache.
+    visualization_cache_dir : str, optional
+        Directory of the disk tier of the visualization cache. Default is None, visualizations are only kept in memory.
+    session_ttl : float, optional
+        Number of seconds an authenticated session is cached. 0 disables the session cache. Default is the time to live
+        of the session cache.
+    db_provider : str, optional
+        'sqlite' to store the users, models and jobs in sqlite.db, or 'memory' to keep them in memory, for test runs
+        and stateless nodes. Default is 'sqlite'.
+    db_pool_size : int, optional
+        Maximum number of open SQLite connections shared by the request threads. Default is 8.
+    preload : str, optional
+        'all' to load every model of the model directory in the background at startup, within the budget of the model
+        cache, 'none' to load the models on their first request, or the number of most requested models to load.
+        Default is 'all'.
+    watch_interval : float, optional
+        Number of seconds between two scans of the model directory for added, replaced and deleted model files, 0 to
+        disable the scans. Default is 5.
+    worker : bool, optional
+        Whether the application runs in a worker process of a pre-forked server, prepared by prepare_workers. The
+        training jobs are then shared with the other workers. Default is False.
 
     Returns
     -------
     Flask
         The Flask application.
+
+    Raises
+    ------
+    ValueError
+        If the database provider or the preload option is not supported.
     """
     model_dir = fix_dir(model_dir)
-    print(" * Load model...")
+    if model_cache_size is not None:
+        model_cache.resize(model_cache_size)
+    print(f" * Load models from {model_dir} in the background (preload: {preload})")
+    model_registry.start(model_dir, preload=preload, interval=watch_interval)
+    visualization_cache.configure(max_bytes=visualization_cache_size, directory=visualization_cache_dir)
+    session_cache.configure(ttl=session_ttl)
     app_ref = configurations.get_ref()
     validate_data(host=address, port=port)
     print(f" * Running on {address}:{port}")
     global data
-    data = SQLiteProvider(db_file='sqlite.db')
+    data = make_provider(db_provider, db_pool_size)
+    jobs = JobQueue(data, max_workers=job_workers, shared=worker)
     app = Flask(__name__)
     os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
     model = App()
     app = protect(app, app_ref)
+    app.extensions['job_queue'] = jobs
+
+    @app.teardown_appcontext
+    def release_connection(exception):
+        # Returns the database connection checked out by the request to the pool
+        data.close_connection()
 
     @app.after_request
     def add_headers(response):
@@ -169,6 +318,20 @@ def create_app(address: str, port: int, model_dir='./tmp', secure=False) -> Flas
     def index():
         return "There is nothing here", 200
 
+    @app.route("/ready")
+    def ready():
+        """
+        Responds to a GET request to check whether the models were preloaded, for load balancers to only route
+        requests to warm nodes. The request needs no login, so the response does not identify the loaded models.
+
+        Returns
+        -------
+        JSON
+            Whether the node is ready, with status 200 once the models were preloaded and 503 before.
+        """
+        ready = model_registry.ready
+        return jsonify({"ready": ready}), 200 if ready else 503
+
     @app.route("/profile_info")
     def profile():
         if auth_check():
@@ -215,6 +378,8 @@ def create_app(address: str, port: int, model_dir='./tmp', secure=False) -> Flas
 
     @app.route("/logout")
     def logout():
+        if 'user_id' in request.cookies:
+            session_cache.invalidate(request.cookies['user_id'])
         response = make_response(app_ref)
         response.set_cookie('user_id', '', expires=0, secure=secure, httponly=not secure)
         session.clear()
@@ -250,6 +415,46 @@ def create_app(address: str, port: int, model_dir='./tmp', secure=False) -> Flas
         result = model.predict(model_path_user, text)
         return jsonify({"prediction": str(result), "text": str(text)}), 200
 
+    @app.route(f"{model_route_constant}/predict/batch", methods=["POST"])
+    @handle_exceptions
+    @login_is_required
+    def predict_batch():
+        """
+        Responds to a POST request to predict the classes of many texts at once. The texts are sent as a JSON array,
+        as NDJSON or as an uploaded CSV dataset, and the predictions are streamed back as NDJSON or CSV.
+
+        Returns
+        -------
+        NDJSON or CSV
+            A stream of rows containing the index, the text and the predicted class. An invalid item after the first
+            chunk ends the stream with an error row.
+
+        Raises
+        ------
+        ValueError
+            If params are not valid.
+        FileNotFoundError
+            If the model is not found.
+        Exception
+            Error in the backend.
+        """
+        params = [['model', '', str],
+                  ['x', 'text', str],
+                  ['chunk_size', 1000, int],
+                  ['output_format', 'ndjson', str]]
+        params = get_params(params)
+        if params['output_format'] not in batch_mimetypes:
+            raise ValueError(f"Output format must be one of: {', '.join(batch_mimetypes)}")
+        model_path_user = validate_and_set_model_path(model_dir, params['model'])
+        texts = batch_texts(params['x'], params['chunk_size'])
+        results = model.predict_batch(model_path_user, texts, params['chunk_size'])
+        # The first chunk is predicted before the headers are sent, so an invalid stream is still reported as an error
+        first = next(results, None)
+        if first is not None:
+            results = itertools.chain([first], results)
+        return Response(stream_with_context(format_batch(results, params['output_format'])),
+                        mimetype=batch_mimetypes[params['output_format']]), 200
+
     @app.route(f"{model_route_constant}/visualize", methods=["GET"])
     @handle_exceptions
     @login_is_required
@@ -259,8 +464,8 @@ def create_app(address: str, port: int, model_dir='./tmp', secure=False) -> Flas
 
         Returns
         -------
-        HTML
-            An HTML string containing the visualization.
+        HTML, SVG or JSON
+            The visualization, a base64 encoded PNG for the image output format.
 
         Raises
         ------
@@ -274,12 +479,15 @@ def create_app(address: str, port: int, model_dir='./tmp', secure=False) -> Flas
         params = [['model', '', str],
                   ['features', 40, int],
                   ['text', '', str],
-                  ['output_format', 'image', str]]
+                  ['output_format', 'image', str],
+                  ['explainer', 'auto', str]]
         params = get_params(params)
         model_name = params['model']
         model_path_user = validate_and_set_model_path(model_dir, model_name)
-        return model.visualize(model_path=model_path_user, text=params['text'].lower(),
-                               num_features=params['features'], output_format=params['output_format']), 200
+        visualization = model.visualize(model_path=model_path_user, text=params['text'].lower(),
+                                        num_features=params['features'], output_format=params['output_format'],
+                                        explainer=params['explainer'])
+        return Response(visualization, mimetype=visualization_mimetypes.get(params['output_format'], 'text/html')), 200
 
     @app.route(f"{model_route_constant}/train", methods=["POST"])
     @handle_exceptions
@@ -291,7 +499,9 @@ def create_app(address: str, port: int, model_dir='./tmp', secure=False) -> Flas
         Returns
         -------
         String
-            A string containing the result of the training process: Accuracy, F1 score and link to download the model.
+            A string containing the result of the training process: Accuracy, F1 score, metrics of every fold and link
+            to download the model. With the background parameter, the training is queued as a job and the response
+            contains the job UUID and the link to its status.
 
         Raises
         ------
@@ -311,20 +521,103 @@ def create_app(address: str, port: int, model_dir='./tmp', secure=False) -> Flas
                   ['kfold', 1, int],
                   ['test_size', 0, float],
                   ['model', 'SVC', str],
-                  ['vectorizer', 'TfidfVectorizer', str]]
+                  ['vectorizer', 'TfidfVectorizer', str],
+                  ['cache_transformers', 'false', str],
+                  ['kfold_jobs', 1, int],
+                  ['streaming', 'false', str],
+                  ['background', 'false', str]]
         params = get_params(params)
         print(params)
-        model_file, accuracy, f1 = model.train_model(dataset=dataset, x=params['x'], y=params['y'],
-                                                     kfold=params['kfold'], test_size=params['test_size'],
-                                                     model=params['model'], vectorizer=params['vectorizer'])
+        train_params = {'x': params['x'], 'y': params['y'], 'kfold': params['kfold'],
+                        'test_size': params['test_size'], 'model': params['model'],
+                        'vectorizer': params['vectorizer'], 'kfold_jobs': params['kfold_jobs'],
+                        'cache_transformers': ts_bool(params['cache_transformers']),
+                        'streaming': ts_bool(params['streaming'])}
         model_file_name = generate_uuid()
         download_link = url_for('download', model_name=model_file_name, _external=True)
-        os.makedirs(model_dir, exist_ok=True)
-        joblib.dump(model_file, f'{model_dir}/{model_file_name}.mdl')
         global data
         user_id = get_user_id()
+        if ts_bool(params['background']):
+            return submit_training_job(user_id, params['name'], train_params, dataset, model_file_name,
+                                       download_link)
+        folds = []
+        model_file, accuracy, f1 = model.train_model(dataset=dataset, **train_params, on_fold=folds.append)
+        ModelStorage.save(model_file, f'{model_dir}/{model_file_name}.mdl')
         data.add_model(user_id, model_file_name, params['name'], False)
-        return jsonify({"accuracy": accuracy, "f1": f1, 'link': download_link}), 200
+        return jsonify({"accuracy": accuracy, "f1": f1, 'folds': folds, 'link': download_link}), 200
+
+    def submit_training_job(user_id, name, train_params, dataset, model_file_name, download_link):
+        """
+        Queues a training job for an uploaded dataset and responds with the job UUID and the link to its status.
+        """
+        fd, dataset_path = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        dataset.save(dataset_path)
+        model_path = build_tmp_path(model_file_name, model_dir)
+
+        def on_success(_):
+            data.add_model(user_id, model_file_name, name, False)
+            return {'model': model_file_name, 'link': download_link}
+
+        job = jobs.submit(user_id, {'name': name, **train_params}, train_params, dataset_path, model_path, on_success)
+        status_link = url_for('job_status', job_uuid=job['uuid'], _external=True)
+        return jsonify({"job": job['uuid'], "status": job['status'], "link": status_link}), 202
+
+    @app.route(f"{model_route_constant}/jobs", methods=["GET"])
+    @handle_exceptions
+    @login_is_required
+    def get_jobs():
+        """
+        Responds to a GET request to get the user's training jobs.
+
+        Returns
+        -------
+        JSON
+            A JSON object containing the user's training jobs, the most recent first.
+        """
+        return jsonify({"jobs": [job_progress(job) for job in data.get_jobs(get_user_id())]}), 200
+
+    @app.route(f"{model_route_constant}/jobs/<job_uuid>", methods=["GET"])
+    @handle_exceptions
+    @login_is_required
+    def job_status(job_uuid):
+        """
+        Responds to a GET request to get the status of a training job.
+
+        Returns
+        -------
+        JSON
+            A JSON object containing the status, progress, metrics of the evaluated folds and result of the job.
+
+        Raises
+        ------
+        ValueError
+            If the job is not found.
+        """
+        return jsonify(job_progress(get_job(job_uuid))), 200
+
+    @app.route(f"{model_route_constant}/jobs/<job_uuid>", methods=["DELETE"])
+    @handle_exceptions
+    @login_is_required
+    def cancel_job(job_uuid):
+        """
+        Responds to a DELETE request to cancel a queued or running training job.
+
+        Returns
+        -------
+        JSON
+            A JSON object containing the result of the cancellation.
+
+        Raises
+        ------
+        ValueError
+            If the job is not found or already finished.
+        """
+        job = get_job(job_uuid)
+        if job['status'] in finished_statuses:
+            raise ValueError(f"Job {job_uuid} is already {job['status']}")
+        jobs.cancel(job_uuid)
+        return jsonify({"result": f"Job {job_uuid} cancelled"}), 200
 
     @app.route(f"{model_route_constant}/download/<model_name>", methods=["GET"])
     @handle_exceptions
@@ -417,6 +710,9 @@ def create_app(address: str, port: int, model_dir='./tmp', secure=False) -> Flas
         model_path_user = build_tmp_path(model_uuid, model_dir)
         # if not model_path_user or not os.path.exists(model_path_user):
         #     return jsonify({"FileNotFoundError": f"Model {model_uuid} not found"}), 404
+        # The cached model is dropped first, since a memory-mapped file cannot be removed on Windows while it is open
+        model_cache.invalidate(model_path_user)
+        visualization_cache.invalidate(model_path_user)
         os.remove(model_path_user)
         global data
         data.remove_model(request.cookies['user_id'], model_uuid)
@@ -427,12 +723,13 @@ def create_app(address: str, port: int, model_dir='./tmp', secure=False) -> Flas
     @login_is_required
     def get_models():
         """
-        Responds to a GET request to get the user's models.
+        Responds to a GET request to get a page of the user's and the shared models, ordered by name.
 
         Returns
         -------
         JSON
-            A JSON object containing the user's models.
+            A JSON object containing the page of models and the cursor of the next page, null on the last page. The
+            response carries an ETag, and a request whose If-None-Match matches it gets an empty 304 response.
 
         Raises
         ------
@@ -445,9 +742,21 @@ def create_app(address: str, port: int, model_dir='./tmp', secure=False) -> Flas
 
         """
         global data
-        user_id = request.cookies['user_id']
-        user_models = data.get_models(user_id, True)
-        return jsonify({"models": user_models}), 200
+        params = [['limit', models_page_size, int],
+                  ['cursor', '', str],
+                  ['prefix', '', str]]
+        params = get_params(params)
+        limit = params['limit']
+        if not 1 <= limit <= max_models_page_size:
+            raise ValueError(f'Parameter limit must be between 1 and {max_models_page_size}')
+        cursor = decode_cursor(params['cursor']) if params['cursor'] else None
+        # One more model than the page tells whether there is a next page
+        user_models = data.get_models(get_user_id(), True, limit + 1, cursor, params['prefix'])
+        next_cursor = encode_cursor(user_models[limit - 1]) if len(user_models) > limit else None
+        response = jsonify({"models": user_models[:limit], "next_cursor": next_cursor})
+        response.set_etag(hashlib.sha256(response.get_data()).hexdigest())
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
 
     @app.route(f"{model_route_constant}/list/user", methods=["GET"])
     @handle_exceptions
@@ -526,16 +835,37 @@ def create_app(address: str, port: int, model_dir='./tmp', secure=False) -> Flas
         model_name = params['model_name']
         check_files({'file': file, 'name': 'Model'}, {'file': model_name, 'name': 'Model name'})
         try:
-            pipeline = joblib.load(file)
+            pipeline = ModelStorage.load(file)
         except Exception as e:
             print(e)
             return jsonify({"ValueError": "File is not a model"}), 400
         model_uuid = str(generate_uuid())
         model_path_user = build_tmp_path(model_uuid, model_dir)
-        joblib.dump(pipeline, model_path_user)
+        ModelStorage.save(pipeline, model_path_user)
+        model_cache.invalidate(model_path_user)
+        visualization_cache.invalidate(model_path_user)
         data.add_model(user_id, model_uuid, model_name, params['shared'])
         return jsonify({"result": f"Model {model_name} uploaded"}), 200
 
+    @app.route(f"{model_route_constant}/cache", methods=["GET"])
+    @handle_exceptions
+    @login_is_required
+    def cache_stats():
+        """
+        Responds to a GET request to get the statistics of the model, visualization and session caches, of the model
+        registry and of the database.
+
+        Returns
+        -------
+        JSON
+            A JSON object containing the hit and miss counts, hit rate and usage of the model, visualization and
+            session caches, the readiness and number of loaded and failed models of the model registry, and the
+            connection pool usage and wait times of the database.
+        """
+        return jsonify({"model_cache": model_cache.stats(), "visualization_cache": visualization_cache.stats(),
+                        "session_cache": session_cache.stats(), "model_registry": model_registry.stats(),
+                        "database": data.stats()}), 200
+
     return app
 
 
@@ -568,6 +898,163 @@ def get_params(params: list) -> dict | None:
     return new_params
 
 
+def get_job(job_uuid: str) -> dict:
+    """
+    Gets a training job of the user
+
+    Parameters
+    ----------
+    job_uuid : str
+        UUID of the job.
+
+    Returns
+    -------
+    dict
+        The job
+
+    Raises
+    ------
+    ValueError
+        If the job is not found
+    """
+    job = data.get_job(get_user_id(), job_uuid)
+    if job is None:
+        raise ValueError(f"Job {job_uuid} not found")
+    return job
+
+
+def job_progress(job: dict) -> dict:
+    """
+    Adds the share of evaluated folds to a training job
+    """
+    kfold = job['params'].get('kfold', 1) if job['params'].get('test_size') else 1
+    job['progress'] = 1.0 if job['status'] == 'succeeded' else len(job['folds']) / kfold
+    return job
+
+
+def encode_cursor(model: dict) -> str:
+    """
+    Encodes the name and UUID of the last model of a page into an opaque cursor
+    """
+    return base64.urlsafe_b64encode(json.dumps([model['name'], model['uuid']]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Decodes a cursor into the name and UUID of the last model of the previous page
+
+    Parameters
+    ----------
+    cursor : str
+        The cursor returned with the previous page
+
+    Returns
+    -------
+    tuple
+        The name and UUID of the model
+
+    Raises
+    ------
+    ValueError
+        If the cursor is not valid
+    """
+    try:
+        name, model_uuid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError('Parameter cursor is not valid')
+    if not isinstance(name, str) or not isinstance(model_uuid, str):
+        raise ValueError('Parameter cursor is not valid')
+    return name, model_uuid
+
+
+def batch_texts(x: str, chunk_size: int):
+    """
+    Gets the texts for a batch prediction from the request
+
+    Parameters
+    ----------
+    x : str
+        Name of the column (or JSON key) containing the text.
+    chunk_size : int
+        Number of rows of an uploaded dataset read at once.
+
+    Returns
+    -------
+    generator
+        Generator of the lowercased texts
+
+    Raises
+    ------
+    ValueError
+        If no texts are provided or they are not valid
+    """
+    dataset = request.files.get('dataset')
+    if dataset:
+        return (text.lower() for text in read_texts(dataset, x, chunk_size))
+    if request.mimetype == batch_mimetypes['ndjson']:
+        return (batch_item(json.loads(line), x) for line in request.stream if line.strip())
+    if request.is_json:
+        items = request.get_json()
+        if not isinstance(items, list):
+            raise ValueError("Texts must be sent as a JSON array")
+        # The array is already in memory, so every item is validated before the predictions are streamed
+        return iter([batch_item(item, x) for item in items])
+    raise ValueError("No texts provided")
+
+
+def batch_item(item, x: str) -> str:
+    """
+    Gets the lowercased text from a JSON item of a batch, which is a string or an object with the text in key x
+    """
+    if isinstance(item, dict):
+        item = item.get(x)
+    if not isinstance(item, str):
+        raise ValueError(f"Each item must be a string or an object with the key {x}")
+    return item.lower()
+
+
+def format_batch(results, output_format: str):
+    """
+    Formats the results of a batch prediction as NDJSON or CSV rows. The status of the response is already sent when
+    the texts of a later chunk turn out to be invalid, so the error ends the stream as a last row instead.
+
+    Parameters
+    ----------
+    results : iterable
+        Iterable of (texts, predictions) tuples.
+    output_format : str
+        Output format, `ndjson` or `csv`.
+
+    Returns
+    -------
+    generator
+        Generator of formatted chunks of rows
+    """
+    index = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if output_format == 'csv':
+        writer.writerow(['index', 'text', 'prediction'])
+    try:
+        for texts, predictions in results:
+            for text, prediction in zip(texts, predictions.tolist()):
+                if output_format == 'csv':
+                    writer.writerow([index, text, prediction])
+                else:
+                    buffer.write(json.dumps({'index': index, 'text': text, 'prediction': prediction}) + '\n')
+                index += 1
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    except ValueError as e:
+        if output_format == 'csv':
+            writer.writerow(['error', str(e), ''])
+        else:
+            buffer.write(json.dumps({'error': str(e)}) + '\n')
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
 def validate_and_set_model_path(model_dir: str, model_name: str = None, ) -> str:
     """
     Checks and sets the model path based on the model name
@@ -661,30 +1148,39 @@ def login_is_required(function):
 def is_token_valid(user_id, online=True):
     try:
         global data
-        user_data = data.get_user_by_uuid(user_id)
         if online:
+            user_data = data.get_user_by_uuid(user_id)
             payload = id_token.verify_oauth2_token(user_data['token'], googl.Request())
             expiration_time = payload.get('exp')
         else:
-            expiration_time = int(user_data['auth_info']['exp'])
+            expiration_time = token_expiry(user_id)
         current_time = int(time.time())
-        return expiration_time > current_time
+        return expiration_time is not None and expiration_time > current_time
     except ValueError:
         return False
 
 
+def token_expiry(user_id):
+    """
+    Returns the token expiry of a user, or None if the user does not exist. The expiry is taken from the session cache,
+    so the user is only read from the database when their session is not cached. An expired cached token is read again,
+    since the user may have logged in through another server worker, whose session cache is separate.
+    """
+    expiration_time = session_cache.get(user_id)
+    if expiration_time is None or expiration_time <= int(time.time()):
+        user_data = data.get_user_by_uuid(user_id)
+        if user_data is None:
+            return None
+        expiration_time = int(user_data['auth_info']['exp'])
+        session_cache.store(user_id, expiration_time)
+    return expiration_time
+
+
 def auth_check():
-    global data
     cookies_data = request.cookies
     if 'user_id' not in cookies_data:
         return False
-    user_id = cookies_data['user_id']
-    if data.get_user_by_uuid(user_id) is None:
-        return False
-
-    if not is_token_valid(user_id, False):
-        return False
-    return True
+    return is_token_valid(cookies_data['user_id'], False)
 
 
 def generate_uuid():
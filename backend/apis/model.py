@@ -1,20 +1,33 @@
-import base64
-import io
+import itertools
 import os
-import re
-from io import StringIO
+import shutil
+import tempfile
+import time
+from collections import deque
 
-import joblib
+import numpy as np
 import pandas as pd
-from matplotlib import pyplot as plt
-from nltk.stem import PorterStemmer
 from tqdm import tqdm
 from werkzeug.datastructures import FileStorage
 
+from classes.corpusCache import corpus_cache
 from classes.customPipeline import CustomPipeline
+from classes.explanationRenderer import ExplanationRenderer
+from classes.linearExplainer import LinearExplainer
+from classes.modelCache import model_cache
+from classes.modelSlimmer import ModelSlimmer
+from classes.modelStorage import ModelStorage
+from classes.textPreprocessing import preprocess_chunks, preprocess_texts, ordered_map, resolve_n_jobs, \
+    default_chunk_size
+from classes.transformerCache import transformer_cache
+from classes.visualizationCache import visualization_cache
 
 tqdm.pandas()
 
+explainers = ('auto', 'exact', 'lime')
+# Number of training texts the predictions of a model are compared on before its coefficients are downcast
+downcast_sample_size = 1000
+
 
 class App:
     """
@@ -24,14 +37,19 @@ class App:
     Methods
     -------
     train_model(dataset: str | FileStorage, x: str = 'text', y: str = 'target', kfold: int = 1, test_size: float = 0
-                save: bool = True, model: str = 'SVC', vectorizer: str = 'TfidfVectorizer') :
+                save: bool = True, model: str = 'SVC', vectorizer: str = 'TfidfVectorizer', n_jobs: int = 1,
+                streaming: bool = False) :
         Trains a machine learning model using the provided dataset and saves it to a file.
     predict(model_path, text) :
         Uses a trained model to make a prediction for a given text input.
-    visualize(model_path, text, class_names: str = 'Mostly unreliable, Mostly reliable', num_features=40) :
+    predict_batch(model_path, texts, chunk_size: int = 1000) :
+        Uses a trained model to make predictions for a stream of text inputs in chunks.
+    predict_file(model_path, dataset, save_to, x: str = 'text', chunk_size: int = 1000, n_jobs: int = 1) :
+        Uses a trained model to make predictions for every text of a dataset and writes them to a CSV file.
+    visualize(model_path, text, num_features=40, output_format: str = 'image', explainer: str = 'auto') :
         Generates an HTML visualization of model predictions for a given text input using LIME (Local Interpretable
-        Model-agnostic Explanations).
-    validate(dataset, model_path, x, y, size) :
+        Model-agnostic Explanations) or the exact contributions of the words for linear models.
+    validate(dataset, model_path, x, y, size, n_jobs: int = 1) :
         Validates the accuracy and f1 of a trained model.
     """
     model_not_found_constant = "Model file not found."
@@ -44,7 +62,9 @@ class App:
 
     @staticmethod
     def train_model(dataset: str | FileStorage, x: str = 'text', y: str = 'target', kfold: int = 1,
-                    test_size: float = 0, model: str = 'SVC', vectorizer: str = 'TfidfVectorizer'):
+                    test_size: float = 0, model: str = 'SVC', vectorizer: str = 'TfidfVectorizer', n_jobs: int = 1,
+                    chunk_size: int = default_chunk_size, cache_transformers: bool = False, kfold_jobs: int = 1,
+                    on_fold=None, streaming: bool = False):
         """
         Trains a machine learning model using the provided dataset and displays accuracy, f1-score.
 
@@ -64,50 +84,52 @@ class App:
             Name of the machine learning model to use. Default is 'SVC'.
         vectorizer : str, optional
             Name of the vectorizer to use. Default is 'TfidfVectorizer'.
+        n_jobs : int, optional
+            Number of worker processes used to preprocess the dataset. -1 uses all CPU cores. Default is 1.
+        chunk_size : int, optional
+            Number of texts preprocessed by a worker at once. Default is 20000.
+        cache_transformers : bool, optional
+            Whether to load fitted vectorizers from the transformer cache when the same vectorizer was already fitted
+            on the same data. Default is False.
+        kfold_jobs : int, optional
+            Number of worker processes fitting the folds in parallel. -1 uses all CPU cores. Default is 1.
+        on_fold : callable, optional
+            Called with the accuracy, f1-score and timing of every fold as soon as it is evaluated.
+        streaming : bool, optional
+            Whether to train out of core, reading the dataset in chunks of chunk_size rows and fitting the model
+            incrementally. It requires the HashingVectorizer and a model supporting partial_fit. Default is False.
 
         Returns
         -------
         Pipeline if save is True, else None
             The best model pipeline if save is True, else None.
 
+        Raises
+        ------
+        ValueError
+            If streaming is requested for a vectorizer or model which cannot be trained incrementally.
+
         Notes
         ------
         This method reads the dataset from the provided path, splits it into training and test sets, and trains a
-        machine learning model using k-fold cross-validation. It calculates and prints the accuracy and f1-score for
-        each fold. If save is True, it saves and returns the best model pipeline based on f1-score and accuracy.
+        machine learning model using k-fold cross-validation. Every fold fits its own clone of the pipeline, so the
+        folds can run in parallel worker processes. It calculates and prints the accuracy, f1-score and timing of each
+        fold, and returns the pipeline fitted on the best fold based on f1-score and accuracy. The pipeline starts with
+        a text normalizer, so it applies the training preprocessing to the texts it predicts.
         """
         validation(test_size, kfold)
-        data_x, data_y = read_postprocessing(dataset, x, y)
-        pipeline = CustomPipeline().create_pipeline(model, vectorizer)
-        if test_size != 0:
-            from sklearn.metrics import accuracy_score
-            from sklearn.model_selection import ShuffleSplit
-            spl = ShuffleSplit(n_splits=kfold, test_size=test_size, random_state=0)
-            accuracy_scores = []
-            f1_scores = []
-            max_f1 = 0.0
-            max_accuracy = 0.0
-            best_pipeline = None
-
-            for train_index, test_index in tqdm(spl.split(data_x)):
-                train_x, test_x = data_x.iloc[train_index], data_x.iloc[test_index]
-                train_y, test_y = data_y.iloc[train_index], data_y.iloc[test_index]
-                pipeline.fit(train_x, train_y)
-                predictions = pipeline.predict(test_x)
-
-                accuracy, f1 = check_model(model, predictions, test_y)
-
-                accuracy_scores.append(accuracy)
-                f1_scores.append(f1)
-                if f1 > max_f1 and accuracy > max_accuracy:
-                    max_f1 = f1
-                    max_accuracy = accuracy
-                    best_pipeline = pipeline
-                print(f"Accuracy: {accuracy}, F1: {f1}")
-            return best_pipeline, max_accuracy, max_f1
-        else:
-            pipeline.fit(data_x, data_y)
-            return pipeline, None, None
+        if streaming:
+            return train_incremental(dataset, x, y, kfold, test_size, model, vectorizer, n_jobs, chunk_size, on_fold)
+        data_x, data_y = read_postprocessing(dataset, x, y, n_jobs, chunk_size)
+        memory = transformer_cache.memory if cache_transformers else None
+        pipeline = CustomPipeline().create_pipeline(model, vectorizer, memory=memory)
+        # The dataset is already preprocessed, so the steps after the normalizer are fitted directly
+        estimator = CustomPipeline.without_normalizer(pipeline)
+        try:
+            return fit_estimator(estimator, data_x, data_y, model, kfold, test_size, kfold_jobs, on_fold)
+        finally:
+            if cache_transformers:
+                transformer_cache.reduce()
 
     @staticmethod
     def predict(model_path: str, text: str):
@@ -135,23 +157,121 @@ class App:
 
         Notes
         ------
-        This method loads a pre-trained model from the provided path and uses it to predict the label/classification
-        for the given text input. It returns the prediction result.
+        This method loads a pre-trained model from the provided path (or takes it from the model cache) and uses it to
+        predict the label/classification for the given text input. It returns the prediction result.
         """
         if os.path.exists(model_path):
             if not text:
                 raise ValueError("No text provided.")
-            pipeline = joblib.load(model_path)
+            pipeline = CustomPipeline.with_normalizer(model_cache.get(model_path))
             return pipeline.predict([text])
         else:
             raise FileNotFoundError(App.model_not_found_constant)
 
+    @staticmethod
+    def predict_batch(model_path: str, texts, chunk_size: int = 1000):
+        """
+        Uses a trained model to make predictions for a stream of text inputs in chunks.
+
+        Parameters
+        ----------
+        model_path : str
+            Path to the trained model file.
+        texts : iterable of str
+            Text inputs for prediction. The iterable is consumed lazily, one chunk at a time.
+        chunk_size : int, optional
+            Number of texts vectorized and predicted at once. Default is 1000.
+
+        Returns
+        -------
+        generator
+            Generator of (texts, predictions) tuples, one for each chunk of text inputs.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the model file is not found at the specified path.
+        ValueError
+            If the chunk size is less than 1.
+
+        Notes
+        ------
+        The model is loaded before the first chunk is requested, so a missing model is reported immediately, while the
+        memory used by the predictions is bounded by the chunk size.
+        """
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(App.model_not_found_constant)
+        if chunk_size < 1:
+            raise ValueError("Chunk size must be greater than 0.")
+        pipeline = CustomPipeline.with_normalizer(model_cache.get(model_path))
+
+        def predictions():
+            for chunk in iter_chunks(texts, chunk_size):
+                yield chunk, pipeline.predict(chunk)
+
+        return predictions()
+
+    @staticmethod
+    def predict_file(model_path: str, dataset: str, save_to: str, x: str = 'text', chunk_size: int = 1000,
+                     n_jobs: int = 1):
+        """
+        Uses a trained model to make predictions for every text of a dataset and writes them to a CSV file.
+
+        Parameters
+        ----------
+        model_path : str
+            Path to the trained model file.
+        dataset : str
+            Path to the dataset file.
+        save_to : str
+            Path of the CSV file the predictions are written to.
+        x : str, optional
+            Name of the column containing textual data in the dataset. Default is 'text'.
+        chunk_size : int, optional
+            Number of texts read and predicted at once. Default is 1000.
+        n_jobs : int, optional
+            Number of worker processes. -1 uses all CPU cores. Default is 1.
+
+        Returns
+        -------
+        int
+            The number of predicted texts.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the model or dataset file is not found at the specified path.
+        ValueError
+            If the column is not found in the dataset or the chunk size is less than 1.
+
+        Notes
+        ------
+        The dataset is read in chunks which are predicted by a pool of worker processes, each of which loads the model
+        once. The results are written in the order of the dataset as soon as they are ready, together with the class
+        probabilities if the model supports them, so memory use is bounded by the chunk size and the number of jobs.
+        """
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(App.model_not_found_constant)
+        if chunk_size < 1:
+            raise ValueError("Chunk size must be greater than 0.")
+        n_jobs = resolve_n_jobs(n_jobs)
+        chunks = iter_chunks(read_texts(dataset, x, chunk_size), chunk_size)
+        if n_jobs == 1:
+            _init_scoring_worker(model_path)
+            results = map(_score_chunk, chunks)
+            return write_predictions(results, save_to, x)
+
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_scoring_worker,
+                                 initargs=(model_path,)) as executor:
+            return write_predictions(ordered_map(executor, _score_chunk, chunks, 2 * n_jobs), save_to, x)
+
     @staticmethod
     def visualize(model_path: str, text: str,
-                  num_features: int = 40, output_format: str = 'image'):
+                  num_features: int = 40, output_format: str = 'image', explainer: str = 'auto'):
         """
         Generates an HTML visualization of model predictions for a given text input using LIME (Local Interpretable
-        Model-agnostic Explanations).
+        Model-agnostic Explanations) or the exact contributions of the words for linear models.
 
         Parameters
         ----------
@@ -164,7 +284,11 @@ class App:
         num_features : int, optional
             Number of features for the explanation. Default is 40.
         output_format : str, optional
-            The output format of the visualization. Default is 'image'.
+            The output format of the visualization: 'image' for a base64 encoded PNG, 'svg', 'json' or 'html'. Default
+            is 'image'.
+        explainer : str, optional
+            'exact' for the exact contributions of linear models, 'lime' for LIME, or 'auto' to use the exact
+            explainer when the model supports it and LIME otherwise. Default is 'auto'.
 
         Returns
         -------
@@ -176,40 +300,52 @@ class App:
         FileNotFoundError
             If the model file is not found at the specified path.
         ValueError
-            If no text is provided for visualization.
+            If no text is provided for visualization, the output format or the explainer is unknown, or the model
+            does not support the exact explainer.
 
         Notes
         ------
-        This method loads a pre-trained model from the provided path and generates a visualization using LIME to
-        explain the model predictions for the given text input. The visualization is returned as an HTML string.
+        This method loads a pre-trained model from the provided path (or takes it from the model cache) and explains the
+        model predictions for the given text input. Linear models are explained exactly by multiplying the vectorized
+        text by the model coefficients, other models with LIME, which predicts thousands of perturbed copies of the
+        text. Every visualization is drawn on its own figure, so concurrent calls are safe and no figure is left open.
+        The visualization is returned as a string and kept in the visualization cache, keyed by the model, its
+        modification time, the text and the options.
         """
         if os.path.exists(model_path):
             if text == '':
                 raise ValueError("No text provided.")
-            pipeline = joblib.load(model_path)
+            if output_format not in ExplanationRenderer.formats:
+                raise ValueError(f"Output format must be one of {', '.join(ExplanationRenderer.formats)}.")
+            key = visualization_cache.key(model_path, str(text), features=num_features, output_format=output_format,
+                                          explainer=explainer)
+            visualization = visualization_cache.get(key)
+            if visualization is not None:
+                return visualization
+            pipeline = CustomPipeline.with_normalizer(model_cache.get(model_path))
             from sklearn.svm import SVR
             if 'model' in pipeline.named_steps and isinstance(pipeline.named_steps['model'], SVR):
                 raise ValueError("This model will not be able to visualize the model")
 
-            from lime.lime_text import LimeTextExplainer
-            explainer = LimeTextExplainer(class_names=pipeline.classes_)
-            exp = explainer.explain_instance(str(text), pipeline.predict_proba, num_features=num_features)
-            if output_format == 'image':
-                img_buf = io.BytesIO()
-                exp.as_pyplot_figure()
-                num_y_values = len(exp.as_list())
-                height_inches = max(8, int(num_y_values * 0.2))
-                plt.gcf().set_size_inches(6, height_inches)  # Set the figure size
-                plt.savefig(img_buf, format='png')
-                img = base64.b64encode(img_buf.getvalue()).decode()
-                return img
+            if explainer not in explainers:
+                raise ValueError(f"Explainer must be one of {', '.join(explainers)}.")
+            if explainer == 'exact' and not LinearExplainer.supports(pipeline):
+                raise ValueError("This model can not be explained exactly.")
+            if explainer != 'lime' and LinearExplainer.supports(pipeline):
+                exp = LinearExplainer.explain(pipeline, str(text), num_features=num_features)
             else:
-                return exp.as_html()
+                from lime.lime_text import LimeTextExplainer
+                exp = LimeTextExplainer(class_names=pipeline.classes_).explain_instance(
+                    str(text), pipeline.predict_proba, num_features=num_features)
+            visualization = ExplanationRenderer.render(exp, output_format)
+            visualization_cache.store(key, visualization)
+            return visualization
         else:
             raise FileNotFoundError(App.model_not_found_constant)
 
     @staticmethod
-    def validate(dataset: str | FileStorage, model: str | FileStorage, x: str = 'text', y: str = 'target', size: float = 0.2):
+    def validate(dataset: str | FileStorage, model: str | FileStorage, x: str = 'text', y: str = 'target', size: float = 0.2,
+                 n_jobs: int = 1, chunk_size: int = default_chunk_size):
         """
         Validates the accuracy and f1 of a trained model.
 
@@ -225,6 +361,10 @@ class App:
             Name of the column containing target labels in the dataset. Default is 'target'.
         size : float, optional
             Size of the test set. Default is 0.2.
+        n_jobs : int, optional
+            Number of worker processes used to preprocess the dataset. -1 uses all CPU cores. Default is 1.
+        chunk_size : int, optional
+            Number of texts preprocessed by a worker at once. Default is 20000.
 
         Returns
         -------
@@ -240,12 +380,14 @@ class App:
             raise FileNotFoundError("Model file not found.")
         elif not model:
             raise ValueError("No model provided.")
-        data_x, data_y = read_postprocessing(dataset, x, y)
+        data_x, data_y = read_postprocessing(dataset, x, y, n_jobs, chunk_size)
         from sklearn.model_selection import ShuffleSplit
         if size <= 0.0 or size > 1.0:
             raise ValueError("The test size must be greater than 0.0 and not greater than 1.0.")
         spl = ShuffleSplit(n_splits=1, test_size=size, random_state=0)
-        pipeline = joblib.load(model)
+        pipeline = model_cache.get(model) if isinstance(model, str) else ModelStorage.load(model)
+        # The dataset is already preprocessed, so it is predicted by the steps after the normalizer
+        pipeline = CustomPipeline.without_normalizer(pipeline)
         if size != 1:
             for train_index, test_index in spl.split(data_x):
                 _, test_x = data_x.iloc[train_index], data_x.iloc[test_index]
@@ -259,7 +401,8 @@ class App:
             return accuracy, f1
 
 
-def read_postprocessing(dataset: str | FileStorage, x: str, y: str):
+def read_postprocessing(dataset: str | FileStorage, x: str, y: str, n_jobs: int = 1,
+                        chunk_size: int = default_chunk_size, cache: bool = True):
     """
     Reads a dataset file and performs preprocessing on the textual data.
 
@@ -269,6 +412,9 @@ def read_postprocessing(dataset: str | FileStorage, x: str, y: str):
         Path to the dataset file or dataset file.
     x : str Name of the column containing textual data in the dataset.
     y : str Name of the column containing target labels in the dataset.
+    n_jobs : int, optional Number of worker processes used to preprocess the textual data. Default is 1.
+    chunk_size : int, optional Number of texts preprocessed by a worker at once. Default is 20000.
+    cache : bool, optional Whether to use the on-disk cache of preprocessed datasets. Default is True.
 
     Returns
     -------
@@ -277,40 +423,425 @@ def read_postprocessing(dataset: str | FileStorage, x: str, y: str):
 
     Raises
     ------
-    KeyError
+    ValueError
         If the specified columns are not found in the dataset.
     FileNotFoundError
         If the dataset file is not found at the specified path.
 
     Notes
     ------
-    This method reads the dataset from the provided path, preprocesses the textual data by stemming, and returns the
-    preprocessed textual data and target labels.
+    This method streams the dataset in chunks of chunk_size rows, reading only the textual and target columns, and
+    preprocesses every chunk as soon as it is parsed by stemming every distinct word once through the shared stem memo.
+    Only the preprocessed texts and labels are kept, so the raw dataset is never held in memory as a whole. The result
+    is stored in the corpus cache under a hash of the raw dataset, so the same dataset is not preprocessed twice.
     """
     if isinstance(dataset, str) and not os.path.exists(dataset):
         raise FileNotFoundError("Dataset file not found.")
     if isinstance(dataset, FileStorage):
-        dataset = StringIO(dataset.read().decode())
-    data = pd.read_csv(filepath_or_buffer=dataset, na_values=[''])
-    try:
-        data_x = data[x]
-        data_y = data[y]
-    except KeyError:
-        error = ''
-        if x not in data.columns:
-            error = x
-        if y not in data.columns:
-            if error != '':
-                error += ', '
-            error += y
-        raise ValueError(f"Column(s) {error} not found in dataset.")
-    data_x = data_x.str.lower()
-    stemmer = PorterStemmer()
-    data_x = data_x.progress_apply(lambda g: ' '.join([stemmer.stem(word) for word in re.sub(
-        r'[!"#$%&\'()*+,-./:;<=>?@[\\]^_`{|}~]]', '', g).split()]))
+        dataset = spool_upload(dataset)
+    key = None
+    if cache:
+        key = corpus_cache.key(dataset, x, y)
+        cached = corpus_cache.load(key)
+        if cached is not None:
+            return cached
+    chunks = read_columns(dataset, [x, y], chunk_size)
+    labels = []
+
+    def texts():
+        for chunk in chunks:
+            labels.append(chunk[y])
+            yield chunk[x]
+
+    processed = list(tqdm(preprocess_chunks(texts(), n_jobs), unit='chunk'))
+    data_x = pd.concat(processed) if processed else pd.Series(dtype=object, name=x)
+    data_y = pd.concat(labels) if labels else pd.Series(dtype=object, name=y)
+    if key is not None:
+        corpus_cache.store(key, data_x, data_y)
     return data_x, data_y
 
 
+def spool_upload(dataset: FileStorage, block_size: int = 1024 * 1024):
+    """
+    Returns a seekable binary stream of an uploaded dataset file, rewound to its start.
+
+    The upload stream is used as is when it is seekable, which is the case of files parsed from a form: Werkzeug
+    already spools large uploads to a temporary file. Other streams are copied block by block to a spooled temporary
+    file, so the upload is never held in memory as a whole.
+    """
+    stream = dataset.stream
+    if stream.seekable():
+        stream.seek(0)
+        return stream
+    spool = tempfile.SpooledTemporaryFile(max_size=16 * block_size)
+    shutil.copyfileobj(stream, spool, block_size)
+    spool.seek(0)
+    return spool
+
+
+def read_columns(dataset, columns: list, chunk_size: int = default_chunk_size):
+    """
+    Reads some columns of a dataset file in chunks without loading the whole file into memory.
+
+    Parameters
+    ----------
+    dataset : str or file
+        Path to the dataset file or seekable binary dataset file.
+    columns : list
+        Names of the columns to read.
+    chunk_size : int, optional
+        Number of rows read at once. Default is 20000.
+
+    Returns
+    -------
+    pandas TextFileReader
+        Iterator of the chunks of the dataset, as data frames with a continuous index.
+
+    Raises
+    ------
+    ValueError
+        If the specified columns are not found in the dataset.
+    """
+    position = None if isinstance(dataset, str) else dataset.tell()
+    header = pd.read_csv(filepath_or_buffer=dataset, nrows=0).columns
+    if position is not None:
+        dataset.seek(position)
+    missing = [column for column in columns if column not in header]
+    if missing:
+        raise ValueError(f"Column(s) {', '.join(missing)} not found in dataset.")
+    return pd.read_csv(filepath_or_buffer=dataset, usecols=columns, chunksize=chunk_size, na_values=[''])
+
+
+def read_texts(dataset: str | FileStorage, x: str, chunk_size: int = 1000):
+    """
+    Reads the textual column of a dataset file in chunks without loading the whole file into memory.
+
+    Parameters
+    ----------
+    dataset : str or FileStorage
+        Path to the dataset file or dataset file.
+    x : str
+        Name of the column containing textual data in the dataset.
+    chunk_size : int, optional
+        Number of rows read at once. Default is 1000.
+
+    Returns
+    -------
+    generator
+        Generator of the texts of the dataset.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the dataset file is not found at the specified path.
+    ValueError
+        If the specified column is not found in the dataset.
+    """
+    if isinstance(dataset, str) and not os.path.exists(dataset):
+        raise FileNotFoundError("Dataset file not found.")
+    if isinstance(dataset, FileStorage):
+        dataset = dataset.stream
+    try:
+        reader = pd.read_csv(filepath_or_buffer=dataset, usecols=[x], chunksize=chunk_size, na_values=[''])
+    except ValueError:
+        raise ValueError(f"Column(s) {x} not found in dataset.")
+
+    def texts():
+        with reader:
+            for chunk in reader:
+                yield from chunk[x].fillna('').astype(str)
+
+    return texts()
+
+
+def iter_chunks(iterable, chunk_size: int):
+    """
+    Splits an iterable into lists of at most chunk_size items.
+    """
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, chunk_size)):
+        yield chunk
+
+
+def write_predictions(results, save_to: str, x: str = 'text') -> int:
+    """
+    Writes predicted chunks to a CSV file as they arrive and returns the number of written rows.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(save_to)), exist_ok=True)
+    rows = 0
+    for chunk in tqdm(results, unit='chunk'):
+        chunk.index += rows
+        chunk.rename(columns={'text': x}).to_csv(save_to, mode='w' if rows == 0 else 'a', header=rows == 0,
+                                                 index_label='index')
+        rows += len(chunk)
+    if rows == 0:
+        pd.DataFrame(columns=[x, 'prediction']).to_csv(save_to, index_label='index')
+    return rows
+
+
+_scoring_pipeline = None
+
+
+def _init_scoring_worker(model_path: str):
+    global _scoring_pipeline
+    _scoring_pipeline = CustomPipeline.with_normalizer(model_cache.get(model_path))
+
+
+def _score_chunk(texts: list) -> pd.DataFrame:
+    result = pd.DataFrame({'text': texts, 'prediction': _scoring_pipeline.predict(texts)})
+    if hasattr(_scoring_pipeline, 'predict_proba'):
+        probabilities = _scoring_pipeline.predict_proba(texts)
+        for i, class_name in enumerate(_scoring_pipeline.classes_):
+            result[f'probability_{class_name}'] = probabilities[:, i]
+    return result
+
+
+def fit_estimator(estimator, data_x, data_y, model: str, kfold: int, test_size: float, kfold_jobs: int = 1,
+                  on_fold=None):
+    """
+    Fits a pipeline on preprocessed data and returns it with a text normalizer as the first step.
+
+    Parameters
+    ----------
+    estimator : sklearn Pipeline
+        Unfitted pipeline expecting preprocessed text.
+    data_x : pd.Series
+        Preprocessed textual data.
+    data_y : pd.Series
+        Target labels.
+    model : str
+        Name of the model of the pipeline.
+    kfold : int
+        Number of folds.
+    test_size : float
+        Size of the test set of every fold. If it is 0, the pipeline is fitted on the whole dataset.
+    kfold_jobs : int, optional
+        Number of worker processes fitting the folds. -1 uses all CPU cores. Default is 1.
+    on_fold : callable, optional
+        Called with the metrics of every fold as soon as it is evaluated, in the order of the folds.
+
+    Returns
+    -------
+    tuple
+        The pipeline of the best fold by f1-score and accuracy, with its accuracy and f1-score.
+
+    Notes
+    ------
+    Every fold fits its own clone of the pipeline, so the folds run in parallel and the returned pipeline is the one
+    actually fitted on the best fold. Only the best fitted pipeline seen so far is kept in memory. While the folds run
+    in parallel, the steps of the pipeline fit with a single job, so the fold processes do not oversubscribe the CPU
+    cores. The coefficients of the returned pipeline are downcast to float32 when its predictions on a sample of the
+    data stay the same.
+    """
+    sample = data_x.sample(n=min(len(data_x), downcast_sample_size), random_state=0)
+    if test_size == 0:
+        estimator.fit(data_x, data_y)
+        ModelSlimmer.downcast(estimator, sample)
+        return CustomPipeline.with_normalizer(estimator), None, None
+
+    from joblib import Parallel, delayed
+    from sklearn.base import clone
+    from sklearn.model_selection import ShuffleSplit
+    spl = ShuffleSplit(n_splits=kfold, test_size=test_size, random_state=0)
+    kfold_jobs = min(resolve_n_jobs(kfold_jobs), kfold)
+    nested_jobs = {name: value for name, value in estimator.get_params().items()
+                   if name.endswith('n_jobs') and value not in (None, 1)} if kfold_jobs > 1 else {}
+    fold_estimator = clone(estimator).set_params(**{name: 1 for name in nested_jobs})
+    folds = Parallel(n_jobs=kfold_jobs, return_as='generator')(
+        delayed(fit_fold)(clone(fold_estimator), data_x, data_y, train_index, test_index, model)
+        for train_index, test_index in spl.split(data_x))
+
+    best = None
+    for fold, (pipeline, metrics) in enumerate(tqdm(folds, total=kfold, unit='fold')):
+        metrics['fold'] = fold
+        print(f"Fold {fold}: Accuracy: {metrics['accuracy']}, F1: {metrics['f1']}, "
+              f"fit time: {metrics['fit_time']:.2f}s")
+        if on_fold is not None:
+            on_fold(metrics)
+        if best is None or (metrics['f1'], metrics['accuracy']) > (best[1]['f1'], best[1]['accuracy']):
+            best = pipeline, metrics
+    pipeline, metrics = best
+    # The returned pipeline keeps the jobs it was configured with
+    pipeline.set_params(**nested_jobs)
+    ModelSlimmer.downcast(pipeline, sample)
+    return CustomPipeline.with_normalizer(pipeline), metrics['accuracy'], metrics['f1']
+
+
+def fit_fold(estimator, data_x, data_y, train_index, test_index, model: str):
+    """
+    Fits a pipeline on the training part of a fold and evaluates it on the test part.
+
+    Returns
+    -------
+    tuple
+        The fitted pipeline and a dictionary with its accuracy, f1-score, fit and prediction times.
+    """
+    start = time.perf_counter()
+    estimator.fit(data_x.iloc[train_index], data_y.iloc[train_index])
+    fitted = time.perf_counter()
+    predictions = estimator.predict(data_x.iloc[test_index])
+    accuracy, f1 = check_model(model, predictions, data_y.iloc[test_index])
+    return estimator, {'accuracy': accuracy, 'f1': f1, 'fit_time': fitted - start,
+                       'predict_time': time.perf_counter() - fitted}
+
+
+def train_incremental(dataset: str | FileStorage, x: str, y: str, kfold: int, test_size: float, model: str,
+                      vectorizer: str, n_jobs: int = 1, chunk_size: int = default_chunk_size, on_fold=None):
+    """
+    Trains a pipeline out of core, streaming the dataset in chunks and fitting the model of every fold with
+    partial_fit.
+
+    Parameters
+    ----------
+    dataset : str or FileStorage
+        Path to the dataset file or dataset file.
+    x : str
+        Name of the column containing textual data in the dataset.
+    y : str
+        Name of the column containing target labels in the dataset.
+    kfold : int
+        Number of folds.
+    test_size : float
+        Share of the rows held out for testing in every fold. If it is 0, a single model is trained on every row.
+    model : str
+        Name of a model supporting partial_fit.
+    vectorizer : str
+        Name of a stateless vectorizer.
+    n_jobs : int, optional
+        Number of worker processes used to preprocess the chunks. -1 uses all CPU cores. Default is 1.
+    chunk_size : int, optional
+        Number of rows read, preprocessed and fitted at once. Default is 20000.
+    on_fold : callable, optional
+        Called with the metrics of every fold once the dataset is read, in the order of the folds.
+
+    Returns
+    -------
+    tuple
+        The pipeline of the best fold by f1-score and accuracy, with its accuracy and f1-score.
+
+    Raises
+    ------
+    ValueError
+        If the vectorizer or the model cannot be trained incrementally, or the columns are not found in the dataset.
+    FileNotFoundError
+        If the dataset file is not found at the specified path.
+
+    Notes
+    ------
+    The target column is scanned first to find the classes, then the dataset is read once. Every fold holds out a
+    random share of every chunk, fits its model on the other rows of the chunk, then predicts the held-out rows, so
+    the held-out metrics are accumulated in the same pass and no row is kept in memory once its chunk is processed.
+    The coefficients of the returned pipeline are downcast to float32 when its predictions on the last chunk stay the
+    same.
+    """
+    custom_pipeline = CustomPipeline()
+    if not custom_pipeline.is_incremental(model, vectorizer):
+        raise ValueError(f"Streaming training requires one of the vectorizers "
+                         f"{', '.join(CustomPipeline.incremental_vectorizers)} and a model supporting partial_fit.")
+    if isinstance(dataset, str) and not os.path.exists(dataset):
+        raise FileNotFoundError("Dataset file not found.")
+    if isinstance(dataset, FileStorage):
+        dataset = spool_upload(dataset)
+    classes = scan_classes(dataset, y, chunk_size)
+
+    from sklearn.base import clone
+    estimator = CustomPipeline.without_normalizer(custom_pipeline.create_pipeline(model, vectorizer))
+    evaluate = test_size > 0
+    folds = [IncrementalFold(clone(estimator), fold, model) for fold in range(kfold if evaluate else 1)]
+    chunks = read_columns(dataset, [x, y], chunk_size)
+    labels = deque()
+    sample = []
+
+    def texts():
+        for chunk in chunks:
+            labels.append(chunk[y].to_numpy())
+            yield chunk[x]
+
+    for data_x in tqdm(preprocess_chunks(texts(), n_jobs), unit='chunk'):
+        data_y = labels.popleft()
+        features = estimator.named_steps['vectorizer'].transform(data_x)
+        for fold in folds:
+            fold.partial_fit(features, data_y, classes, test_size)
+        sample = data_x.iloc[:downcast_sample_size]
+
+    if not evaluate:
+        ModelSlimmer.downcast(folds[0].estimator, sample)
+        return CustomPipeline.with_normalizer(folds[0].estimator), None, None
+
+    best = None
+    for fold in folds:
+        metrics = fold.metrics()
+        print(f"Fold {fold.fold}: Accuracy: {metrics['accuracy']}, F1: {metrics['f1']}, "
+              f"fit time: {metrics['fit_time']:.2f}s")
+        if on_fold is not None:
+            on_fold(metrics)
+        if best is None or (metrics['f1'], metrics['accuracy']) > (best[1]['f1'], best[1]['accuracy']):
+            best = fold.estimator, metrics
+    pipeline, metrics = best
+    ModelSlimmer.downcast(pipeline, sample)
+    return CustomPipeline.with_normalizer(pipeline), metrics['accuracy'], metrics['f1']
+
+
+class IncrementalFold:
+    """
+    A fold of an out-of-core training, holding its pipeline and the counts of its held-out predictions.
+    """
+
+    def __init__(self, estimator, fold: int, model: str):
+        self.estimator = estimator
+        self.fold = fold
+        self.model = model
+        self.random_state = np.random.RandomState(fold)
+        self.fit_time = self.predict_time = 0.0
+        self.predictions = []
+        self.targets = []
+
+    def partial_fit(self, features, data_y, classes, test_size: float):
+        """
+        Holds out a random share of a vectorized chunk, fits the model on the other rows and predicts the held-out
+        rows.
+        """
+        learner = self.estimator.named_steps['model']
+        test = self.random_state.random_sample(len(data_y)) < test_size
+        if test.all() and not hasattr(learner, 'coef_'):
+            # An unfitted model cannot predict, so a first chunk without training rows is trained on
+            test[:] = False
+        start = time.perf_counter()
+        if not test.all():
+            learner.partial_fit(features[~test], data_y[~test], classes=classes)
+        fitted = time.perf_counter()
+        if test.any():
+            self.predictions.append(learner.predict(features[test]))
+            self.targets.append(data_y[test])
+        self.fit_time += fitted - start
+        self.predict_time += time.perf_counter() - fitted
+
+    def metrics(self) -> dict:
+        """
+        Returns the accuracy and f1-score of the held-out predictions with the fit and prediction times.
+        """
+        if not self.predictions:
+            raise ValueError("No rows were held out for testing, increase the test size.")
+        accuracy, f1 = check_model(self.model, np.concatenate(self.predictions), np.concatenate(self.targets))
+        return {'accuracy': accuracy, 'f1': f1, 'fit_time': self.fit_time, 'predict_time': self.predict_time,
+                'fold': self.fold}
+
+
+def scan_classes(dataset, y: str, chunk_size: int = default_chunk_size):
+    """
+    Returns the sorted distinct target labels of a dataset, reading only the target column in chunks. A dataset
+    stream is rewound to its position afterwards.
+    """
+    position = None if isinstance(dataset, str) else dataset.tell()
+    classes = set()
+    with read_columns(dataset, [y], chunk_size) as reader:
+        for chunk in reader:
+            classes.update(chunk[y].dropna().unique().tolist())
+    if position is not None:
+        dataset.seek(position)
+    return np.array(sorted(classes))
+
+
 def validation(test_size: float, kfold: int):
     if test_size < 0.0 or test_size >= 1.0:
         raise ValueError("Test size must be at least 0.0 and less than 1.0")
@@ -0,0 +1,223 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+import pandas as pd
+
+from classes.privateDirectory import cache_directory, private_directory
+from classes.textPreprocessing import preprocessing_version
+
+default_directory = os.path.join(cache_directory, 'corpora')
+default_max_bytes = 2 * 1024 * 1024 * 1024
+
+
+class CorpusCache:
+    """
+    An on-disk cache of preprocessed datasets, addressed by the content of the raw dataset.
+
+    The key of a dataset is a hash of its raw bytes, the names of the text and target columns and the preprocessing
+    version, so repeated runs on the same data skip reading and preprocessing it. The preprocessed texts and labels are
+    stored as pickles, and the least recently used ones are removed when the cache grows over its size budget.
+    Pickles run code when they are loaded, so the cache is only used while its directory is private to the user running
+    the server.
+
+    Attributes
+    ----------
+    directory : str
+        Directory where the preprocessed datasets are stored.
+    max_bytes : int
+        Size budget of the directory in bytes.
+    hits : int
+        Number of datasets loaded from the cache.
+    misses : int
+        Number of datasets that had to be preprocessed.
+
+    Methods
+    -------
+    key(dataset, x: str, y: str)
+        Returns the key of a raw dataset.
+    load(key: str)
+        Returns the preprocessed texts and labels stored under a key, or None.
+    store(key: str, data_x, data_y)
+        Stores the preprocessed texts and labels under a key.
+    clear()
+        Removes all preprocessed datasets from the cache and resets the statistics.
+    stats()
+        Returns the cache statistics.
+    """
+
+    def __init__(self, directory: str = default_directory, max_bytes: int = default_max_bytes):
+        """
+        Initialize the CorpusCache class.
+
+        Parameters
+        ----------
+        directory : str, optional
+            Directory where the preprocessed datasets are stored. Default is cache/corpora in the backend directory.
+        max_bytes : int, optional
+            Size budget of the directory in bytes. Default is 2 GB.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(dataset, x: str, y: str) -> str:
+        """
+        Returns the key of a raw dataset.
+
+        Parameters
+        ----------
+        dataset : str or file
+            Path to the dataset file or a seekable binary dataset file, which is rewound after hashing.
+        x : str
+            Name of the column containing textual data in the dataset.
+        y : str
+            Name of the column containing target labels in the dataset.
+
+        Returns
+        -------
+        str
+            The hex digest of the dataset content, the column names and the preprocessing version.
+        """
+        digest = hashlib.sha256(f'{preprocessing_version}\0{x}\0{y}\0'.encode())
+        if isinstance(dataset, str):
+            with open(dataset, 'rb') as f:
+                _update_digest(digest, f)
+        else:
+            position = dataset.tell()
+            _update_digest(digest, dataset)
+            dataset.seek(position)
+        return digest.hexdigest()
+
+    def load(self, key: str):
+        """
+        Returns the preprocessed texts and labels stored under a key.
+
+        Parameters
+        ----------
+        key : str
+            Key of the raw dataset.
+
+        Returns
+        -------
+        tuple or None
+            The preprocessed texts and labels, or None if they are not cached.
+        """
+        path = self._path(key)
+        try:
+            data = pd.read_pickle(path) if self._private() else None
+            os.utime(path)
+        except FileNotFoundError:
+            data = None
+        except Exception as e:
+            print(f' ! Removing unreadable cached dataset {path}: {e}')
+            self._remove(path)
+            data = None
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def store(self, key: str, data_x: pd.Series, data_y: pd.Series):
+        """
+        Stores the preprocessed texts and labels under a key, evicting the least recently used datasets if the cache
+        grows over its size budget.
+
+        Parameters
+        ----------
+        key : str
+            Key of the raw dataset.
+        data_x : pd.Series
+            Preprocessed texts.
+        data_y : pd.Series
+            Target labels.
+        """
+        if not self._private():
+            return
+        path = self._path(key)
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix='.tmp', delete=False) as f:
+            tmp_path = f.name
+        try:
+            pd.to_pickle((data_x, data_y), tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            self._remove(tmp_path)
+        self._evict()
+
+    def clear(self):
+        """
+        Removes all preprocessed datasets from the cache and resets the statistics.
+        """
+        for path, _, _ in self._entries():
+            self._remove(path)
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        Returns the cache statistics.
+
+        Returns
+        -------
+        dict
+            Hits, misses, number of cached datasets and disk usage.
+        """
+        entries = self._entries()
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'datasets': len(entries),
+                    'bytes': sum(size for _, size, _ in entries), 'max_bytes': self.max_bytes}
+
+    def _private(self) -> bool:
+        try:
+            private_directory(self.directory)
+        except PermissionError as e:
+            print(f' ! Not caching preprocessed datasets: {e}')
+            return False
+        return True
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.pkl')
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pkl'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict(self):
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry[2])
+            total = sum(size for _, size, _ in entries)
+            for path, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _update_digest(digest, f, block_size: int = 1024 * 1024):
+    while block := f.read(block_size):
+        digest.update(block)
+
+
+corpus_cache = CorpusCache()
@@ -1,7 +1,10 @@
 from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer, HashingVectorizer
 from sklearn.pipeline import Pipeline
 from sklearn.svm import SVC, SVR
-from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+
+from classes.linearSVM import LinearSVM
+from classes.textPreprocessing import TextNormalizer
 
 
 class CustomPipeline:
@@ -14,6 +17,8 @@ class CustomPipeline:
         A dictionary containing different types of models available for use.
     vectorizers : dict
         A dictionary containing various vectorizers for text data processing.
+    incremental_vectorizers : tuple
+        Names of the stateless vectorizers, which can vectorize a dataset chunk by chunk.
 
     Methods
     -------
@@ -21,9 +26,17 @@ class CustomPipeline:
         Retrieves a specific model based on the provided name.
     get_vectorizer(name: str)
         Retrieves a specific vectorizer based on the provided name.
-    create_pipeline(model_name: str, vectorizer_name: str)
-        Creates a pipeline by combining a specified model and vectorizer.
+    create_pipeline(model_name: str, vectorizer_name: str, memory=None)
+        Creates a pipeline by combining a text normalizer, a specified vectorizer and model.
+    is_incremental(model_name: str, vectorizer_name: str)
+        Checks whether a pipeline can be trained chunk by chunk.
+    with_normalizer(pipeline: Pipeline)
+        Returns the pipeline with a text normalizer as the first step.
+    without_normalizer(pipeline: Pipeline)
+        Returns the pipeline without its text normalizer step.
     """
+    incremental_vectorizers = ('HashingVectorizer',)
+
     def __init__(self, max_iter=20000, max_features=1000, kernel='linear'):
         """
         Initialize the CustomPipeline class with the provided parameters.
@@ -40,7 +53,9 @@ class CustomPipeline:
         self.models = {
             'SVC': SVC(kernel=kernel, probability=True, cache_size=200, max_iter=max_iter, verbose=True),
             'SVR': SVR(kernel=kernel, max_iter=max_iter, C=1.0, epsilon=0.2, verbose=True),
-            'LogisticRegression': LogisticRegression(max_iter=max_iter, n_jobs=-1, verbose=True)
+            'LogisticRegression': LogisticRegression(max_iter=max_iter, n_jobs=-1, verbose=True),
+            'SGDClassifier': SGDClassifier(loss='log_loss', random_state=0),
+            'LinearSVM': LinearSVM(max_iter=max_iter)
         }
 
         self.vectorizers = {
@@ -85,9 +100,9 @@ class CustomPipeline:
             raise ValueError(f"Vectorizer with name '{name}' not found.")
         return self.vectorizers[name]
 
-    def create_pipeline(self, model_name: str, vectorizer_name: str):
+    def create_pipeline(self, model_name: str, vectorizer_name: str, memory=None):
         """
-        Create a pipeline combining the specified model and vectorizer.
+        Create a pipeline combining a text normalizer, the specified vectorizer and model.
 
         Parameters
         ----------
@@ -95,6 +110,8 @@ class CustomPipeline:
             Name of the model to use in the pipeline.
         vectorizer_name : str
             Name of the vectorizer to use in the pipeline.
+        memory : joblib.Memory, optional
+            Memory used to cache the fitted transformers of the pipeline. Default is None, no caching.
 
         Returns
         -------
@@ -105,6 +122,69 @@ class CustomPipeline:
         vectorizer = self.get_vectorizer(vectorizer_name)
 
         return Pipeline([
+            ('normalizer', TextNormalizer()),
             ('vectorizer', vectorizer),
             ('model', model)
-        ])
+        ], memory=memory)
+
+    def is_incremental(self, model_name: str, vectorizer_name: str) -> bool:
+        """
+        Check whether a pipeline with the specified vectorizer and model can be trained chunk by chunk, which requires a
+        stateless vectorizer and a model supporting partial_fit.
+
+        Parameters
+        ----------
+        model_name : str
+            Name of the model to use in the pipeline.
+        vectorizer_name : str
+            Name of the vectorizer to use in the pipeline.
+
+        Returns
+        -------
+        bool
+            True if the pipeline can be trained incrementally.
+        """
+        model = self.get_model(model_name)
+        self.get_vectorizer(vectorizer_name)
+        return vectorizer_name in self.incremental_vectorizers and hasattr(model, 'partial_fit')
+
+    @staticmethod
+    def with_normalizer(pipeline: Pipeline):
+        """
+        Get the pipeline with a text normalizer as the first step. Pipelines fitted on preprocessed text, like models
+        trained before the normalizer was part of the pipeline, are wrapped with one sharing their fitted steps. The
+        wrapping pipeline has no memory, so it does not reference the transformer cache once saved.
+
+        Parameters
+        ----------
+        pipeline : sklearn Pipeline
+            A trained pipeline.
+
+        Returns
+        -------
+        sklearn Pipeline
+            The pipeline that preprocesses its input.
+        """
+        if isinstance(pipeline.steps[0][1], TextNormalizer):
+            return pipeline
+        return Pipeline([('normalizer', TextNormalizer())] + pipeline.steps)
+
+    @staticmethod
+    def without_normalizer(pipeline: Pipeline):
+        """
+        Get the pipeline without its text normalizer step, sharing the remaining steps. It is used to fit and evaluate
+        pipelines on a dataset which was already preprocessed.
+
+        Parameters
+        ----------
+        pipeline : sklearn Pipeline
+            A pipeline.
+
+        Returns
+        -------
+        sklearn Pipeline
+            The pipeline that expects preprocessed input.
+        """
+        if isinstance(pipeline.steps[0][1], TextNormalizer):
+            return pipeline[1:]
+        return pipeline
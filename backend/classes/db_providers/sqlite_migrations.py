@@ -0,0 +1,131 @@
+"""
+Versioned schema migrations of the SQLite database.
+
+The version of a database is stored in its ``PRAGMA user_version``. Every migration is applied once, in order, inside
+an immediate transaction together with the version bump, so a database is never left half migrated and concurrent
+servers opening the same file migrate it only once. Databases created before the migrations existed have version 0
+and are migrated in place: their tables already exist, so the first migration only creates the missing ones.
+
+To change the schema, append a migration with the next version number. Never edit a migration which was released.
+"""
+
+migrations = [
+    (1, 'Create the users, models and jobs tables', [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            sub TEXT PRIMARY KEY,
+            uuid TEXT,
+            token TEXT,
+            auth_info TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS models (
+            name TEXT,
+            uuid TEXT PRIMARY KEY,
+            shared BOOLEAN,
+            user_uuid TEXT,
+            FOREIGN KEY(user_uuid) REFERENCES users(uuid)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS jobs (
+            uuid TEXT PRIMARY KEY,
+            user_uuid TEXT,
+            status TEXT,
+            params TEXT,
+            folds TEXT,
+            result TEXT,
+            error TEXT,
+            created REAL,
+            updated REAL,
+            FOREIGN KEY(user_uuid) REFERENCES users(uuid)
+        )
+        ''',
+    ]),
+    (2, 'Index the lookups of users by UUID, of models by user, name and sharing, and of jobs by user and status', [
+        'CREATE INDEX IF NOT EXISTS users_uuid ON users(uuid)',
+        'CREATE INDEX IF NOT EXISTS models_user_uuid_name ON models(user_uuid, name)',
+        'CREATE INDEX IF NOT EXISTS models_name_shared ON models(name, shared)',
+        'CREATE INDEX IF NOT EXISTS models_shared ON models(shared) WHERE shared = 1',
+        'CREATE INDEX IF NOT EXISTS jobs_user_uuid_created ON jobs(user_uuid, created)',
+        'CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status)',
+        'ANALYZE',
+    ]),
+    (3, 'Index the keyset pagination of the model catalog by name and UUID', [
+        'CREATE INDEX IF NOT EXISTS models_user_uuid_catalog ON models(user_uuid, name, uuid)',
+        'CREATE INDEX IF NOT EXISTS models_shared_catalog ON models(name, uuid) WHERE shared = 1',
+        'DROP INDEX IF EXISTS models_user_uuid_name',
+        'DROP INDEX IF EXISTS models_shared',
+        'ANALYZE',
+    ]),
+    (4, 'Record the server process running every job', [
+        'ALTER TABLE jobs ADD COLUMN worker INTEGER',
+    ]),
+]
+
+schema_version = migrations[-1][0]
+
+# Applied to every connection. WAL lets readers work while a write is in progress, and with WAL a NORMAL
+# synchronization is safe against corruption while only syncing on checkpoints.
+connection_pragmas = [
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -16000',
+]
+
+
+def configure_connection(conn):
+    """
+    Applies the connection pragmas to a new connection.
+    """
+    for pragma in connection_pragmas:
+        conn.execute(pragma)
+
+
+def get_version(conn) -> int:
+    """
+    Returns the schema version of a database.
+    """
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn) -> int:
+    """
+    Applies the pending migrations to a database and returns its schema version.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        Connection to the database, outside of any transaction.
+
+    Returns
+    -------
+    int
+        The schema version of the database after the migrations.
+
+    Notes
+    ------
+    A database with a newer version than the known migrations, written by a newer server, is left untouched.
+    """
+    for version, description, statements in migrations:
+        if get_version(conn) >= version:
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Another server may have applied the migration while this one waited for the lock
+            if get_version(conn) < version:
+                print(f' * Migrating the database to version {version}: {description}')
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    version = get_version(conn)
+    if version > schema_version:
+        print(f' ! Warning: the database schema version {version} is newer than this server '
+              f'(version {schema_version}).')
+    return version
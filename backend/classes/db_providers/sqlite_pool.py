@@ -0,0 +1,227 @@
+import random
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+from classes.db_providers.sqlite_migrations import configure_connection
+
+default_max_connections = 8
+default_timeout = 30.0
+default_busy_timeout = 5.0
+default_max_retries = 5
+default_retry_delay = 0.05
+
+
+class ConnectionPool:
+    """
+    A bounded, thread-safe pool of connections to an SQLite database file.
+
+    Connections are opened on demand up to max_connections and reused afterwards, so the number of open connections no
+    longer grows with the number of server threads. A thread checking out a connection while all of them are in use
+    waits until one is returned, at most timeout seconds. Every connection waits up to busy_timeout seconds for the
+    lock of another writer instead of failing at once with "database is locked".
+
+    Attributes
+    ----------
+    db_file : str
+        Path to the database file. In-memory databases are not supported, every connection would open its own.
+    max_connections : int
+        Maximum number of open connections.
+    timeout : float
+        Maximum number of seconds to wait for a free connection.
+    busy_timeout : float
+        Number of seconds a connection waits for the lock of another writer.
+    max_retries : int
+        Number of times a write failing on a locked database is retried.
+    retry_delay : float
+        Delay before the first retry in seconds, doubled on every retry.
+
+    Methods
+    -------
+    acquire()
+        Checks out a connection, waiting for one to be returned if all are in use.
+    release(conn: sqlite3.Connection)
+        Returns a connection to the pool.
+    record_retry()
+        Counts a retried write.
+    close()
+        Closes the idle connections.
+    stats()
+        Returns the pool statistics.
+    """
+
+    def __init__(self, db_file: str, max_connections: int = default_max_connections, timeout: float = default_timeout,
+                 busy_timeout: float = default_busy_timeout, max_retries: int = default_max_retries,
+                 retry_delay: float = default_retry_delay):
+        """
+        Initialize the ConnectionPool class.
+
+        Parameters
+        ----------
+        db_file : str
+            Path to the database file.
+        max_connections : int, optional
+            Maximum number of open connections. Default is 8.
+        timeout : float, optional
+            Maximum number of seconds to wait for a free connection. Default is 30.
+        busy_timeout : float, optional
+            Number of seconds a connection waits for the lock of another writer. Default is 5.
+        max_retries : int, optional
+            Number of times a write failing on a locked database is retried. Default is 5.
+        retry_delay : float, optional
+            Delay before the first retry in seconds. Default is 0.05.
+        """
+        self.db_file = db_file
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.busy_timeout = busy_timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.timeouts = 0
+        self.retries = 0
+        self._opened = 0
+        self._active = 0
+        self._idle = []
+        self._condition = threading.Condition()
+
+    def acquire(self) -> sqlite3.Connection:
+        """
+        Checks out a connection, reusing an idle one, opening a new one below max_connections, or else waiting for one
+        to be returned.
+
+        Returns
+        -------
+        sqlite3.Connection
+            The connection, to be returned with release.
+
+        Raises
+        ------
+        TimeoutError
+            If no connection was returned within the timeout.
+        """
+        start = time.monotonic()
+        with self._condition:
+            waited = False
+            while not self._idle and self._opened >= self.max_connections:
+                remaining = start + self.timeout - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise TimeoutError(f'No database connection was free within {self.timeout} seconds.')
+                waited = True
+                self._condition.wait(remaining)
+            conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                self._opened += 1
+            self._active += 1
+            self.checkouts += 1
+            if waited:
+                wait_time = time.monotonic() - start
+                self.waits += 1
+                self.wait_time += wait_time
+                self.max_wait_time = max(self.max_wait_time, wait_time)
+        if conn is None:
+            try:
+                conn = self._connect()
+            except BaseException:
+                with self._condition:
+                    self._opened -= 1
+                    self._active -= 1
+                    self._condition.notify()
+                raise
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        """
+        Returns a connection to the pool, rolling back the transaction left open on it, if any.
+
+        Parameters
+        ----------
+        conn : sqlite3.Connection
+            A connection checked out with acquire.
+        """
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            conn = None
+        with self._condition:
+            self._active -= 1
+            if conn is None:
+                self._opened -= 1
+            else:
+                self._idle.append(conn)
+            self._condition.notify()
+
+    def record_retry(self):
+        """
+        Counts a write retried after failing on a locked database.
+        """
+        with self._condition:
+            self.retries += 1
+
+    def close(self):
+        """
+        Closes the idle connections. Connections still checked out are reused once returned, and new ones are opened
+        on demand, so the pool stays usable.
+        """
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._opened -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> dict:
+        """
+        Returns the pool statistics.
+
+        Returns
+        -------
+        dict
+            Open, active and idle connections, checkouts, checkouts which had to wait with their total, mean and
+            maximum wait time in seconds, timeouts and retried writes.
+        """
+        with self._condition:
+            return {'connections': self._opened, 'active': self._active, 'idle': len(self._idle),
+                    'max_connections': self.max_connections, 'checkouts': self.checkouts, 'waits': self.waits,
+                    'wait_time': self.wait_time, 'mean_wait_time': self.wait_time / self.waits if self.waits else 0.0,
+                    'max_wait_time': self.max_wait_time, 'timeouts': self.timeouts, 'retries': self.retries}
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file, timeout=self.busy_timeout, check_same_thread=False)
+        configure_connection(conn)
+        return conn
+
+
+def retry_on_lock(method):
+    """
+    Retries a write method of SQLiteProvider with exponential backoff and jitter when the database stays locked
+    beyond the busy timeout of its connection.
+    """
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        for attempt in range(self.pool.max_retries + 1):
+            try:
+                return method(self, *args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if attempt == self.pool.max_retries or not is_lock_error(e):
+                    raise
+                self.get_conn().rollback()
+                self.pool.record_retry()
+                time.sleep(self.pool.retry_delay * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    return wrapper
+
+
+def is_lock_error(error: sqlite3.OperationalError) -> bool:
+    """
+    Checks whether an SQLite error is caused by another connection holding the database lock.
+    """
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
@@ -1,51 +1,46 @@
 import json
 import re
-import sqlite3
 import threading
+import time
+
+from classes.db_providers.sqlite_migrations import migrate
+from classes.db_providers.sqlite_pool import ConnectionPool, default_max_connections, retry_on_lock
+from classes.sessionCache import session_cache
 
 sql_user_models_list = ''' SELECT * FROM models WHERE user_uuid = ? '''
 
 class SQLiteProvider:
-    def __init__(self, db_file):
+    def __init__(self, db_file, max_connections=default_max_connections):
         self.db_file = db_file
+        self.pool = ConnectionPool(db_file, max_connections=max_connections)
         self.local_storage = threading.local()
         self.check_and_create_tables()
 
     def get_conn(self):
+        # The connection stays checked out by the thread until close_connection, at the end of the request
         if not hasattr(self.local_storage, 'connection'):
-            self.local_storage.connection = sqlite3.connect(self.db_file)
+            self.local_storage.connection = self.pool.acquire()
         return self.local_storage.connection
 
     def close_connection(self):
         if hasattr(self.local_storage, 'connection'):
-            self.local_storage.connection.close()
+            self.pool.release(self.local_storage.connection)
             del self.local_storage.connection
 
-    def check_and_create_tables(self):
-        conn = self.get_conn()
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                sub TEXT PRIMARY KEY,
-                uuid TEXT,
-                token TEXT,
-                auth_info TEXT
-            )
-        """)
-
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS models (
-                name TEXT,
-                uuid TEXT PRIMARY KEY,
-                shared BOOLEAN,
-                user_uuid TEXT,
-                FOREIGN KEY(user_uuid) REFERENCES users(uuid)
-            )
-        """)
+    def close(self):
+        self.close_connection()
+        self.pool.close()
 
-        conn.commit()
+    def stats(self):
+        return self.pool.stats()
+
+    def check_and_create_tables(self):
+        try:
+            migrate(self.get_conn())
+        finally:
+            self.close_connection()
 
+    @retry_on_lock
     def add_user(self, uuid, token, google_payload):
         sub = google_payload['sub']
         user = (sub, uuid, token, json.dumps(google_payload))
@@ -57,6 +52,7 @@ class SQLiteProvider:
         conn.commit()
         return {'sub': sub, 'uuid': uuid, 'token': token, 'auth_info': google_payload, 'models': []}
 
+    @retry_on_lock
     def update_user(self, token, google_payload):
         sub = google_payload['sub']
         user = (token, json.dumps(google_payload), sub)
@@ -67,8 +63,13 @@ class SQLiteProvider:
         cur = conn.cursor()
         cur.execute(sql, user)
         conn.commit()
-        return self.get_user_by_sub(sub)
+        user = self.get_user_by_sub(sub)
+        # The cached session still holds the expiry of the previous token
+        if user is not None:
+            session_cache.invalidate(user['uuid'])
+        return user
 
+    @retry_on_lock
     def remove_user(self, uuid):
         sub = self.get_user_by_uuid(uuid)['sub']
         sql = ''' DELETE FROM users WHERE sub = ? '''
@@ -76,6 +77,7 @@ class SQLiteProvider:
         cur = conn.cursor()
         cur.execute(sql, (sub,))
         conn.commit()
+        session_cache.invalidate(uuid)
         return None
 
     def get_user_by_sub(self, sub):
@@ -88,7 +90,9 @@ class SQLiteProvider:
         cur.execute(sql_user_models_list, (uuid,))
         models = cur.fetchall()
         if user is not None:
-            return {'sub': user[0], 'uuid': user[1], 'token': user[2], 'auth_info': user[3], 'models': models}
+            auth_info = json.loads(user[3])
+            return {'sub': user[0], 'uuid': user[1], 'token': user[2], 'auth_info': auth_info,
+                    'models': [self.model_to_dict(model) for model in models]}
         return None
 
     def get_user_by_uuid(self, uuid):
@@ -102,23 +106,25 @@ class SQLiteProvider:
         models = cur.fetchall()
         if user is not None:
             auth_info = json.loads(user[3])  # now it should not raise JSONDecodeError
-            return {'sub': user[0], 'uuid': user[1], 'token': user[2], 'auth_info': auth_info, 'models': models}
+            return {'sub': user[0], 'uuid': user[1], 'token': user[2], 'auth_info': auth_info,
+                    'models': [self.model_to_dict(model) for model in models]}
         return None
 
+    @retry_on_lock
     def add_model(self, uuid, model, name=None, shared=False):
         if name is None:
             name = model
 
         name = self.if_identify(name, shared, uuid, model)
-        model = (name, model, shared, uuid)
         sql = ''' INSERT INTO models(name,uuid,shared,user_uuid)
                   VALUES(?,?,?,?) '''
         conn = self.get_conn()
         cur = conn.cursor()
-        cur.execute(sql, model)
+        cur.execute(sql, (name, model, shared, uuid))
         conn.commit()
         return {'name': name, 'uuid': model, 'shared': shared}
 
+    @retry_on_lock
     def remove_model(self, uuid_user, uuid_model):
         sql = ''' DELETE FROM models WHERE uuid = ? AND user_uuid = ? '''
         conn = self.get_conn()
@@ -127,24 +133,68 @@ class SQLiteProvider:
         conn.commit()
         return None
 
-    def get_models(self, uuid, use_shared=False):
-        cur = self.get_conn().cursor()
+    def get_models(self, uuid, use_shared=False, limit=None, cursor=None, prefix=None):
+        """
+        Returns the models of a user, and the shared models if use_shared is True, ordered by name and UUID.
+
+        Parameters
+        ----------
+        uuid : str
+            UUID of the user.
+        use_shared : bool, optional
+            Whether to include the models shared by all users. Default is False.
+        limit : int, optional
+            Maximum number of models. Default is None, all models.
+        cursor : tuple, optional
+            Name and UUID of the last model of the previous page, only the models after it are returned. Default is
+            None, from the first model.
+        prefix : str, optional
+            Prefix of the model names. Default is None, all names.
+
+        Returns
+        -------
+        list
+            The models as dictionaries with their name, UUID and shared flag.
+
+        Notes
+        ------
+        Pages are selected by keyset on the (name, uuid) indexes, so a page costs the same wherever it is in the
+        catalog. The user's models and the shared models are paged separately and merged, so each part walks its own
+        index.
+        """
+        conditions, params = '', []
+        if cursor is not None:
+            conditions += ' AND (name, uuid) > (?, ?)'
+            params += list(cursor)
+        if prefix:
+            conditions += ' AND name >= ?'
+            params.append(prefix)
+            upper_bound = prefix_upper_bound(prefix)
+            if upper_bound is not None:
+                conditions += ' AND name < ?'
+                params.append(upper_bound)
+        page = ' ORDER BY name, uuid' + (' LIMIT ?' if limit is not None else '')
+        page_params = [limit] if limit is not None else []
+
+        sql = f''' SELECT name, uuid, shared FROM models WHERE user_uuid = ?{conditions}{page} '''
+        sql_params = [uuid, *params, *page_params]
         if use_shared:
-            sql = ''' SELECT * FROM models WHERE user_uuid = ? OR shared = 1'''
-            cur.execute(sql, (uuid,))
-        else:
-            sql = sql_user_models_list
-            cur.execute(sql, (uuid,))
+            sql = f''' SELECT * FROM ({sql})
+                       UNION
+                       SELECT * FROM (SELECT name, uuid, shared FROM models WHERE shared = 1{conditions}{page})
+                       {page} '''
+            sql_params += [*params, *page_params, *page_params]
+        cur = self.get_conn().cursor()
+        cur.execute(sql, sql_params)
         models = cur.fetchall()
-        return [{'name': model[0], 'uuid': model[1], 'shared': model[2]} for model in models]
+        return [self.model_to_dict(model) for model in models]
 
     def get_model_by_uuid(self, uuid_user, uuid_model):
-        sql = ''' SELECT * FROM models WHERE uuid = ? OR shared = 1 AND user_uuid = ? '''
+        sql = ''' SELECT * FROM models WHERE uuid = ? AND (user_uuid = ? OR shared = 1) '''
         cur = self.get_conn().cursor()
         cur.execute(sql, (uuid_model, uuid_user))
         model = cur.fetchone()
         if model is not None:
-            print(model)
             return {'name': model[0], 'uuid': model[1], 'shared': True if model[2] == 1 else False}
         return None
 
@@ -163,6 +213,7 @@ class SQLiteProvider:
         cur.execute(sql, (uuid, sub))
         return cur.fetchone()[0] == 1
 
+    @retry_on_lock
     def edit_model(self, uuid_user, uuid_model, name, shared):
         name = self.if_identify(name, shared, uuid_user, uuid_model)
         conn = self.get_conn()
@@ -188,6 +239,8 @@ class SQLiteProvider:
         return self.get_model_by_uuid(uuid_user, uuid_model)
 
     def if_identify(self, name, shared, uuid_user, uuid_model):
+        if name is None:
+            return None
         if name == '':
             return uuid_model
         if not self.is_identifier(name):
@@ -206,6 +259,95 @@ class SQLiteProvider:
         cur.execute(sql, (name, shared, uuid_user))
         return uuid_model if cur.fetchone() is not None else name
 
+    @retry_on_lock
+    def add_job(self, uuid, user_uuid, params, worker=None):
+        now = time.time()
+        job = (uuid, user_uuid, 'queued', json.dumps(params), json.dumps([]), now, now, worker)
+        sql = ''' INSERT INTO jobs(uuid,user_uuid,status,params,folds,created,updated,worker)
+                  VALUES(?,?,?,?,?,?,?,?) '''
+        conn = self.get_conn()
+        cur = conn.cursor()
+        cur.execute(sql, job)
+        conn.commit()
+        return self.get_job(user_uuid, uuid)
+
+    @retry_on_lock
+    def update_job(self, uuid, status=None, folds=None, result=None, error=None):
+        fields = {'status': status, 'folds': None if folds is None else json.dumps(folds),
+                  'result': None if result is None else json.dumps(result), 'error': error}
+        fields = {name: value for name, value in fields.items() if value is not None}
+        fields['updated'] = time.time()
+        sql = f''' UPDATE jobs SET {', '.join(f'{name} = ?' for name in fields)} WHERE uuid = ? '''
+        conn = self.get_conn()
+        cur = conn.cursor()
+        cur.execute(sql, (*fields.values(), uuid))
+        conn.commit()
+        return None
+
+    @retry_on_lock
+    def finish_job(self, uuid, status, result=None, error=None):
+        # Only the first of the concurrent outcomes of a job (result, failure, cancellation) is recorded
+        fields = {'status': status, 'result': None if result is None else json.dumps(result), 'error': error}
+        fields = {name: value for name, value in fields.items() if value is not None}
+        fields['updated'] = time.time()
+        sql = f''' UPDATE jobs SET {', '.join(f'{name} = ?' for name in fields)}
+                   WHERE uuid = ? AND status NOT IN ('succeeded', 'failed', 'cancelled') '''
+        conn = self.get_conn()
+        cur = conn.cursor()
+        cur.execute(sql, (*fields.values(), uuid))
+        conn.commit()
+        return cur.rowcount > 0
+
+    def get_job(self, uuid_user, uuid_job):
+        sql = ''' SELECT * FROM jobs WHERE uuid = ? AND user_uuid = ? '''
+        cur = self.get_conn().cursor()
+        cur.execute(sql, (uuid_job, uuid_user))
+        job = cur.fetchone()
+        return self.job_to_dict(job) if job is not None else None
+
+    def get_jobs(self, uuid_user):
+        sql = ''' SELECT * FROM jobs WHERE user_uuid = ? ORDER BY created DESC '''
+        cur = self.get_conn().cursor()
+        cur.execute(sql, (uuid_user,))
+        return [self.job_to_dict(job) for job in cur.fetchall()]
+
+    @retry_on_lock
+    def interrupt_jobs(self, error, worker=None):
+        sql = ''' UPDATE jobs SET status = 'failed', error = ?, updated = ? WHERE status IN ('queued', 'running') '''
+        params = (error, time.time())
+        if worker is not None:
+            sql += ''' AND worker = ? '''
+            params += (worker,)
+        conn = self.get_conn()
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        conn.commit()
+        return cur.rowcount
+
+    @staticmethod
+    def model_to_dict(model):
+        return {'name': model[0], 'uuid': model[1], 'shared': model[2]}
+
+    @staticmethod
+    def job_to_dict(job):
+        return {'uuid': job[0], 'status': job[2], 'params': json.loads(job[3]), 'folds': json.loads(job[4]),
+                'result': json.loads(job[5]) if job[5] is not None else None, 'error': job[6], 'created': job[7],
+                'updated': job[8]}
+
     @staticmethod
     def is_identifier(name):
         return re.match(r'^\w+$', name) is not None
+
+
+def prefix_upper_bound(prefix):
+    """
+    Returns the smallest string greater than every string starting with the prefix, or None if there is none. The
+    surrogates, which cannot be encoded in UTF-8 for SQLite, are skipped.
+    """
+    prefix = prefix.rstrip(chr(0x10FFFF))
+    if not prefix:
+        return None
+    following = ord(prefix[-1]) + 1
+    if 0xD800 <= following <= 0xDFFF:
+        following = 0xE000
+    return prefix[:-1] + chr(following)
@@ -1,148 +1,295 @@
-import builtins
+import bisect
+import copy
+import heapq
+import re
+import threading
+import time
 
+from classes.sessionCache import session_cache
 
 class TempProvider:
+    """
+    A thread-safe, in-memory database provider with the interface and the semantics of SQLiteProvider, for test runs
+    and stateless nodes whose users, models and jobs do not need to outlive the process.
+
+    Every table is a dictionary keyed like its SQLite primary key, with secondary indexes for the lookups of the
+    SQLiteProvider indexes, so no lookup scans a whole table. Each table has its own lock, so requests served by
+    different waitress threads only wait for each other when they touch the same table. Locks are always taken in the
+    order users, models, jobs. Records are copied in and out, so callers never share mutable state with the provider.
+
+    Attributes
+    ----------
+    users : dict
+        Users by sub.
+    user_subs : dict
+        Index of the user subs by user UUID.
+    models : dict
+        Models by UUID.
+    user_models : dict
+        Index of the model UUIDs by user UUID, in insertion order.
+    user_catalogs : dict
+        Index of the (name, UUID) of the models by user UUID, sorted, for the keyset pagination of the catalog.
+    model_names : dict
+        Index of the model UUIDs by model name.
+    shared_models : list
+        Index of the (name, UUID) of the shared models, sorted, for the keyset pagination of the catalog.
+    jobs : dict
+        Training jobs by UUID.
+    user_jobs : dict
+        Index of the job UUIDs by user UUID.
+    """
+
     def __init__(self):
-        self.data = {}
+        self.users = {}
+        self.user_subs = {}
+        self.models = {}
+        self.user_models = {}
+        self.user_catalogs = {}
+        self.model_names = {}
+        self.shared_models = []
+        self.jobs = {}
+        self.user_jobs = {}
+        self._users_lock = threading.RLock()
+        self._models_lock = threading.RLock()
+        self._jobs_lock = threading.Lock()
+
+    def close_connection(self):
+        pass
+
+    def close(self):
+        pass
+
+    def stats(self):
+        with self._users_lock, self._models_lock, self._jobs_lock:
+            return {'users': len(self.users), 'models': len(self.models), 'jobs': len(self.jobs)}
 
     def add_user(self, uuid, token, google_payload):
         sub = google_payload['sub']
-        if sub in self.data:
-            return self.data[sub]
-        user = {
-            'sub': sub,
-            'uuid': uuid,
-            'token': token,
-            'auth_info': google_payload,
-            'models': []
-        }
-        self.data[sub] = user
-        self.__print__(sub, 'User added')
-        return user
+        with self._users_lock:
+            if sub not in self.users:
+                self.users[sub] = {'sub': sub, 'uuid': uuid, 'token': token, 'auth_info': copy.deepcopy(google_payload)}
+                self.user_subs[uuid] = sub
+        return self.get_user_by_sub(sub)
 
     def update_user(self, token, google_payload):
         sub = google_payload['sub']
-        user = self.data[sub]
-        user['token'] = token
-        del google_payload['sub']
-        user['auth_info'] = google_payload
-        self.data[sub] = user
-        self.__print__(sub, 'User updated')
-        return user
+        with self._users_lock:
+            user = self.users.get(sub)
+            if user is not None:
+                user['token'] = token
+                user['auth_info'] = copy.deepcopy(google_payload)
+                # The cached session still holds the expiry of the previous token
+                session_cache.invalidate(user['uuid'])
+            return self.get_user_by_sub(sub)
 
-    def remove_user(self, sub):
-        del self.data[sub]
-        self.__print__(sub, 'User removed')
+    def remove_user(self, uuid):
+        with self._users_lock:
+            sub = self.user_subs.pop(uuid, None)
+            self.users.pop(sub, None)
+        session_cache.invalidate(uuid)
         return None
 
     def get_user_by_sub(self, sub):
-        return self.data.get(sub)
+        with self._users_lock:
+            user = self.users.get(sub)
+            if user is None:
+                return None
+            user = copy.deepcopy(user)
+        user['models'] = self._user_models(user['uuid'])
+        return user
 
     def get_user_by_uuid(self, uuid):
-        for user in self.data.values():
-            if user['uuid'] == uuid:
-                return user
-        return None
-
-    # add model to user
-    # def add_model(self, uuid, model, name=None, shared=False):
-    #     if name is None:
-    #         name = model
-    #     # check if model name already exists
-    #     for user in self.data.values():
-    #         for model in user['models']:
-    #             if model['name'] == name:
-    #                 return None
-    #     user = self.get_user_by_uuid(uuid)
-    #     user['models'].append({'name': name, 'uuid': model, 'shared': shared})
-    #     self.data[user['sub']] = user
-    #     return user
+        with self._users_lock:
+            return self.get_user_by_sub(self.user_subs.get(uuid))
 
     def add_model(self, uuid, model, name=None, shared=False):
-        sub = self.convert_uuid_to_sub(uuid)
-        if name is None or name == '':
+        if name is None:
             name = model
-        else:
-            for user in self.data.values():
-                for model_user in user['models']:
-                    if model_user['name'] == name:
-                        return None
-        user = self.get_user_by_sub(sub)
-        print(user['models'])
-        user['models'].append({'name': name, 'uuid': model, 'shared': shared})
-        self.data[sub] = user
-        self.__print__(sub, f'Model {name} added')
-        return user
+        with self._models_lock:
+            if model in self.models:
+                raise ValueError(f'Model {model} already exists')
+            name = self.if_identify(name, shared, uuid, model)
+            self.models[model] = {'name': name, 'uuid': model, 'shared': 1 if shared else 0, 'user_uuid': uuid}
+            self.user_models.setdefault(uuid, {})[model] = None
+            self.model_names.setdefault(name, {})[model] = None
+            self._catalog(self.models[model])
+        return {'name': name, 'uuid': model, 'shared': shared}
 
     def remove_model(self, uuid_user, uuid_model):
-        sub = self.convert_uuid_to_sub(uuid_user)
-        user = self.get_user_by_uuid(uuid_user)
-        name = self.get_model_by_uuid(uuid_user, uuid_model)['name']
-        user['models'] = [model for model in user['models'] if model['uuid'] != uuid_model]
-        self.data[sub] = user
-        self.__print__(sub, f'Model {name} removed')
-        return user
+        with self._models_lock:
+            model = self.models.get(uuid_model)
+            if model is None or model['user_uuid'] != uuid_user:
+                return None
+            del self.models[uuid_model]
+            self._discard(self.user_models, uuid_user, uuid_model)
+            self._discard(self.model_names, model['name'], uuid_model)
+            self._uncatalog(model)
+        return None
 
-    # get all models for user
-    def get_models(self, uuid, shared=False):
-        sub = self.convert_uuid_to_sub(uuid)
-        user = self.data[sub]
-        if shared:
-            return [model for model in user['models'] if model['shared']]
-        return user['models']
+    def get_models(self, uuid, use_shared=False, limit=None, cursor=None, prefix=None):
+        with self._models_lock:
+            catalogs = [self.user_catalogs.get(uuid, [])]
+            if use_shared:
+                catalogs.append(self.shared_models)
+            # Like the SQLite indexes, every sorted catalog is read from the cursor or the prefix onwards
+            pages = []
+            for catalog in catalogs:
+                start = bisect.bisect_right(catalog, tuple(cursor)) if cursor is not None else 0
+                if prefix:
+                    start = max(start, bisect.bisect_left(catalog, (prefix,)))
+                pages.append(catalog[start:start + limit] if limit is not None else catalog[start:])
+            models = []
+            previous = None
+            for key in heapq.merge(*pages):
+                if limit is not None and len(models) == limit or prefix and not key[0].startswith(prefix):
+                    break
+                # A shared model of the user is in both catalogs
+                if key != previous:
+                    models.append(self._model_to_dict(self.models[key[1]]))
+                previous = key
+            return models
 
-    # get model by uuid
     def get_model_by_uuid(self, uuid_user, uuid_model):
-        sub = self.convert_uuid_to_sub(uuid_user)
-        user = self.data[sub]
-        for model in user['models']:
-            if model['uuid'] == uuid_model:
-                return model
-        return None
+        with self._models_lock:
+            model = self.models.get(uuid_model)
+            if model is None or model['user_uuid'] != uuid_user and not model['shared']:
+                return None
+            return {'name': model['name'], 'uuid': model['uuid'], 'shared': model['shared'] == 1}
 
-    # get model by name
     def get_model_by_name(self, uuid_user, name):
-        sub = self.convert_uuid_to_sub(uuid_user)
-        user = self.data[sub]
-        for model in user['models']:
-            if model['name'] == name:
-                return model
+        with self._models_lock:
+            for model_uuid in self.model_names.get(name, ()):
+                model = self.models[model_uuid]
+                if model['user_uuid'] == uuid_user:
+                    return {'name': model['name'], 'uuid': model['uuid'], 'shared': model['shared'] == 1}
         return None
 
-    # get all shared models for all users
-    def get_shared_models(self):
-        shared_models = []
-        for user in self.data.values():
-            for model in user['models']:
-                if model['shared']:
-                    shared_models.append(model)
-        return shared_models
-
-    # bool if model is shared
     def model_is_shared(self, sub, uuid):
-        model = self.get_model_by_uuid(sub, uuid)
-        return model['shared']
-
-    def convert_uuid_to_sub(self, uuid):
-        user = self.get_user_by_uuid(uuid)
-        return user['sub']
-
-    def convert_sub_to_uuid(self, sub):
-        user = self.get_user_by_sub(sub)
-        return user['uuid']
-
-    def __print__(self, sub, message):
-        builtins.print(f'{sub}: {message}')
-
-    def edit_model(self, user_uuid, uuid, new_name=None, shared=None):
-        sub = self.convert_uuid_to_sub(user_uuid)
-        user = self.data[sub]
-        for model in user['models']:
-            if model['uuid'] == uuid:
-                if new_name is not None:
-                    model['name'] = new_name
+        with self._users_lock, self._models_lock:
+            user = self.users.get(sub)
+            model = self.models.get(uuid)
+            return user is not None and model is not None and model['user_uuid'] == user['uuid'] \
+                and model['shared'] == 1
+
+    def edit_model(self, uuid_user, uuid_model, name, shared):
+        with self._models_lock:
+            name = self.if_identify(name, shared, uuid_user, uuid_model)
+            if name is None and shared is None:
+                return None
+            model = self.models.get(uuid_model)
+            if model is not None and model['user_uuid'] == uuid_user:
+                self._uncatalog(model)
+                if name is not None:
+                    self._discard(self.model_names, model['name'], uuid_model)
+                    model['name'] = name
+                    self.model_names.setdefault(name, {})[uuid_model] = None
                 if shared is not None:
-                    model['shared'] = shared
-                break
-        self.data[sub] = user
-        return user
+                    model['shared'] = 1 if shared else 0
+                self._catalog(model)
+            return self.get_model_by_uuid(uuid_user, uuid_model)
+
+    def if_identify(self, name, shared, uuid_user, uuid_model):
+        if name is None:
+            return None
+        if name == '':
+            return uuid_model
+        if not self.is_identifier(name):
+            return uuid_model
+        with self._models_lock:
+            if name != uuid_model and name in self.models:
+                return uuid_model
+            # Like SQL, a shared flag of None matches no model
+            for model_uuid in self.model_names.get(name, ()) if shared is not None else ():
+                model = self.models[model_uuid]
+                if model['shared'] == (1 if shared else 0) and (model['user_uuid'] != uuid_user) == bool(shared):
+                    return uuid_model
+        return name
+
+    def add_job(self, uuid, user_uuid, params, worker=None):
+        now = time.time()
+        with self._jobs_lock:
+            self.jobs[uuid] = {'uuid': uuid, 'user_uuid': user_uuid, 'status': 'queued',
+                               'params': copy.deepcopy(params), 'folds': [], 'result': None, 'error': None,
+                               'created': now, 'updated': now, 'worker': worker}
+            self.user_jobs.setdefault(user_uuid, {})[uuid] = None
+        return self.get_job(user_uuid, uuid)
+
+    def update_job(self, uuid, status=None, folds=None, result=None, error=None):
+        fields = {'status': status, 'folds': copy.deepcopy(folds), 'result': copy.deepcopy(result), 'error': error}
+        with self._jobs_lock:
+            job = self.jobs.get(uuid)
+            if job is not None:
+                job.update({name: value for name, value in fields.items() if value is not None})
+                job['updated'] = time.time()
+        return None
+
+    def finish_job(self, uuid, status, result=None, error=None):
+        fields = {'status': status, 'result': copy.deepcopy(result), 'error': error}
+        with self._jobs_lock:
+            job = self.jobs.get(uuid)
+            if job is None or job['status'] in ('succeeded', 'failed', 'cancelled'):
+                return False
+            job.update({name: value for name, value in fields.items() if value is not None})
+            job['updated'] = time.time()
+        return True
+
+    def get_job(self, uuid_user, uuid_job):
+        with self._jobs_lock:
+            job = self.jobs.get(uuid_job)
+            if job is None or job['user_uuid'] != uuid_user:
+                return None
+            return self.job_to_dict(job)
+
+    def get_jobs(self, uuid_user):
+        with self._jobs_lock:
+            jobs = [self.job_to_dict(self.jobs[job_uuid]) for job_uuid in self.user_jobs.get(uuid_user, ())]
+        return sorted(jobs, key=lambda job: job['created'], reverse=True)
+
+    def interrupt_jobs(self, error, worker=None):
+        now = time.time()
+        interrupted = 0
+        with self._jobs_lock:
+            for job in self.jobs.values():
+                if job['status'] in ('queued', 'running') and worker in (None, job['worker']):
+                    job.update(status='failed', error=error, updated=now)
+                    interrupted += 1
+        return interrupted
+
+    def _user_models(self, uuid):
+        with self._models_lock:
+            return [self._model_to_dict(self.models[model_uuid]) for model_uuid in self.user_models.get(uuid, ())]
+
+    def _catalog(self, model):
+        key = (model['name'], model['uuid'])
+        bisect.insort(self.user_catalogs.setdefault(model['user_uuid'], []), key)
+        if model['shared']:
+            bisect.insort(self.shared_models, key)
+
+    def _uncatalog(self, model):
+        key = (model['name'], model['uuid'])
+        for catalog in (self.user_catalogs.get(model['user_uuid'], []), self.shared_models):
+            index = bisect.bisect_left(catalog, key)
+            if index < len(catalog) and catalog[index] == key:
+                del catalog[index]
+        if not self.user_catalogs.get(model['user_uuid'], True):
+            del self.user_catalogs[model['user_uuid']]
+
+    @staticmethod
+    def _model_to_dict(model):
+        return {'name': model['name'], 'uuid': model['uuid'], 'shared': model['shared']}
+
+    @staticmethod
+    def _discard(index, key, value):
+        values = index.get(key)
+        if values is not None:
+            values.pop(value, None)
+            if not values:
+                del index[key]
+
+    @staticmethod
+    def job_to_dict(job):
+        return {name: copy.deepcopy(value) for name, value in job.items() if name not in ('user_uuid', 'worker')}
+
+    @staticmethod
+    def is_identifier(name):
+        return re.match(r'^\w+$', name) is not None
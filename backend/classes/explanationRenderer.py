@@ -0,0 +1,116 @@
+import base64
+import io
+import json
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+
+class ExplanationRenderer:
+    """
+    A thread-safe renderer of LIME explanations.
+
+    Every render draws on its own Figure attached to an Agg canvas instead of the global pyplot state, so concurrent
+    requests never share a current figure and no figure is left registered in pyplot once the render is done.
+
+    Attributes
+    ----------
+    formats : tuple
+        Names of the supported output formats.
+
+    Methods
+    -------
+    render(explanation, output_format: str = 'image', label: int = 1)
+        Returns the explanation rendered in an output format.
+    figure(explanation, label: int = 1)
+        Returns the bar chart of the explanation as a standalone figure.
+    """
+    formats = ('image', 'svg', 'json', 'html')
+
+    @staticmethod
+    def render(explanation, output_format: str = 'image', label: int = 1) -> str:
+        """
+        Returns the explanation rendered in an output format.
+
+        Parameters
+        ----------
+        explanation : lime.explanation.Explanation
+            The explanation to render.
+        output_format : str, optional
+            'image' for a base64 encoded PNG bar chart, 'svg' for an SVG bar chart, 'json' for the weights as JSON or
+            'html' for the LIME HTML page. Default is 'image'.
+        label : int, optional
+            Index of the explained class. Default is 1, like LIME.
+
+        Returns
+        -------
+        str
+            The rendered explanation.
+
+        Raises
+        ------
+        ValueError
+            If the output format is not supported.
+        """
+        if output_format not in ExplanationRenderer.formats:
+            raise ValueError(f"Output format must be one of {', '.join(ExplanationRenderer.formats)}.")
+        if output_format == 'html':
+            return explanation.as_html()
+        if output_format == 'json':
+            return ExplanationRenderer._json(explanation, label)
+
+        figure = ExplanationRenderer.figure(explanation, label)
+        buffer = io.BytesIO()
+        try:
+            figure.savefig(buffer, format='png' if output_format == 'image' else 'svg', metadata={'Date': None})
+        finally:
+            figure.clear()
+        if output_format == 'svg':
+            return buffer.getvalue().decode()
+        return base64.b64encode(buffer.getvalue()).decode()
+
+    @staticmethod
+    def figure(explanation, label: int = 1) -> Figure:
+        """
+        Returns the bar chart of the explanation as a standalone figure, drawn like lime's as_pyplot_figure.
+
+        Parameters
+        ----------
+        explanation : lime.explanation.Explanation
+            The explanation to draw.
+        label : int, optional
+            Index of the explained class. Default is 1, like LIME.
+
+        Returns
+        -------
+        matplotlib.figure.Figure
+            The figure, attached to an Agg canvas and unknown to pyplot.
+        """
+        weights = explanation.as_list(label=label)
+        figure = Figure(figsize=(6, max(8, int(len(weights) * 0.2))))
+        FigureCanvasAgg(figure)
+        axes = figure.add_subplot()
+        values = [weight for _, weight in reversed(weights)]
+        names = [name for name, _ in reversed(weights)]
+        positions = np.arange(len(weights)) + .5
+        axes.barh(positions, values, align='center', color=['green' if value > 0 else 'red' for value in values])
+        axes.set_yticks(positions, names)
+        axes.set_title(f'Local explanation for class {explanation.class_names[label]}')
+        return figure
+
+    @staticmethod
+    def _json(explanation, label):
+        class_names = [_to_python(name) for name in explanation.class_names]
+        probabilities = explanation.predict_proba
+        return json.dumps({
+            'class': class_names[label],
+            'class_names': class_names,
+            'probabilities': None if probabilities is None else [float(p) for p in probabilities],
+            'intercept': _to_python(explanation.intercept.get(label)),
+            'weights': [[name, float(weight)] for name, weight in explanation.as_list(label=label)]
+        })
+
+
+def _to_python(value):
+    return value.item() if isinstance(value, np.generic) else value
@@ -0,0 +1,310 @@
+import glob
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+import uuid
+
+from classes.modelStorage import ModelStorage
+
+interrupted_constant = "Interrupted by a server restart."
+worker_exited_constant = "Interrupted by the exit of the server worker running it."
+finished_statuses = ('succeeded', 'failed', 'cancelled')
+
+
+class JobQueue:
+    """
+    A bounded pool of background training jobs whose state is stored by a database provider.
+
+    Every job trains a model in its own process, so training does not hold the GIL of the server, survives client
+    disconnects and can be cancelled by terminating the process. The job process leads its own process group, and
+    passes its termination on to the worker processes it starts to preprocess the dataset or fit the folds. The
+    temporary file of a model whose saving was interrupted is removed once the process exited. The metrics of every fold are stored as soon as the
+    fold is evaluated, so clients can poll the progress of the job.
+
+    Attributes
+    ----------
+    provider : SQLiteProvider or TempProvider
+        Database provider storing the state of the jobs.
+    max_workers : int
+        Maximum number of jobs running at the same time.
+    shared : bool
+        Whether the jobs of the provider are shared with the job queues of other server processes.
+
+    Methods
+    -------
+    submit(user_uuid: str, params: dict, train_params: dict, dataset_path: str, model_path: str, on_success=None)
+        Queues a training job and returns it.
+    cancel(job_uuid: str)
+        Cancels a queued or running job.
+    shutdown(timeout: float = 5.0)
+        Fails the queued and running jobs and terminates the running ones, before the server process exits.
+    """
+
+    def __init__(self, provider, max_workers: int = 2, shared: bool = False):
+        """
+        Initialize the JobQueue class. Jobs left queued or running by a previous server are marked as failed, unless
+        the queue is shared.
+
+        Parameters
+        ----------
+        provider : SQLiteProvider or TempProvider
+            Database provider storing the state of the jobs.
+        max_workers : int, optional
+            Maximum number of jobs running at the same time. Default is 2.
+        shared : bool, optional
+            Whether other server processes queue jobs in the same provider, like the workers of a pre-forked server.
+            Their unfinished jobs are then not interrupted, which is left to the process starting the workers: every
+            job records the process ID of its queue, so the jobs of a worker which exits can be marked as failed. The
+            jobs cancelled by another process are stopped within a second. Default is False.
+        """
+        self.provider = provider
+        self.max_workers = max_workers
+        self.shared = shared
+        self._pending = queue.Queue()
+        self._running = {}
+        self._cancelled = set()
+        self._workers = []
+        self._closed = False
+        self._lock = threading.Lock()
+        self._context = multiprocessing.get_context('spawn')
+        if not shared:
+            provider.interrupt_jobs(interrupted_constant)
+        provider.close_connection()
+
+    def submit(self, user_uuid: str, params: dict, train_params: dict, dataset_path: str, model_path: str,
+               on_success=None) -> dict:
+        """
+        Queues a training job and returns it.
+
+        Parameters
+        ----------
+        user_uuid : str
+            UUID of the user who owns the job.
+        params : dict
+            Parameters of the job stored with it.
+        train_params : dict
+            Keyword arguments of App.train_model, except the dataset.
+        dataset_path : str
+            Path to the dataset file. The file is removed when the job finishes.
+        model_path : str
+            Path the trained model is saved to.
+        on_success : callable, optional
+            Called with the accuracy and f1-score once the model is saved. It may return a dictionary which is added to
+            the result of the job.
+
+        Returns
+        -------
+        dict
+            The queued job.
+        """
+        job_uuid = str(uuid.uuid4())
+        job = self.provider.add_job(job_uuid, user_uuid, params, worker=os.getpid() if self.shared else None)
+        self._start_workers()
+        self._pending.put((job_uuid, user_uuid, train_params, dataset_path, model_path, on_success))
+        return job
+
+    def cancel(self, job_uuid: str):
+        """
+        Cancels a queued or running job. A running job is stopped by terminating its process.
+
+        Parameters
+        ----------
+        job_uuid : str
+            UUID of the job.
+        """
+        with self._lock:
+            self._cancelled.add(job_uuid)
+            running = self._running.get(job_uuid)
+        self.provider.finish_job(job_uuid, 'cancelled')
+        if running is not None:
+            running[0].terminate()
+
+    def shutdown(self, timeout: float = 5.0):
+        """
+        Stops the queue before the server process exits: the queued jobs are not started, the running jobs are
+        terminated, and both are marked as failed.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Number of seconds to wait for every terminated job process. Default is 5.
+        """
+        with self._lock:
+            self._closed = True
+            running = dict(self._running)
+        while True:
+            try:
+                job_uuid, _, _, dataset_path, _, _ = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            self.provider.finish_job(job_uuid, 'failed', error=interrupted_constant)
+            remove_file(dataset_path)
+        for job_uuid, (process, _) in running.items():
+            self.provider.finish_job(job_uuid, 'failed', error=interrupted_constant)
+            process.terminate()
+        for process, model_path in running.values():
+            process.join(timeout)
+            remove_temporary_files(model_path)
+        self.provider.close_connection()
+
+    def _start_workers(self):
+        with self._lock:
+            while len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._work, name='training-job-worker', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def _work(self):
+        while True:
+            job_uuid, user_uuid, train_params, dataset_path, model_path, on_success = self._pending.get()
+            try:
+                self._run(job_uuid, user_uuid, train_params, dataset_path, model_path, on_success)
+            except Exception as e:
+                print(f' ! Training job {job_uuid} failed: {e}')
+                self.provider.update_job(job_uuid, status='failed', error=str(e))
+            finally:
+                with self._lock:
+                    self._running.pop(job_uuid, None)
+                    self._cancelled.discard(job_uuid)
+                remove_file(dataset_path)
+                self.provider.close_connection()
+
+    def _update_job(self, job_uuid, **fields):
+        # Returns the connection of the worker to the provider's pool while the training process runs
+        self.provider.update_job(job_uuid, **fields)
+        self.provider.close_connection()
+
+    def _is_cancelled(self, job_uuid, user_uuid) -> bool:
+        with self._lock:
+            if job_uuid in self._cancelled:
+                return True
+        if not self.shared:
+            return False
+        # The job may have been cancelled by another process sharing the provider
+        job = self.provider.get_job(user_uuid, job_uuid)
+        self.provider.close_connection()
+        if job is None or job['status'] != 'cancelled':
+            return False
+        with self._lock:
+            self._cancelled.add(job_uuid)
+        return True
+
+    def _run(self, job_uuid, user_uuid, train_params, dataset_path, model_path, on_success):
+        if self._is_cancelled(job_uuid, user_uuid):
+            return
+        messages = self._context.Queue()
+        process = self._context.Process(target=run_training,
+                                        args=(train_params, dataset_path, model_path, messages, os.getpid()),
+                                        daemon=True)
+        with self._lock:
+            if job_uuid in self._cancelled or self._closed:
+                return
+            process.start()
+            self._running[job_uuid] = process, model_path
+        self._update_job(job_uuid, status='running')
+
+        folds = []
+        outcome = None
+        while outcome is None:
+            try:
+                kind, value = messages.get(timeout=0.5)
+            except queue.Empty:
+                if process.is_alive():
+                    if self.shared and self._is_cancelled(job_uuid, user_uuid):
+                        process.terminate()
+                    continue
+                try:
+                    kind, value = messages.get(timeout=0.5)
+                except queue.Empty:
+                    break
+            if kind == 'fold':
+                folds.append(value)
+                self._update_job(job_uuid, folds=folds)
+            else:
+                outcome = kind, value
+        process.join()
+        remove_temporary_files(model_path)
+
+        cancelled = self._is_cancelled(job_uuid, user_uuid)
+        if cancelled:
+            remove_file(model_path)
+        elif outcome is not None and outcome[0] == 'done':
+            result = outcome[1]
+            # A job cancelled since the check stays cancelled, and its model is not registered
+            if not self.provider.finish_job(job_uuid, 'succeeded', result=result):
+                remove_file(model_path)
+            elif on_success is not None:
+                result.update(on_success(result) or {})
+                self.provider.update_job(job_uuid, result=result)
+        else:
+            error = outcome[1] if outcome is not None else f'Training process exited with code {process.exitcode}'
+            self.provider.finish_job(job_uuid, 'failed', error=error)
+
+
+def run_training(train_params: dict, dataset_path: str, model_path: str, messages, parent: int = None):
+    """
+    Trains and saves a model in a job process, reporting the metrics of every fold and the result through messages.
+    The process exits without saving the model once the server process which started it, given by parent, is gone.
+    """
+    lead_process_group()
+    if parent is not None:
+        threading.Thread(target=watch_parent, args=(parent,), name='parent-watch', daemon=True).start()
+    try:
+        from apis.model import App
+        model, accuracy, f1 = App.train_model(dataset=dataset_path, **train_params,
+                                              on_fold=lambda metrics: messages.put(('fold', metrics)))
+        if parent is not None and os.getppid() != parent:
+            return
+        ModelStorage.save(model, model_path)
+        messages.put(('done', {'accuracy': accuracy, 'f1': f1}))
+    except Exception as e:
+        messages.put(('error', str(e)))
+
+
+def watch_parent(parent: int, interval: float = 1.0):
+    """
+    Exits the job process once its parent process is gone, so a crashed or killed server leaves no training behind.
+    """
+    while os.getppid() == parent:
+        time.sleep(interval)
+    terminate_group()
+    os._exit(1)
+
+
+def lead_process_group():
+    """
+    Makes the job process lead a new process group, which the worker processes it starts join, and terminate the group
+    with it on SIGTERM. Only on POSIX systems.
+    """
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+        signal.signal(signal.SIGTERM, terminate_group)
+
+
+def terminate_group(signum=None, frame=None):
+    """
+    Terminates the process group led by the job process, with the worker processes it started, and the job process
+    itself when called as its SIGTERM handler. Does nothing in a process which does not lead its group.
+    """
+    if not hasattr(os, 'killpg') or os.getpgrp() != os.getpid():
+        return
+    signal.signal(signal.SIGTERM, signal.SIG_DFL if signum is not None else signal.SIG_IGN)
+    os.killpg(os.getpgrp(), signal.SIGTERM)
+
+
+def remove_temporary_files(model_path: str):
+    """
+    Removes the temporary files left next to a model file by a job process terminated while saving the model.
+    """
+    for path in glob.glob(f'{glob.escape(model_path)}.*.tmp'):
+        remove_file(path)
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,129 @@
+import numpy as np
+from lime.explanation import Explanation
+from lime.lime_text import IndexedString, TextDomainMapper
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
+from sklearn.base import clone
+from sklearn.pipeline import Pipeline
+from sklearn.svm import SVC
+
+from classes.textPreprocessing import TextNormalizer
+
+
+class LinearExplainer:
+    """
+    An exact, sampling-free explainer of pipelines made of a text normalizer, a bag-of-words vectorizer and a linear
+    model.
+
+    The decision value of a linear model is the sum of the vectorized text multiplied by the model coefficients, so the
+    contribution of every feature follows from one sparse product instead of the thousands of perturbed predictions
+    LIME samples. The contributions are returned as a LIME explanation, so they are rendered by the same figure and
+    HTML code.
+
+    Methods
+    -------
+    supports(pipeline: Pipeline)
+        Checks whether the contributions of a pipeline can be computed exactly.
+    explain(pipeline: Pipeline, text: str, num_features: int = 10, label: int = 1)
+        Returns the exact contributions of the words of a text to the prediction of a label.
+    """
+
+    @staticmethod
+    def supports(pipeline: Pipeline) -> bool:
+        """
+        Checks whether the contributions of a pipeline can be computed exactly, which requires a text normalizer, a
+        unigram word vectorizer and a model with one row of coefficients per class (a single row for two classes) and
+        probabilities.
+
+        Parameters
+        ----------
+        pipeline : sklearn Pipeline
+            A trained pipeline.
+
+        Returns
+        -------
+        bool
+            True if the pipeline can be explained exactly.
+        """
+        if len(pipeline.steps) != 3 or not isinstance(pipeline.steps[0][1], TextNormalizer):
+            return False
+        vectorizer = pipeline.named_steps.get('vectorizer')
+        model = pipeline.named_steps.get('model')
+        if not isinstance(vectorizer, (CountVectorizer, HashingVectorizer)) or vectorizer.analyzer != 'word' \
+                or vectorizer.ngram_range != (1, 1) or not hasattr(model, 'predict_proba'):
+            return False
+        try:
+            coef = model.coef_
+        except AttributeError:
+            # The coefficients of kernel SVC models are only defined for the linear kernel
+            return False
+        n_classes = len(model.classes_)
+        if isinstance(model, SVC) and n_classes > 2:
+            # Multiclass SVC models have one-vs-one coefficients
+            return False
+        return coef.shape[0] == (1 if n_classes == 2 else n_classes)
+
+    @staticmethod
+    def explain(pipeline: Pipeline, text: str, num_features: int = 10, label: int = 1) -> Explanation:
+        """
+        Returns the exact contributions of the words of a text to the decision value of a label.
+
+        Parameters
+        ----------
+        pipeline : sklearn Pipeline
+            A trained pipeline supported by the explainer.
+        text : str
+            Text to explain.
+        num_features : int, optional
+            Maximum number of words in the explanation. Default is 10.
+        label : int, optional
+            Index of the explained class. Default is 1, like LIME.
+
+        Returns
+        -------
+        lime.explanation.Explanation
+            The explanation, whose weights are the contributions of the words to the decision value.
+
+        Notes
+        ------
+        The words of the explanation are the whitespace separated tokens of the text, the ones the normalizer
+        preprocesses. When several words produce the same feature, its contribution is shared in proportion to their
+        occurrences, so the weights and the intercept sum to the decision value of the label.
+        """
+        normalizer, vectorizer, model = (step for _, step in pipeline.steps)
+        indexed_string = IndexedString(text, split_expression=str.split, bow=True)
+        words = indexed_string.inverse_vocab
+        counts = np.array([len(positions) for positions in indexed_string.positions], dtype=float)
+
+        coef = model.coef_.toarray() if sparse.issparse(model.coef_) else np.asarray(model.coef_)
+        row = 0 if coef.shape[0] == 1 else label
+        sign = -1.0 if coef.shape[0] == 1 and label == 0 else 1.0
+        # One sparse product gives the contribution of every feature of the text
+        features = vectorizer.transform(normalizer.transform([text]))
+        contributions = sign * np.asarray(features.multiply(coef[row]).sum(axis=0)).ravel()
+
+        occurrences = sparse.diags(counts) @ _count_features(vectorizer, normalizer.transform(words))
+        totals = np.asarray(occurrences.sum(axis=0)).ravel()
+        shares = np.divide(contributions, totals, out=np.zeros_like(contributions), where=totals > 0)
+        weights = np.asarray(occurrences @ shares).ravel()
+
+        intercept = sign * float(np.ravel(model.intercept_)[row])
+        order = [i for i in np.argsort(-np.abs(weights), kind='stable') if weights[i] != 0][:num_features]
+        explanation = Explanation(TextDomainMapper(indexed_string), class_names=model.classes_)
+        explanation.local_exp = {label: [(int(i), float(weights[i])) for i in order]}
+        explanation.intercept = {label: intercept}
+        explanation.score = 1.0
+        explanation.local_pred = np.array([intercept + weights.sum()])
+        explanation.predict_proba = pipeline.predict_proba([text])[0]
+        return explanation
+
+
+def _count_features(vectorizer, texts):
+    """
+    Returns the raw feature counts of texts as the vectorizer tokenizes them, before any weighting or normalization.
+    """
+    if isinstance(vectorizer, HashingVectorizer):
+        counter = clone(vectorizer).set_params(norm=None, alternate_sign=False, binary=False)
+    else:
+        counter = CountVectorizer(vocabulary=vectorizer.vocabulary_, analyzer=vectorizer.build_analyzer())
+    return counter.transform(texts).tocsr()
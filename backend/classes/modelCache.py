@@ -0,0 +1,252 @@
+import os
+import threading
+from collections import Counter, OrderedDict
+
+from classes.modelStorage import ModelStorage
+
+default_max_bytes = 512 * 1024 * 1024
+
+
+class ModelCache:
+    """
+    A process-wide, thread-safe LRU cache of loaded model pipelines.
+
+    Models are identified by their file (the model UUID is the file name) and are reloaded whenever the file
+    modification time or size changes. The memory budget is accounted using the size of the model file, which is a
+    close estimate of the unpickled pipeline. The arrays of a memory-mapped model (see ModelStorage) are not part of
+    the heap of the process though: they are pages of the file in the OS page cache, read on first use, shared by every
+    process mapping the file and reclaimed by the OS under memory pressure. For those models the budget bounds the
+    size of the mapped files rather than the memory resident in the process.
+
+    Attributes
+    ----------
+    max_bytes : int
+        Memory budget of the cache in bytes. A value of 0 disables caching.
+    hits : int
+        Number of requests served from the cache.
+    misses : int
+        Number of requests that had to load the model from disk.
+    evictions : int
+        Number of models evicted to stay within the memory budget.
+
+    Methods
+    -------
+    get(model_path: str)
+        Returns the pipeline stored at the given path, loading it if necessary.
+    warm(model_path: str)
+        Loads the model stored at the given path if necessary, without counting a request.
+    invalidate(model_path: str)
+        Removes the model stored at the given path from the cache.
+    resize(max_bytes: int)
+        Changes the memory budget, evicting models if necessary.
+    clear()
+        Removes all models from the cache and resets the statistics.
+    models()
+        Returns the UUIDs of the cached models.
+    usage()
+        Returns the number of requests for every model.
+    stats()
+        Returns the cache statistics.
+    """
+
+    def __init__(self, max_bytes: int = default_max_bytes):
+        """
+        Initialize the ModelCache class.
+
+        Parameters
+        ----------
+        max_bytes : int, optional
+            Memory budget of the cache in bytes. Default is 512 MB.
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._uses = Counter()
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    @staticmethod
+    def model_uuid(model_path: str) -> str:
+        """
+        Returns the UUID of the model stored at the given path.
+        """
+        return os.path.splitext(os.path.basename(model_path))[0]
+
+    def get(self, model_path: str):
+        """
+        Returns the pipeline stored at the given path, loading it if it is not cached or the file has changed.
+
+        Parameters
+        ----------
+        model_path : str
+            Path to the trained model file.
+
+        Returns
+        -------
+        sklearn Pipeline
+            The loaded pipeline.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the model file is not found at the specified path.
+        """
+        return self._get(model_path, count=True)
+
+    def warm(self, model_path: str):
+        """
+        Loads the model stored at the given path if it is not cached or the file has changed, without counting a
+        request in the statistics, to preload a model or swap in a new version of its file.
+
+        Parameters
+        ----------
+        model_path : str
+            Path to the trained model file.
+
+        Returns
+        -------
+        sklearn Pipeline
+            The loaded pipeline.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the model file is not found at the specified path.
+        """
+        return self._get(model_path, count=False)
+
+    def invalidate(self, model_path: str):
+        """
+        Removes the model stored at the given path from the cache.
+
+        Parameters
+        ----------
+        model_path : str
+            Path to the model file.
+        """
+        key = os.path.abspath(model_path)
+        with self._lock:
+            self._remove(key)
+
+    def resize(self, max_bytes: int):
+        """
+        Changes the memory budget of the cache, evicting the least recently used models if necessary.
+
+        Parameters
+        ----------
+        max_bytes : int
+            New memory budget in bytes.
+        """
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        """
+        Removes all models from the cache and resets the statistics.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = self.misses = self.evictions = 0
+            self._uses.clear()
+
+    def models(self) -> list:
+        """
+        Returns the UUIDs of the cached models, from the least to the most recently used.
+        """
+        with self._lock:
+            return [self.model_uuid(key) for key in self._entries]
+
+    def usage(self) -> dict:
+        """
+        Returns the number of requests for every model UUID since the cache was created or cleared.
+        """
+        with self._lock:
+            return dict(self._uses)
+
+    def stats(self) -> dict:
+        """
+        Returns the cache statistics.
+
+        Returns
+        -------
+        dict
+            Hits, misses, evictions, hit rate, number of cached models and memory usage.
+        """
+        with self._lock:
+            requests = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'hit_rate': self.hits / requests if requests else 0.0, 'models': len(self._entries),
+                    'bytes': self.current_bytes, 'max_bytes': self.max_bytes}
+
+    def _get(self, model_path, count):
+        key = os.path.abspath(model_path)
+        stat = os.stat(key)
+        with self._lock:
+            if count:
+                self._uses[self.model_uuid(key)] += 1
+            pipeline = self._lookup(key, stat)
+            if pipeline is not None:
+                if count:
+                    self.hits += 1
+                return pipeline
+            # The lock of a model is shared by the threads loading it, and dropped once the last of them is done
+            load = self._load_locks.setdefault(key, [threading.Lock(), 0])
+            load[1] += 1
+
+        # Only one thread loads a given model, the others wait and reuse its result
+        try:
+            with load[0]:
+                with self._lock:
+                    pipeline = self._lookup(key, stat)
+                    if pipeline is not None:
+                        if count:
+                            self.hits += 1
+                        return pipeline
+                    if count:
+                        self.misses += 1
+                pipeline = ModelStorage.load(key)
+                with self._lock:
+                    self._store(key, stat, pipeline)
+            return pipeline
+        finally:
+            with self._lock:
+                load[1] -= 1
+                if load[1] == 0:
+                    del self._load_locks[key]
+
+    def _lookup(self, key, stat):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry['mtime'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry['pipeline']
+
+    def _store(self, key, stat, pipeline):
+        self._remove(key)
+        if stat.st_size > self.max_bytes:
+            return
+        self._entries[key] = {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'pipeline': pipeline}
+        self.current_bytes += stat.st_size
+        self._evict()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry['size']
+
+    def _evict(self):
+        while self._entries and self.current_bytes > self.max_bytes:
+            _, entry = self._entries.popitem(last=False)
+            self.current_bytes -= entry['size']
+            self.evictions += 1
+
+
+model_cache = ModelCache()
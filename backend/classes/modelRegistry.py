@@ -0,0 +1,398 @@
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+
+from classes.modelCache import ModelCache, model_cache
+
+try:
+    import fcntl
+except ImportError:
+    # Windows, where the server runs in a single process
+    fcntl = None
+
+default_interval = 5.0
+usage_file_name = 'model_usage.json'
+usage_lock_file_name = 'model_usage.json.lock'
+
+
+class ModelRegistry:
+    """
+    Preloads the models of a model directory into the model cache and keeps the cache in sync with the model files.
+
+    Once started, a background thread loads the models, the most requested ones first, then scans the directory every
+    interval seconds: models added out of band are loaded before they are first requested, models whose file was
+    replaced are reloaded, and models whose file was deleted are dropped. A new version of a model is unpickled
+    completely before it replaces the previous one in the cache, so a request always gets a whole pipeline, and one
+    still running on the previous version keeps reading its memory-mapped file until it completes.
+
+    The number of requests for every model is added to model_usage.json in the model directory, so the next start
+    preloads the most requested models first. The requests counted since the last save are added to the file as it is
+    then, under an exclusive lock on model_usage.json.lock, so the workers of a pre-forked server each add their own
+    requests without losing the ones another worker saves at the same time.
+
+    Attributes
+    ----------
+    cache : ModelCache
+        The cache the models are loaded into.
+    model_dir : str
+        Absolute path to the model directory, None until the registry is started.
+    limit : int or None
+        Maximum number of preloaded models, None to preload every model within the budget of the cache.
+    interval : float
+        Number of seconds between two scans of the model directory, 0 to disable the scans.
+    ready : bool
+        Whether the models were preloaded.
+    failed : dict
+        Error of every model UUID whose file could not be loaded, until the file changes.
+
+    Methods
+    -------
+    start(model_dir: str, preload: str = 'all', interval: float = 5.0)
+        Starts preloading and watching the models of a directory in the background.
+    load(model_dir: str, preload: str = 'all')
+        Preloads the models of a directory in the calling thread.
+    stop()
+        Stops the background thread and saves the model usage.
+    preload()
+        Loads the most requested models into the cache.
+    poll()
+        Scans the model directory once and loads, reloads or drops the models whose file changed.
+    save_usage()
+        Saves the number of requests for every model.
+    status()
+        Returns the readiness of the registry and the loaded models.
+    stats()
+        Returns the readiness of the registry and the number of loaded models, without identifying them.
+    """
+
+    def __init__(self, cache: ModelCache = model_cache):
+        """
+        Initialize the ModelRegistry class.
+
+        Parameters
+        ----------
+        cache : ModelCache, optional
+            The cache the models are loaded into. Default is the process-wide model cache.
+        """
+        self.cache = cache
+        self.model_dir = None
+        self.limit = None
+        self.interval = default_interval
+        self.ready = True
+        self.failed = {}
+        self._files = {}
+        self._counted_usage = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.RLock()
+
+    def start(self, model_dir: str, preload: str = 'all', interval: float = default_interval):
+        """
+        Starts preloading and watching the models of a directory in a background thread, stopping the previous one.
+
+        Parameters
+        ----------
+        model_dir : str
+            Path to the model directory.
+        preload : str, optional
+            'all' to preload every model within the budget of the cache, 'none' to load the models on their first
+            request, or the maximum number of models to preload. Default is 'all'.
+        interval : float, optional
+            Number of seconds between two scans of the model directory, 0 to disable the scans. Default is 5.
+
+        Raises
+        ------
+        ValueError
+            If preload is neither 'all', 'none' nor a number of models, or the interval is negative.
+        """
+        limit = parse_preload(preload)
+        if interval < 0:
+            raise ValueError("Watch interval must be at least 0.")
+        self._configure(model_dir, limit, interval)
+        if limit == 0 and interval == 0:
+            return
+        self._thread = threading.Thread(target=self._run, args=(self._stop,), name='model-registry', daemon=True)
+        self._thread.start()
+
+    def load(self, model_dir: str, preload: str = 'all') -> list:
+        """
+        Preloads the models of a directory in the calling thread, stopping the background thread, if any. A pre-forked
+        server loads the models before it starts its workers, which share the loaded models with it.
+
+        Parameters
+        ----------
+        model_dir : str
+            Path to the model directory.
+        preload : str, optional
+            'all' to preload every model within the budget of the cache, 'none' to load none, or the maximum number
+            of models to preload. Default is 'all'.
+
+        Returns
+        -------
+        list
+            The UUIDs of the preloaded models.
+
+        Raises
+        ------
+        ValueError
+            If preload is neither 'all', 'none' nor a number of models.
+        """
+        self._configure(model_dir, parse_preload(preload), 0)
+        return self.preload()
+
+    def stop(self):
+        """
+        Stops the background thread, if any, and saves the model usage.
+        """
+        thread, self._thread = self._thread, None
+        self._stop.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self._stop = threading.Event()
+        if self.model_dir is not None:
+            self.save_usage()
+
+    def preload(self) -> list:
+        """
+        Loads the models of the model directory into the cache, the most requested first, then the most recently
+        modified, until the limit or the memory budget of the cache is reached. The registry is ready afterwards.
+
+        Returns
+        -------
+        list
+            The UUIDs of the preloaded models.
+        """
+        try:
+            with self._lock:
+                files = self._scan()
+                self._files = dict(files)
+                usage = self._usage()
+                order = sorted(files, key=lambda path: (-usage.get(ModelCache.model_uuid(path), 0),
+                                                        -files[path][0]))
+                if self.limit is not None:
+                    order = order[:self.limit]
+                loaded = []
+                budget = self.cache.max_bytes
+                for path in order:
+                    if self._stop.is_set():
+                        break
+                    size = files[path][1]
+                    if size > budget:
+                        continue
+                    if self._load(path):
+                        loaded.append(ModelCache.model_uuid(path))
+                        budget -= size
+                return loaded
+        finally:
+            self.ready = True
+
+    def poll(self) -> dict:
+        """
+        Scans the model directory once. New model files are loaded unless the cache already holds as many models as
+        the preload limit, replaced files of cached models are reloaded, and the models of deleted files are dropped.
+        The model usage is saved if it changed.
+
+        Returns
+        -------
+        dict
+            The UUIDs of the 'loaded', 'reloaded' and 'removed' models.
+        """
+        changes = {'loaded': [], 'reloaded': [], 'removed': []}
+        with self._lock:
+            files = self._scan()
+            cached = set(self.cache.models())
+            for path in set(self._files) - set(files):
+                model_uuid = ModelCache.model_uuid(path)
+                self.cache.invalidate(path)
+                self.failed.pop(model_uuid, None)
+                changes['removed'].append(model_uuid)
+            for path, stat in files.items():
+                previous = self._files.get(path)
+                if previous == stat:
+                    continue
+                model_uuid = ModelCache.model_uuid(path)
+                if model_uuid in cached:
+                    kind = 'reloaded'
+                elif self.limit is None or (self.limit > 0 and len(cached) < self.limit):
+                    kind = 'loaded'
+                else:
+                    continue
+                if self._load(path):
+                    cached.add(model_uuid)
+                    changes[kind].append(model_uuid)
+            self._files = files
+        self.save_usage()
+        return changes
+
+    def save_usage(self):
+        """
+        Adds the requests for every model since the last save to model_usage.json in the model directory.
+        """
+        with self._lock:
+            if self.model_dir is None or not os.path.isdir(self.model_dir):
+                return
+            counted = self.cache.usage()
+            if not self._unsaved_usage(counted):
+                return
+            path = os.path.join(self.model_dir, usage_file_name)
+            tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+            try:
+                with self._usage_lock():
+                    usage = self._usage(counted)
+                    with open(tmp_path, 'w', encoding='utf-8') as f:
+                        json.dump(usage, f)
+                    os.replace(tmp_path, path)
+                self._counted_usage = counted
+            except OSError as e:
+                print(f" ! Model usage could not be saved: {e}")
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def status(self) -> dict:
+        """
+        Returns the readiness of the registry and the loaded models.
+
+        Returns
+        -------
+        dict
+            Whether the models were preloaded, the UUIDs of the models in the cache, the errors of the model files
+            which could not be loaded, and whether the model directory is watched.
+        """
+        thread = self._thread
+        return {'ready': self.ready, 'models': sorted(self.cache.models()), 'failed': dict(self.failed),
+                'watching': self.interval > 0 and thread is not None and thread.is_alive()}
+
+    def stats(self) -> dict:
+        """
+        Returns the readiness of the registry and the number of loaded models. Unlike status(), the models are not
+        identified, since knowing the UUID of a model is enough to use it.
+
+        Returns
+        -------
+        dict
+            Whether the models were preloaded, the number of models in the cache and of model files which could not be
+            loaded, and whether the model directory is watched.
+        """
+        status = self.status()
+        return {**status, 'models': len(status['models']), 'failed': len(status['failed'])}
+
+    def _configure(self, model_dir: str, limit: int | None, interval: float):
+        self.stop()
+        with self._lock:
+            self.model_dir = os.path.abspath(model_dir)
+            self.limit = limit
+            self.interval = interval
+            self.ready = limit == 0
+            self.failed = {}
+            self._files = {}
+            self._counted_usage = self.cache.usage()
+
+    def _run(self, stop: threading.Event):
+        if self.limit != 0:
+            self.preload()
+        else:
+            with self._lock:
+                self._files = self._scan()
+        while self.interval > 0 and not stop.wait(self.interval):
+            self.poll()
+
+    def _scan(self) -> dict:
+        files = {}
+        try:
+            entries = list(os.scandir(self.model_dir))
+        except OSError:
+            return files
+        for entry in entries:
+            if entry.name.endswith('.mdl') and entry.is_file():
+                stat = entry.stat()
+                files[os.path.abspath(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def _load(self, path: str) -> bool:
+        model_uuid = ModelCache.model_uuid(path)
+        try:
+            self.cache.warm(path)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            self.failed[model_uuid] = str(e) or type(e).__name__
+            print(f" ! Model {model_uuid} could not be loaded: {self.failed[model_uuid]}")
+            return False
+        self.failed.pop(model_uuid, None)
+        return True
+
+    def _unsaved_usage(self, counted: dict) -> dict:
+        # The requests counted by the cache before the registry was started or last saved are already in the file
+        unsaved = {}
+        for model_uuid, uses in counted.items():
+            uses -= self._counted_usage.get(model_uuid, 0)
+            if uses > 0:
+                unsaved[model_uuid] = uses
+        return unsaved
+
+    def _usage(self, counted: dict = None) -> dict:
+        usage = self._read_usage()
+        for model_uuid, uses in self._unsaved_usage(self.cache.usage() if counted is None else counted).items():
+            usage[model_uuid] = usage.get(model_uuid, 0) + uses
+        return usage
+
+    @contextmanager
+    def _usage_lock(self):
+        # The lock file is never removed, a process could otherwise lock a file another one already replaced
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.model_dir, usage_lock_file_name), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_usage(self) -> dict:
+        try:
+            with open(os.path.join(self.model_dir, usage_file_name), encoding='utf-8') as f:
+                usage = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(usage, dict):
+            return {}
+        return {str(model_uuid): uses for model_uuid, uses in usage.items() if isinstance(uses, int)}
+
+
+def parse_preload(preload) -> int | None:
+    """
+    Converts the preload option of the registry to the maximum number of preloaded models.
+
+    Parameters
+    ----------
+    preload : str or int
+        'all', 'none' or a number of models.
+
+    Returns
+    -------
+    int or None
+        None for 'all', 0 for 'none', else the number of models.
+
+    Raises
+    ------
+    ValueError
+        If preload is neither 'all', 'none' nor a non-negative number.
+    """
+    if preload in ('all', None):
+        return None
+    if preload == 'none':
+        return 0
+    try:
+        limit = int(preload)
+    except (TypeError, ValueError):
+        limit = -1
+    if limit < 0:
+        raise ValueError("Preload must be 'all', 'none' or a number of models.")
+    return limit
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,127 @@
+import numpy as np
+from scipy import sparse
+from sklearn.base import BaseEstimator
+from sklearn.feature_extraction.text import CountVectorizer
+
+default_tolerance = 1e-6
+
+
+class ModelSlimmer:
+    """
+    Removes the state a fitted pipeline only needs for training from the artifact it is saved to.
+
+    Methods
+    -------
+    slim(pipeline)
+        Drops the training-only attributes of the vectorizers.
+    downcast(pipeline, texts, tolerance: float = 1e-6)
+        Stores the fitted coefficients in single precision when the predictions of the pipeline stay the same.
+    """
+
+    @staticmethod
+    def slim(pipeline):
+        """
+        Drops the stop_words_ of the CountVectorizer and TfidfVectorizer steps of a pipeline, the set of every term
+        pruned by max_df, min_df or max_features which is only kept for introspection. The predictions of the pipeline
+        are unchanged.
+
+        The vocabulary_ is kept a built-in dictionary: the vectorizer looks every token up in it, so a mapping
+        implemented in Python would slow down every prediction, and a dictionary unpickled when the model is loaded
+        before the server workers are forked is shared with them rather than rebuilt in every worker.
+
+        Parameters
+        ----------
+        pipeline : sklearn Pipeline
+            A fitted pipeline, slimmed in place. Other objects are left as they are.
+
+        Returns
+        -------
+        sklearn Pipeline
+            The slimmed pipeline.
+        """
+        for _, step in getattr(pipeline, 'steps', []):
+            if not isinstance(step, CountVectorizer):
+                continue
+            if hasattr(step, 'stop_words_'):
+                del step.stop_words_
+        return pipeline
+
+    @staticmethod
+    def downcast(pipeline, texts, tolerance: float = default_tolerance) -> bool:
+        """
+        Converts the float64 arrays fitted by the steps of a pipeline, such as coefficients and IDF weights, to
+        float32, and keeps them only if the pipeline still predicts the same labels for the texts, with probabilities
+        within the tolerance.
+
+        Parameters
+        ----------
+        pipeline : sklearn Pipeline
+            A fitted pipeline, converted in place.
+        texts : list or pd.Series
+            Texts in the input format of the pipeline to compare the predictions on, typically a sample of the
+            training data.
+        tolerance : float, optional
+            Maximum absolute difference of the probabilities or decision values. Default is 1e-6.
+
+        Returns
+        -------
+        bool
+            True if the arrays were converted, False if the predictions changed, the steps cannot predict from
+            float32 arrays (the libsvm models SVC and SVR) or there were no texts to compare the predictions on.
+        """
+        arrays = list(_float_arrays(pipeline))
+        if not arrays or len(texts) == 0:
+            return False
+        reference = _outputs(pipeline, texts)
+        converted = {}
+        for owner, name, value in arrays:
+            if id(value) not in converted:
+                converted[id(value)] = value.astype(np.float32)
+            setattr(owner, name, converted[id(value)])
+        try:
+            outputs = _outputs(pipeline, texts)
+            kept = all(_same(output, expected, tolerance) for output, expected in zip(outputs, reference))
+        except (TypeError, ValueError):
+            kept = False
+        if not kept:
+            for owner, name, value in arrays:
+                setattr(owner, name, value)
+        return kept
+
+
+def _float_arrays(pipeline):
+    """
+    Yields the owner, attribute name and value of the float64 arrays and sparse matrices held by the steps of a
+    pipeline and by the estimators nested in them.
+    """
+    pending = [step for _, step in getattr(pipeline, 'steps', [])]
+    seen = set()
+    while pending:
+        estimator = pending.pop()
+        if id(estimator) in seen or not hasattr(estimator, '__dict__'):
+            continue
+        seen.add(id(estimator))
+        for name, value in vars(estimator).items():
+            if (isinstance(value, np.ndarray) or sparse.issparse(value)) and value.dtype == np.float64:
+                yield estimator, name, value
+            elif isinstance(value, BaseEstimator):
+                pending.append(value)
+            elif isinstance(value, (list, tuple)):
+                pending.extend(item for item in value if isinstance(item, BaseEstimator))
+
+
+def _outputs(pipeline, texts) -> list:
+    outputs = [pipeline.predict(texts)]
+    if hasattr(pipeline, 'predict_proba'):
+        outputs.append(pipeline.predict_proba(texts))
+    elif hasattr(pipeline, 'decision_function'):
+        outputs.append(pipeline.decision_function(texts))
+    return outputs
+
+
+def _same(output, expected, tolerance: float) -> bool:
+    if output.shape != expected.shape:
+        return False
+    if np.issubdtype(expected.dtype, np.floating):
+        return bool(np.allclose(output, expected, rtol=0, atol=tolerance))
+    return bool(np.array_equal(output, expected))
@@ -0,0 +1,113 @@
+import os
+import uuid
+
+import joblib
+
+from classes.modelSlimmer import ModelSlimmer
+
+
+class ModelStorage:
+    """
+    Saves and loads model pipelines as joblib pickles whose numeric arrays are memory-mapped when loaded.
+
+    joblib writes the arrays of an uncompressed pickle as raw, aligned buffers, so they can be mapped instead of read:
+    the support vectors, coefficients and IDF weights of a model are then paged in by the OS on first use and shared
+    through the page cache by every process serving the model, and loading a model takes about the same time whatever
+    its size. Mapped arrays are read-only, which prediction never needs to change.
+
+    Models are not memory-mapped on Windows: a mapped file stays open as long as any array of the model is referenced,
+    by the model cache or a request in progress, and Windows refuses to delete or replace an open file, so deleting or
+    retraining a cached model would fail.
+
+    A model file is replaced atomically, so a process which has mapped the previous file keeps reading consistent
+    data. Models are slimmed before they are saved, see ModelSlimmer.slim. Compressed pickles, saved to spare disk
+    space or by other tools, are loaded into memory as before.
+
+    Attributes
+    ----------
+    mmap_mode : str or None
+        Mode the arrays are memory-mapped with, None where models are read into memory.
+
+    Methods
+    -------
+    save(model, path: str, compress: int = 0)
+        Slims a model and saves it to a file, replacing it atomically.
+    load(model, mmap: bool = True)
+        Loads a model from a file path or a file object.
+    is_mappable(path: str)
+        Checks whether the arrays of a model file can be memory-mapped.
+    """
+    mmap_mode = None if os.name == 'nt' else 'r'
+
+    @staticmethod
+    def save(model, path: str, compress: int = 0):
+        """
+        Slims a model and saves it as a joblib pickle, through a temporary file which then replaces the file at path.
+
+        Parameters
+        ----------
+        model : sklearn Pipeline
+            The model to save, slimmed in place.
+        path : str
+            Path to the model file. Its directory is created if necessary.
+        compress : int, optional
+            zlib compression level from 0 to 9. A compressed model takes less disk space but is read into memory
+            instead of being memory-mapped. Default is 0, uncompressed.
+        """
+        ModelSlimmer.slim(model)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Created by joblib, the temporary file gets the same permissions as a model file saved directly
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        try:
+            joblib.dump(model, tmp_path, compress=compress)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def load(model, mmap: bool = True):
+        """
+        Loads a model, memory-mapping its arrays when it is read from an uncompressed file.
+
+        Parameters
+        ----------
+        model : str or file-like
+            Path to the model file, or a file object such as an uploaded file, which is always read into memory.
+        mmap : bool, optional
+            Whether to memory-map the arrays of a model file, unless mmap_mode is None. Default is True.
+
+        Returns
+        -------
+        sklearn Pipeline
+            The loaded model.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the model file is not found at the specified path.
+        """
+        if not isinstance(model, (str, os.PathLike)):
+            return joblib.load(model)
+        if not mmap or ModelStorage.mmap_mode is None or not ModelStorage.is_mappable(model):
+            return joblib.load(model)
+        return joblib.load(model, mmap_mode=ModelStorage.mmap_mode)
+
+    @staticmethod
+    def is_mappable(path: str) -> bool:
+        """
+        Checks whether the arrays of a model file can be memory-mapped, which requires an uncompressed pickle. Every
+        pickle starts with the PROTO opcode, while compressed files start with the magic number of their compressor.
+
+        Parameters
+        ----------
+        path : str
+            Path to the model file.
+
+        Returns
+        -------
+        bool
+            True if the file is an uncompressed pickle.
+        """
+        with open(path, 'rb') as f:
+            return f.read(1) == b'\x80'
@@ -0,0 +1,281 @@
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+
+from waitress import create_server, wasyncore
+
+default_restart_delay = 1.0
+max_restart_delay = 30.0
+min_uptime = 5.0
+
+
+class PreforkServer:
+    """
+    Serves a WSGI application from several pre-forked worker processes accepting the connections of one listening
+    socket, so requests are not bound to the GIL of a single process.
+
+    The parent process binds the socket and forks the workers. Whatever the parent loaded before, such as the models
+    of the model cache, is shared with the workers copy-on-write. Every worker creates its application and serves it
+    with waitress. The parent supervises the workers and replaces the ones which exit, waiting longer after every
+    worker which exits within a few seconds of its start, and stops them on SIGTERM or SIGINT. The parent is told about
+    every worker which exited, to clean up the work it left unfinished.
+
+    A worker stops on SIGTERM: it stops accepting connections, which the other workers keep accepting, completes the
+    requests in progress and closes the idle connections, stops its application, then exits.
+
+    Attributes
+    ----------
+    app_factory : callable
+        Creates the WSGI application in every worker.
+    address : str
+        The IP address to listen on.
+    port : int
+        The port to listen on, the bound port once the server runs.
+    workers : int
+        Number of worker processes.
+    restart_delay : float
+        Number of seconds to wait before the first restart of a worker which exited right after its start.
+    shutdown_timeout : float
+        Number of seconds the workers have to exit when the server stops before they are killed.
+    on_stop : callable or None
+        Called in a stopping worker with its application once the requests in progress completed.
+    on_exit : callable or None
+        Called in the parent with the process ID of every worker which exited.
+    restarts : int
+        Number of workers restarted since the server started.
+
+    Methods
+    -------
+    run()
+        Binds the socket, starts the workers and supervises them until the server is stopped.
+    stop()
+        Stops the server and its workers.
+    pids()
+        Returns the process IDs of the running workers.
+    """
+
+    def __init__(self, app_factory, address: str, port: int, workers: int, restart_delay: float = default_restart_delay,
+                 shutdown_timeout: float = 10.0, on_stop=None, on_exit=None):
+        """
+        Initialize the PreforkServer class.
+
+        Parameters
+        ----------
+        app_factory : callable
+            Creates the WSGI application in every worker.
+        address : str
+            The IP address to listen on.
+        port : int
+            The port to listen on, 0 for any free port.
+        workers : int
+            Number of worker processes.
+        restart_delay : float, optional
+            Number of seconds to wait before the first restart of a worker which exited right after its start, doubled
+            after every following one up to 30 seconds. Default is 1.
+        shutdown_timeout : float, optional
+            Number of seconds the workers have to exit when the server stops before they are killed. The requests in
+            progress have half of it to complete, the application has the rest to stop. Default is 10.
+        on_stop : callable, optional
+            Called in a stopping worker with its application once the requests in progress completed, to stop its
+            background work before the worker exits. Default is None.
+        on_exit : callable, optional
+            Called in the parent with the process ID of every worker which exited, whether it crashed, was killed or
+            was stopped with the server, before it is replaced. Default is None.
+
+        Raises
+        ------
+        ValueError
+            If the number of workers is less than 1, or processes cannot be forked on this platform.
+        """
+        if not hasattr(os, 'fork'):
+            raise ValueError("Worker processes require a platform which supports fork.")
+        if workers < 1:
+            raise ValueError("Number of workers must be at least 1.")
+        self.app_factory = app_factory
+        self.address = address
+        self.port = port
+        self.workers = workers
+        self.restart_delay = restart_delay
+        self.shutdown_timeout = shutdown_timeout
+        self.on_stop = on_stop
+        self.on_exit = on_exit
+        self.restarts = 0
+        self._socket = None
+        self._draining = False
+        self._stopped = threading.Event()
+        self._children = {}
+        self._failures = 0
+
+    def run(self):
+        """
+        Binds the socket, starts the workers and supervises them until the server is stopped by stop(), SIGTERM or
+        SIGINT.
+        """
+        self._socket = self._bind()
+        self.port = self._socket.getsockname()[1]
+        self._stopped.clear()
+        handlers = {}
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                handlers[signum] = signal.signal(signum, self._handle_signal)
+        try:
+            print(f" * Serving on {self.address}:{self.port} with {self.workers} worker processes")
+            for _ in range(self.workers):
+                self._spawn()
+            self._supervise()
+        finally:
+            self._stopped.set()
+            self._terminate()
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+            self._socket.close()
+
+    def stop(self):
+        """
+        Stops the server. The workers get SIGTERM and the server returns from run() once they exited.
+        """
+        self._stopped.set()
+        for pid in list(self._children):
+            self._kill(pid, signal.SIGTERM)
+
+    def pids(self) -> list:
+        """
+        Returns the process IDs of the running workers.
+
+        Returns
+        -------
+        list
+            The process IDs of the workers.
+        """
+        return list(self._children)
+
+    def _bind(self) -> socket.socket:
+        family = socket.AF_INET6 if ':' in self.address else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((self.address, self.port))
+            sock.listen(socket.SOMAXCONN)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            self._work()
+        self._children[pid] = time.monotonic()
+
+    def _work(self):
+        # Runs in the forked worker and never returns
+        code = 0
+        self._children = {}
+        try:
+            # Ctrl+C reaches the whole process group, the parent stops the workers itself
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            app = self.app_factory()
+            server = create_server(app, sockets=[self._socket])
+            signal.signal(signal.SIGTERM, self._drain)
+            self._serve(server)
+            if self.on_stop is not None:
+                self.on_stop(app)
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    def _drain(self, signum, frame):
+        self._draining = True
+
+    def _serve(self, server):
+        use_poll = server.adj.asyncore_use_poll
+        while not self._draining:
+            wasyncore.loop(timeout=server.adj.asyncore_loop_timeout, use_poll=use_poll, map=server._map, count=1)
+        # New connections are left to the other workers, the requests in progress complete
+        server.accepting = False
+        deadline = time.monotonic() + self.shutdown_timeout / 2
+        while time.monotonic() < deadline:
+            busy = False
+            for channel in list(server.active_channels.values()):
+                if channel.requests or channel.total_outbufs_len:
+                    busy = True
+                else:
+                    channel.will_close = True
+            if not busy:
+                break
+            wasyncore.loop(timeout=0.05, use_poll=use_poll, map=server._map, count=1)
+        server.task_dispatcher.shutdown()
+        server.close()
+
+    def _supervise(self):
+        while not self._stopped.is_set():
+            try:
+                pid, status = os.waitpid(-1, 0)
+            except ChildProcessError:
+                return
+            started = self._children.pop(pid, None)
+            if started is None:
+                continue
+            self._exited(pid)
+            if self._stopped.is_set():
+                continue
+            print(f" ! Worker {pid} exited with code {os.waitstatus_to_exitcode(status)}, restarting it")
+            if time.monotonic() - started < min_uptime:
+                delay = min(self.restart_delay * 2 ** self._failures, max_restart_delay)
+                self._failures += 1
+                self._stopped.wait(delay)
+            else:
+                self._failures = 0
+            if not self._stopped.is_set():
+                self._spawn()
+                self.restarts += 1
+
+    def _handle_signal(self, signum, frame):
+        self.stop()
+
+    def _terminate(self):
+        for pid in list(self._children):
+            self._kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.shutdown_timeout
+        while self._children and time.monotonic() < deadline:
+            for pid in list(self._children):
+                if self._reap(pid, os.WNOHANG):
+                    self._children.pop(pid)
+                    self._exited(pid)
+            time.sleep(0.05)
+        for pid in list(self._children):
+            self._kill(pid, signal.SIGKILL)
+            self._reap(pid, 0)
+            self._children.pop(pid)
+            self._exited(pid)
+
+    def _exited(self, pid: int):
+        if self.on_exit is None:
+            return
+        try:
+            self.on_exit(pid)
+        except Exception as e:
+            print(f" ! Cleanup after worker {pid} failed: {e}")
+
+    @staticmethod
+    def _reap(pid: int, options: int) -> bool:
+        try:
+            return os.waitpid(pid, options)[0] != 0
+        except ChildProcessError:
+            return True
+
+    @staticmethod
+    def _kill(pid: int, signum: int):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
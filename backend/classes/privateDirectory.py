@@ -0,0 +1,43 @@
+import os
+import stat
+
+# Directory of the backend, under which the on-disk caches are kept by default
+app_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+cache_directory = os.path.join(app_directory, 'cache')
+
+
+def private_directory(path: str) -> str:
+    """
+    Creates a directory only the current user can access, or checks that an existing one is private.
+
+    The on-disk caches unpickle the files they load, so a cache directory other users can write to would let them run
+    code in the server by planting a file under a predictable name.
+
+    Parameters
+    ----------
+    path : str
+        Path to the directory.
+
+    Returns
+    -------
+    str
+        The path to the directory.
+
+    Raises
+    ------
+    PermissionError
+        If the directory is a symbolic link, is owned by another user, or can be written by other users.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if stat.S_ISLNK(info.st_mode) or not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"Cache directory {path} must be a directory, not a link.")
+    if not hasattr(os, 'getuid'):
+        return path
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"Cache directory {path} must be owned by the user running the server.")
+    if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(f"Cache directory {path} must not be writable by other users.")
+    if info.st_mode & 0o077:
+        os.chmod(path, 0o700)
+    return path
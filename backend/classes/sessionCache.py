@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import OrderedDict
+
+default_ttl = 300
+default_max_sessions = 100000
+
+
+class SessionCache:
+    """
+    A process-wide, thread-safe cache of authenticated sessions, mapping a user UUID to the expiry of their token.
+
+    Authentication only needs the token expiry, so caching it saves the user and model queries and the decoding of the
+    user's auth info on every request. A session is kept for at most ttl seconds, after which the user is read from the
+    database again, and the least recently used sessions are dropped beyond max_sessions. The database providers
+    invalidate the session of a user whose token they update or whom they remove.
+
+    The cache belongs to the process. The workers of a pre-forked server each have their own, so a worker only sees a
+    logout, a new token or a removed user handled by another worker once its own cached session outlives the time to
+    live, up to ttl seconds later.
+
+    Attributes
+    ----------
+    ttl : float
+        Number of seconds a session is kept. A value of 0 disables caching.
+    max_sessions : int
+        Maximum number of cached sessions.
+    hits : int
+        Number of lookups answered from the cache.
+    misses : int
+        Number of lookups that had to read the user from the database.
+
+    Methods
+    -------
+    get(user_uuid: str)
+        Returns the token expiry of a cached session, or None.
+    store(user_uuid: str, expiry: int)
+        Caches the token expiry of a user.
+    invalidate(user_uuid: str)
+        Removes the session of a user.
+    configure(ttl: float = None, max_sessions: int = None)
+        Changes the time to live and the size of the cache.
+    clear()
+        Removes all sessions and resets the statistics.
+    stats()
+        Returns the cache statistics.
+    """
+
+    def __init__(self, ttl: float = default_ttl, max_sessions: int = default_max_sessions):
+        """
+        Initialize the SessionCache class.
+
+        Parameters
+        ----------
+        ttl : float, optional
+            Number of seconds a session is kept. Default is 300.
+        max_sessions : int, optional
+            Maximum number of cached sessions. Default is 100000.
+        """
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.hits = 0
+        self.misses = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_uuid: str):
+        """
+        Returns the token expiry of the cached session of a user.
+
+        Parameters
+        ----------
+        user_uuid : str
+            UUID of the user.
+
+        Returns
+        -------
+        int or None
+            The token expiry as a Unix timestamp, or None if the session is not cached or has outlived the time to live.
+        """
+        with self._lock:
+            session = self._sessions.get(user_uuid)
+            if session is not None and session[1] > time.monotonic():
+                self._sessions.move_to_end(user_uuid)
+                self.hits += 1
+                return session[0]
+            if session is not None:
+                del self._sessions[user_uuid]
+            self.misses += 1
+            return None
+
+    def store(self, user_uuid: str, expiry: int):
+        """
+        Caches the token expiry of a user for the time to live.
+
+        Parameters
+        ----------
+        user_uuid : str
+            UUID of the user.
+        expiry : int
+            Token expiry as a Unix timestamp.
+        """
+        with self._lock:
+            if self.ttl <= 0 or self.max_sessions <= 0:
+                return
+            self._sessions[user_uuid] = (expiry, time.monotonic() + self.ttl)
+            self._sessions.move_to_end(user_uuid)
+            self._evict()
+
+    def invalidate(self, user_uuid: str):
+        """
+        Removes the session of a user, so the next request reads the user from the database.
+
+        Parameters
+        ----------
+        user_uuid : str
+            UUID of the user.
+        """
+        with self._lock:
+            self._sessions.pop(user_uuid, None)
+
+    def configure(self, ttl: float = None, max_sessions: int = None):
+        """
+        Changes the time to live and the size of the cache, dropping the cached sessions.
+
+        Parameters
+        ----------
+        ttl : float, optional
+            New number of seconds a session is kept. Default is None, unchanged.
+        max_sessions : int, optional
+            New maximum number of cached sessions. Default is None, unchanged.
+        """
+        with self._lock:
+            if ttl is not None:
+                self.ttl = ttl
+            if max_sessions is not None:
+                self.max_sessions = max_sessions
+            self._sessions.clear()
+
+    def clear(self):
+        """
+        Removes all sessions and resets the statistics.
+        """
+        with self._lock:
+            self._sessions.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        Returns the cache statistics.
+
+        Returns
+        -------
+        dict
+            Hits, misses, hit rate and number of cached sessions.
+        """
+        with self._lock:
+            requests = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / requests if requests else 0.0,
+                    'sessions': len(self._sessions), 'max_sessions': self.max_sessions, 'ttl': self.ttl}
+
+    def _evict(self):
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+
+session_cache = SessionCache()
@@ -0,0 +1,286 @@
+import itertools
+import os
+import threading
+from collections import deque
+
+import pandas as pd
+from nltk.stem import PorterStemmer
+from sklearn.base import BaseEstimator, TransformerMixin
+from tqdm import tqdm
+
+tqdm.pandas()
+
+punctuation_pattern = r'[!"#$%&\'()*+,-./:;<=>?@[\\]^_`{|}~]]'
+default_max_words = 500000
+default_chunk_size = 20000
+# Part of the corpus cache keys, must be increased whenever the output of the preprocessing changes
+preprocessing_version = 1
+
+
+class StemCache:
+    """
+    A process-wide, thread-safe memo of Porter stems, so that every distinct word is stemmed only once.
+
+    Attributes
+    ----------
+    max_words : int
+        Maximum number of words kept in the memo. The oldest words are dropped first.
+    hits : int
+        Number of words found in the memo.
+    misses : int
+        Number of words that had to be stemmed.
+
+    Methods
+    -------
+    stem(word: str)
+        Returns the stem of a word.
+    lookup(words)
+        Returns a word to stem table for the given distinct words.
+    clear()
+        Removes all words from the memo and resets the statistics.
+    stats()
+        Returns the memo statistics.
+    """
+
+    def __init__(self, max_words: int = default_max_words):
+        """
+        Initialize the StemCache class.
+
+        Parameters
+        ----------
+        max_words : int, optional
+            Maximum number of words kept in the memo. Default is 500000.
+        """
+        self.max_words = max_words
+        self.hits = 0
+        self.misses = 0
+        self.stemmer = PorterStemmer()
+        self._stems = {}
+        self._lock = threading.Lock()
+
+    def stem(self, word: str) -> str:
+        """
+        Returns the stem of a word.
+        """
+        return self.lookup([word])[word]
+
+    def lookup(self, words) -> dict:
+        """
+        Returns a word to stem table for the given distinct words, stemming only the words missing from the memo.
+
+        Parameters
+        ----------
+        words : iterable of str
+            Distinct words to stem.
+
+        Returns
+        -------
+        dict
+            The stem of every word.
+        """
+        with self._lock:
+            table = {word: self._stems.get(word) for word in words}
+        missing = [word for word, stem in table.items() if stem is None]
+        for word in missing:
+            table[word] = self.stemmer.stem(word)
+        with self._lock:
+            self.hits += len(table) - len(missing)
+            self.misses += len(missing)
+            self._stems.update((word, table[word]) for word in missing[:self.max_words])
+            overflow = len(self._stems) - self.max_words
+            if overflow > 0:
+                for word in list(itertools.islice(self._stems, overflow)):
+                    del self._stems[word]
+        return table
+
+    def clear(self):
+        """
+        Removes all words from the memo and resets the statistics.
+        """
+        with self._lock:
+            self._stems.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        Returns the memo statistics.
+
+        Returns
+        -------
+        dict
+            Hits, misses and number of memoized words.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'words': len(self._stems), 'max_words': self.max_words}
+
+
+stem_cache = StemCache()
+
+
+def preprocess_texts(texts: pd.Series, n_jobs: int = 1, chunk_size: int = default_chunk_size,
+                     progress: bool = False) -> pd.Series:
+    """
+    Lowercases, cleans and stems every text of a series.
+
+    Parameters
+    ----------
+    texts : pd.Series
+        Texts to preprocess.
+    n_jobs : int, optional
+        Number of worker processes. -1 uses all CPU cores. Default is 1.
+    chunk_size : int, optional
+        Number of texts preprocessed by a worker at once. Default is 20000.
+    progress : bool, optional
+        Whether to display a progress bar. Default is False.
+
+    Returns
+    -------
+    pd.Series
+        The preprocessed texts, with the same index.
+
+    Raises
+    ------
+    ValueError
+        If the chunk size is less than 1.
+
+    Notes
+    ------
+    The texts are tokenized first, then every distinct token of the corpus is stemmed once through the shared stem
+    memo and the corpus is mapped through the resulting table. With several jobs the series is split into chunks which
+    are preprocessed in a process pool and reassembled in order, giving the same result as the serial path.
+    """
+    if chunk_size < 1:
+        raise ValueError("Chunk size must be greater than 0.")
+    n_jobs = resolve_n_jobs(n_jobs)
+    if n_jobs == 1 or len(texts) <= chunk_size:
+        return _preprocess_chunk(texts, progress)
+
+    from concurrent.futures import ProcessPoolExecutor
+    chunks = [texts.iloc[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+    with ProcessPoolExecutor(max_workers=min(n_jobs, len(chunks))) as executor:
+        results = executor.map(_preprocess_chunk, chunks)
+        return pd.concat(list(tqdm(results, total=len(chunks), unit='chunk', disable=not progress)))
+
+
+def preprocess_chunks(chunks, n_jobs: int = 1):
+    """
+    Lowercases, cleans and stems a stream of text series, yielding every preprocessed series in order.
+
+    Parameters
+    ----------
+    chunks : iterable of pd.Series
+        Texts to preprocess, consumed lazily.
+    n_jobs : int, optional
+        Number of worker processes. -1 uses all CPU cores. Default is 1.
+
+    Returns
+    -------
+    generator
+        Generator of the preprocessed series, with the same indexes.
+
+    Notes
+    ------
+    With several jobs at most two chunks per worker are read ahead, so the memory used tracks the chunk size rather
+    than the size of the whole stream.
+    """
+    n_jobs = resolve_n_jobs(n_jobs)
+    if n_jobs == 1:
+        yield from map(_preprocess_chunk, chunks)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        yield from ordered_map(executor, _preprocess_chunk, chunks, 2 * n_jobs)
+
+
+def preprocess_text(text: str) -> str:
+    """
+    Lowercases, cleans and stems a single text.
+    """
+    return _preprocess_chunk(pd.Series([text])).iloc[0]
+
+
+class TextNormalizer(BaseEstimator, TransformerMixin):
+    """
+    A scikit-learn transformer that lowercases, cleans and stems texts, so the preprocessing used for training is
+    stored in the pipeline and applied identically wherever the model is used.
+
+    Attributes
+    ----------
+    n_jobs : int
+        Number of worker processes. -1 uses all CPU cores.
+    chunk_size : int
+        Number of texts preprocessed by a worker at once.
+
+    Methods
+    -------
+    fit(x, y=None)
+        Does nothing, the transformer is stateless.
+    transform(x)
+        Returns the preprocessed texts.
+    """
+
+    def __init__(self, n_jobs: int = 1, chunk_size: int = default_chunk_size):
+        """
+        Initialize the TextNormalizer class.
+
+        Parameters
+        ----------
+        n_jobs : int, optional
+            Number of worker processes. -1 uses all CPU cores. Default is 1.
+        chunk_size : int, optional
+            Number of texts preprocessed by a worker at once. Default is 20000.
+        """
+        self.n_jobs = n_jobs
+        self.chunk_size = chunk_size
+
+    def fit(self, x, y=None):
+        """
+        Does nothing, the transformer is stateless.
+        """
+        return self
+
+    def transform(self, x):
+        """
+        Returns the preprocessed texts.
+
+        Parameters
+        ----------
+        x : iterable of str
+            Texts to preprocess.
+
+        Returns
+        -------
+        list
+            The preprocessed texts.
+        """
+        texts = x if isinstance(x, pd.Series) else pd.Series(list(x), dtype=object)
+        return preprocess_texts(texts, self.n_jobs, self.chunk_size).tolist()
+
+
+def resolve_n_jobs(n_jobs: int) -> int:
+    """
+    Returns the number of worker processes for an n_jobs option, where -1 means all CPU cores.
+    """
+    return (os.cpu_count() or 1) if n_jobs == -1 else max(n_jobs, 1)
+
+
+def ordered_map(executor, function, iterable, max_pending: int):
+    """
+    Maps a function over an iterable in an executor, keeping at most max_pending tasks in flight and yielding the
+    results in order.
+    """
+    pending = deque()
+    for item in iterable:
+        pending.append(executor.submit(function, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _preprocess_chunk(texts: pd.Series, progress: bool = False) -> pd.Series:
+    tokens = texts.fillna('').astype(str).str.lower().str.replace(punctuation_pattern, '', regex=True).str.split()
+    table = stem_cache.lookup(set(itertools.chain.from_iterable(tokens)))
+    join = tokens.progress_map if progress else tokens.map
+    return join(lambda words: ' '.join([table[word] for word in words]))
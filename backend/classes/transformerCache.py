@@ -0,0 +1,85 @@
+import os
+
+from joblib import Memory
+
+from classes.privateDirectory import cache_directory, private_directory
+
+default_directory = os.path.join(cache_directory, 'transformers')
+default_max_bytes = 1024 * 1024 * 1024
+
+
+class TransformerCache:
+    """
+    An on-disk cache of fitted pipeline transformers, used as the memory of the pipelines.
+
+    The pipelines store every fitted vectorizer together with its output under a hash of the vectorizer parameters and
+    of the training data, so refitting the same vectorizer on the same data (another model, another run with the same
+    folds) loads it instead of vectorizing the texts again. The transformers are pickled, so the directory is created
+    private to the user running the server, and refused if other users can write to it.
+
+    Attributes
+    ----------
+    directory : str
+        Directory where the fitted transformers are stored.
+    max_bytes : int
+        Size budget of the directory in bytes.
+    memory : joblib.Memory
+        The memory passed to the pipelines, created with the directory on first use.
+
+    Methods
+    -------
+    reduce()
+        Removes the least recently used transformers until the cache fits in its size budget.
+    clear()
+        Removes all transformers from the cache.
+    """
+
+    def __init__(self, directory: str = default_directory, max_bytes: int = default_max_bytes):
+        """
+        Initialize the TransformerCache class.
+
+        Parameters
+        ----------
+        directory : str, optional
+            Directory where the fitted transformers are stored. Default is cache/transformers in the backend directory.
+        max_bytes : int, optional
+            Size budget of the directory in bytes. Default is 1 GB.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._memory = None
+
+    @property
+    def memory(self) -> Memory:
+        """
+        Returns the memory passed to the pipelines.
+
+        Returns
+        -------
+        joblib.Memory
+            The memory storing the fitted transformers in the directory.
+
+        Raises
+        ------
+        PermissionError
+            If the directory is owned by another user or can be written by other users.
+        """
+        if self._memory is None:
+            private_directory(self.directory)
+            self._memory = Memory(location=self.directory, verbose=0)
+        return self._memory
+
+    def reduce(self):
+        """
+        Removes the least recently used transformers until the cache fits in its size budget.
+        """
+        self.memory.reduce_size(bytes_limit=self.max_bytes)
+
+    def clear(self):
+        """
+        Removes all transformers from the cache.
+        """
+        self.memory.clear(warn=False)
+
+
+transformer_cache = TransformerCache()
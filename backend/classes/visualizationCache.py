@@ -0,0 +1,325 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from classes.modelCache import ModelCache
+from classes.textPreprocessing import preprocess_text
+
+default_max_bytes = 64 * 1024 * 1024
+default_max_disk_bytes = 1024 * 1024 * 1024
+
+
+class VisualizationCache:
+    """
+    A process-wide, thread-safe cache of rendered visualizations, with a memory tier and an optional disk tier.
+
+    A visualization is identified by the model UUID, the model file modification time, a hash of the normalized text
+    and the rendering options, so replacing a model file makes its old visualizations unreachable. Both tiers evict the
+    least recently used visualizations to stay within their size budget in bytes of UTF-8, and visualizations found on
+    disk are promoted to memory. The disk tier keeps a running total of the size of its files, and only lists the
+    directory to evict files once the total exceeds the budget. The total then also accounts for the files written by
+    the other processes sharing the directory.
+
+    Attributes
+    ----------
+    max_bytes : int
+        Memory budget of the memory tier in bytes. A value of 0 disables the memory tier.
+    directory : str or None
+        Directory of the disk tier, or None if the disk tier is disabled.
+    max_disk_bytes : int
+        Size budget of the disk tier in bytes.
+    hits : int
+        Number of visualizations served from the memory tier.
+    disk_hits : int
+        Number of visualizations served from the disk tier.
+    misses : int
+        Number of visualizations that had to be rendered.
+
+    Methods
+    -------
+    key(model_path: str, text: str, **options)
+        Returns the key of a visualization.
+    get(key: str)
+        Returns the visualization stored under a key, or None.
+    store(key: str, visualization: str)
+        Stores a visualization under a key.
+    invalidate(model_path: str)
+        Removes all visualizations of a model.
+    configure(max_bytes: int = None, directory: str = None, max_disk_bytes: int = None)
+        Changes the budgets and the disk tier, evicting visualizations if necessary.
+    clear()
+        Removes all visualizations from both tiers and resets the statistics.
+    stats()
+        Returns the cache statistics.
+    """
+
+    def __init__(self, max_bytes: int = default_max_bytes, directory: str = None,
+                 max_disk_bytes: int = default_max_disk_bytes):
+        """
+        Initialize the VisualizationCache class.
+
+        Parameters
+        ----------
+        max_bytes : int, optional
+            Memory budget of the memory tier in bytes. Default is 64 MB.
+        directory : str, optional
+            Directory of the disk tier. Default is None, the disk tier is disabled.
+        max_disk_bytes : int, optional
+            Size budget of the disk tier in bytes. Default is 1 GB.
+        """
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._disk_bytes = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model_path: str, text: str, **options) -> str:
+        """
+        Returns the key of a visualization.
+
+        Parameters
+        ----------
+        model_path : str
+            Path to the model file.
+        text : str
+            Visualized text, hashed once normalized like the models preprocess it, so texts which only differ in case,
+            spacing or word endings share their visualization.
+        **options
+            Rendering options, such as the number of features, the output format and the explainer.
+
+        Returns
+        -------
+        str
+            The model UUID followed by a hash of the model modification time, the text and the options.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the model file is not found at the specified path.
+        """
+        stat = os.stat(model_path)
+        digest = hashlib.sha256(f'{stat.st_mtime_ns}\0{stat.st_size}\0'.encode())
+        digest.update(hashlib.sha256(preprocess_text(text).encode()).digest())
+        for name in sorted(options):
+            digest.update(f'\0{name}={options[name]}'.encode())
+        return f'{ModelCache.model_uuid(model_path)}-{digest.hexdigest()}'
+
+    def get(self, key: str):
+        """
+        Returns the visualization stored under a key, looking in memory first and then on disk.
+
+        Parameters
+        ----------
+        key : str
+            Key of the visualization.
+
+        Returns
+        -------
+        str or None
+            The visualization, or None if it is not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            directory = self.directory
+        visualization = self._read(directory, key) if directory is not None else None
+        with self._lock:
+            if visualization is None:
+                self.misses += 1
+            else:
+                self.disk_hits += 1
+                self._store(key, visualization)
+        return visualization
+
+    def store(self, key: str, visualization: str):
+        """
+        Stores a visualization under a key in both tiers.
+
+        Parameters
+        ----------
+        key : str
+            Key of the visualization.
+        visualization : str
+            The rendered visualization.
+        """
+        with self._lock:
+            self._store(key, visualization)
+            directory = self.directory
+        if directory is not None:
+            self._write(directory, key, visualization)
+
+    def invalidate(self, model_path: str):
+        """
+        Removes all visualizations of the model stored at the given path from both tiers.
+
+        Parameters
+        ----------
+        model_path : str
+            Path to the model file.
+        """
+        prefix = f'{ModelCache.model_uuid(model_path)}-'
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                self._remove(key)
+            directory = self.directory
+        removed = 0
+        for path, size, _ in self._files(directory):
+            if os.path.basename(path).startswith(prefix):
+                _remove_file(path)
+                removed += size
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes = max(self._disk_bytes - removed, 0)
+
+    def configure(self, max_bytes: int = None, directory: str = None, max_disk_bytes: int = None):
+        """
+        Changes the budgets and the disk tier of the cache, evicting the least recently used visualizations if
+        necessary.
+
+        Parameters
+        ----------
+        max_bytes : int, optional
+            New memory budget in bytes. Default is None, unchanged.
+        directory : str, optional
+            New directory of the disk tier. Default is None, unchanged.
+        max_disk_bytes : int, optional
+            New size budget of the disk tier in bytes. Default is None, unchanged.
+        """
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+                self._evict()
+            if directory is not None:
+                self.directory = directory
+                self._disk_bytes = None
+            if max_disk_bytes is not None:
+                self.max_disk_bytes = max_disk_bytes
+        self._evict_files()
+
+    def clear(self):
+        """
+        Removes all visualizations from both tiers and resets the statistics.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = self.disk_hits = self.misses = 0
+            directory = self.directory
+            self._disk_bytes = 0
+        for path, _, _ in self._files(directory):
+            _remove_file(path)
+
+    def stats(self) -> dict:
+        """
+        Returns the cache statistics.
+
+        Returns
+        -------
+        dict
+            Hits of both tiers, misses, hit rate, number of cached visualizations and usage of both tiers.
+        """
+        with self._lock:
+            directory = self.directory
+        files = self._files(directory)
+        with self._lock:
+            requests = self.hits + self.disk_hits + self.misses
+            return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                    'hit_rate': (self.hits + self.disk_hits) / requests if requests else 0.0,
+                    'visualizations': len(self._entries), 'bytes': self.current_bytes, 'max_bytes': self.max_bytes,
+                    'disk_visualizations': len(files), 'disk_bytes': sum(size for _, size, _ in files),
+                    'max_disk_bytes': self.max_disk_bytes if directory is not None else 0}
+
+    def _store(self, key, visualization):
+        self._remove(key)
+        size = len(visualization.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        self._entries[key] = visualization, size
+        self.current_bytes += size
+        self._evict()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry[1]
+
+    def _evict(self):
+        while self._entries and self.current_bytes > self.max_bytes:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.current_bytes -= size
+
+    @staticmethod
+    def _read(directory, key):
+        path = os.path.join(directory, f'{key}.txt')
+        try:
+            with open(path, 'rb') as f:
+                visualization = f.read().decode('utf-8')
+            os.utime(path)
+            return visualization
+        except (FileNotFoundError, UnicodeDecodeError):
+            return None
+
+    def _write(self, directory, key, visualization):
+        data = visualization.encode('utf-8')
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile('wb', dir=directory, suffix='.tmp', delete=False) as f:
+            tmp_path = f.name
+            f.write(data)
+        try:
+            os.replace(tmp_path, os.path.join(directory, f'{key}.txt'))
+        finally:
+            _remove_file(tmp_path)
+        with self._lock:
+            # A replaced file is counted twice until the next eviction, which only makes it come earlier
+            if self._disk_bytes is not None:
+                self._disk_bytes += len(data)
+            if self._disk_bytes is not None and self._disk_bytes <= self.max_disk_bytes:
+                return
+        self._evict_files()
+
+    def _evict_files(self):
+        with self._lock:
+            directory = self.directory
+            entries = sorted(self._files(directory), key=lambda entry: entry[2])
+            total = sum(size for _, size, _ in entries)
+            for path, size, _ in entries:
+                if total <= self.max_disk_bytes:
+                    break
+                _remove_file(path)
+                total -= size
+            self._disk_bytes = total
+
+    @staticmethod
+    def _files(directory):
+        files = []
+        if directory is None or not os.path.isdir(directory):
+            return files
+        for entry in os.scandir(directory):
+            if entry.name.endswith('.txt'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((entry.path, stat.st_size, stat.st_mtime))
+        return files
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+visualization_cache = VisualizationCache()
@@ -2,8 +2,10 @@ import argparse
 import os.path
 
 from waitress import serve
-from apis.api import create_app
+from apis.api import create_app, db_providers, interrupt_worker_jobs, prepare_workers, stop_app
 from apis.model import App
+from classes.preforkServer import PreforkServer
+from classes.textPreprocessing import default_chunk_size
 
 
 def main():
@@ -16,6 +18,8 @@ def main():
     x_constant = "Name of the column with the text"
     y_constant = "Name of the column with the target"
     model_constant = "./model.mdl"
+    n_jobs_constant = "Number of worker processes used to preprocess the dataset, -1 to use all cores"
+    chunk_size_constant = "Number of texts preprocessed by a worker at once"
 
     # Create a parser for command line arguments
     parser = argparse.ArgumentParser(description="Console App")
@@ -36,6 +40,18 @@ def main():
     parser_train.add_argument('-kfold', help="Number of folds for cross validation", default=1, metavar="10",
                               type=int)
     parser_train.add_argument('-test_size', help="Size of the test set", default=0, metavar="0.2", type=float)
+    parser_train.add_argument('-kfold_jobs', help="Number of worker processes fitting the folds, -1 to use all cores",
+                              default=1, metavar="4", type=int)
+    parser_train.add_argument('-n_jobs', help=n_jobs_constant, default=1, metavar="4", type=int)
+    parser_train.add_argument('-chunk_size', help=chunk_size_constant, default=default_chunk_size,
+                              metavar=str(default_chunk_size), type=int)
+    parser_train.add_argument('-cache_transformers', help="Reuse vectorizers already fitted on the same data",
+                              action='store_true')
+    parser_train.add_argument('-streaming', help="Train out of core on chunks of the dataset (HashingVectorizer and "
+                                                 "SGDClassifier)", action='store_true')
+    parser_train.add_argument('-compress', help="zlib compression level of the model file from 0 to 9; a compressed "
+                                                "model is not memory-mapped when loaded", default=0, metavar="0",
+                              choices=range(10), type=int)
 
     # Parser for 'validate' command
     parser_validate = subparsers.add_parser('validate', help='Validates the accuracy and f1 of a trained model.',
@@ -46,12 +62,24 @@ def main():
     parser_validate.add_argument('-x', help=x_constant, default="text", metavar="text", type=str)
     parser_validate.add_argument('-y', help=y_constant, default="target", metavar="target", type=str)
     parser_validate.add_argument('-test_size', help="Size of the test set", default=0.2, metavar="0.2", type=float)
+    parser_validate.add_argument('-n_jobs', help=n_jobs_constant, default=1, metavar="4", type=int)
+    parser_validate.add_argument('-chunk_size', help=chunk_size_constant, default=default_chunk_size,
+                                 metavar=str(default_chunk_size), type=int)
 
     # Parser for 'predict' command
     parser_predict = subparsers.add_parser('predict', help='Make a prediction for a given text',
                                            description='Make predictions for input text using a trained model.')
     parser_predict.add_argument('-model_path', help=path_to_model, metavar=model_constant, type=str, required=True)
-    parser_predict.add_argument('-text', help="Text to predict", metavar="fake news text", type=str, required=True)
+    parser_predict.add_argument('-text', help="Text to predict", metavar="fake news text", type=str)
+    parser_predict.add_argument('-input', help="Path to the dataset to predict in bulk instead of a single text",
+                                metavar="./data/archive.csv", type=str)
+    parser_predict.add_argument('-output', help="Path to save the bulk predictions", default="./predictions.csv",
+                                metavar="./predictions.csv", type=str)
+    parser_predict.add_argument('-x', help=x_constant, default="text", metavar="text", type=str)
+    parser_predict.add_argument('-chunk_size', help="Number of texts predicted at once", default=1000, metavar="1000",
+                                type=int)
+    parser_predict.add_argument('-n_jobs', help="Number of worker processes, -1 to use all cores", default=1,
+                                metavar="4", type=int)
 
     # Parser for 'visualize' command
     parser_visualize = subparsers.add_parser('visualize', help='Visualize the prediction',
@@ -63,6 +91,10 @@ def main():
                                   default=40)
     parser_visualize.add_argument('-save_to', help="Path to save prediction results", metavar="./result/1.html",
                                   default="./results/1.html", type=str)
+    parser_visualize.add_argument('-output_format', help="Output format: image (base64 encoded PNG), svg, json or html",
+                                  choices=['image', 'svg', 'json', 'html'], default='image')
+    parser_visualize.add_argument('-explainer', help="Explainer of the prediction: exact (linear models only), lime "
+                                                     "or auto", choices=['auto', 'exact', 'lime'], default='auto')
 
     # Parser for 'host' command
     parser_host = subparsers.add_parser('host', help='Host model as a REST API',
@@ -72,6 +104,26 @@ def main():
     parser_host.add_argument('-model_dir', help="Path, where models are stored", metavar="./tmp",
                              default="./tmp", type=str)
     parser_host.add_argument('-secure', help="Use secure connection", metavar="False", default=False, type=bool)
+    parser_host.add_argument('-model_cache_size', help="Memory budget of the model cache in MB", metavar="512",
+                             default=512, type=int)
+    parser_host.add_argument('-job_workers', help="Maximum number of background training jobs running at once",
+                             metavar="2", default=2, type=int)
+    parser_host.add_argument('-visualization_cache_size', help="Memory budget of the visualization cache in MB",
+                             metavar="64", default=64, type=int)
+    parser_host.add_argument('-session_ttl', help="Number of seconds an authenticated session is cached, 0 to disable",
+                             metavar="300", default=300, type=float)
+    parser_host.add_argument('-visualization_cache_dir', help="Directory of the on-disk visualization cache",
+                             metavar="./tmp/visualizations", default=None, type=str)
+    parser_host.add_argument('-db_provider', help="Storage of the users, models and jobs: sqlite (sqlite.db) or "
+                             "memory (lost on exit)", metavar="sqlite", default="sqlite", choices=db_providers, type=str)
+    parser_host.add_argument('-db_pool_size', help="Maximum number of open SQLite connections", metavar="8",
+                             default=8, type=int)
+    parser_host.add_argument('-preload', help="Models loaded in the background at startup: all, none, or the number "
+                             "of most requested models", metavar="all", default="all", type=str)
+    parser_host.add_argument('-watch_interval', help="Number of seconds between two scans of the model directory for "
+                             "changed model files, 0 to disable", metavar="5", default=5, type=float)
+    parser_host.add_argument('-workers', help="Number of worker processes sharing the port, loaded with the models "
+                             "preloaded before they start (sqlite only)", metavar="1", default=1, type=int)
 
     # Parse the command line arguments
     args = parser.parse_args()
@@ -83,28 +135,53 @@ def main():
             os.makedirs(os.path.dirname(args.save_to), exist_ok=True)
             model, accuracy, f1 = app.train_model(dataset=args.dataset_path, x=args.x, y=args.y, kfold=int(args.kfold),
                                                   test_size=float(args.test_size),
-                                                  model=args.model, vectorizer=args.vectorizer)
+                                                  model=args.model, vectorizer=args.vectorizer,
+                                                  n_jobs=args.n_jobs,
+                                                  chunk_size=args.chunk_size,
+                                                  cache_transformers=args.cache_transformers,
+                                                  kfold_jobs=args.kfold_jobs,
+                                                  streaming=args.streaming)
             if accuracy is not None and f1 is not None:
-                print(f"Mean accuracy: {accuracy}, Mean F1: {f1}")
-            import joblib
-            joblib.dump(model, args.save_to)
+                print(f"Best fold accuracy: {accuracy}, Best fold F1: {f1}")
+            from classes.modelStorage import ModelStorage
+            ModelStorage.save(model, args.save_to, compress=args.compress)
             print(f"Model saved in file: {args.save_to}")
         elif args.command == 'predict':
-            print(f"Prediction result: {app.predict(model_path=args.model_path, text=args.text)}")
+            if args.input:
+                rows = app.predict_file(model_path=args.model_path, dataset=args.input, save_to=args.output, x=args.x,
+                                        chunk_size=args.chunk_size, n_jobs=args.n_jobs)
+                print(f"{rows} predictions saved in file: {args.output}")
+            else:
+                print(f"Prediction result: {app.predict(model_path=args.model_path, text=args.text)}")
         elif args.command == 'visualize':
             import io
-            visualization = (app.visualize(model_path=args.model_path, text=args.text, num_features=int(args.features)))
+            visualization = (app.visualize(model_path=args.model_path, text=args.text, num_features=int(args.features),
+                                           output_format=args.output_format,
+                                           explainer=args.explainer))
             os.makedirs(os.path.dirname(args.save_to), exist_ok=True)
             with io.open(args.save_to, 'w', encoding='utf-8') as f:
                 f.write(str(visualization))
             print(f"Visualization saved to file: {args.save_to}")
         elif args.command == 'host':
-            flapp = create_app(address=args.address, port=args.port,
-                               model_dir=args.model_dir, secure=args.secure)
-            serve(flapp, host=args.address, port=args.port)
+            options = dict(address=args.address, port=args.port,
+                           model_dir=args.model_dir, secure=args.secure,
+                           model_cache_size=args.model_cache_size * 1024 * 1024, job_workers=args.job_workers,
+                           visualization_cache_size=args.visualization_cache_size * 1024 * 1024,
+                           visualization_cache_dir=args.visualization_cache_dir, session_ttl=args.session_ttl,
+                           db_provider=args.db_provider, db_pool_size=args.db_pool_size,
+                           preload=args.preload,
+                           watch_interval=args.watch_interval)
+            if args.workers > 1:
+                prepare_workers(model_dir=args.model_dir, model_cache_size=options['model_cache_size'],
+                                db_provider=args.db_provider, preload=options['preload'])
+                PreforkServer(lambda: create_app(**options, worker=True), args.address, args.port, args.workers,
+                              on_stop=stop_app, on_exit=lambda pid: interrupt_worker_jobs(pid, args.db_provider)).run()
+            else:
+                serve(create_app(**options), host=args.address, port=args.port)
         elif args.command == 'validate':
             accuracy, f1 = app.validate(dataset=args.dataset_path, model=args.model_path, x=args.x, y=args.y,
-                                        size=float(args.test_size))
+                                        size=float(args.test_size), n_jobs=args.n_jobs,
+                                        chunk_size=args.chunk_size)
             print(f"Accuracy: {accuracy}, F1: {f1}")
         else:
             print("No valid command provided. Use --help for usage information.")
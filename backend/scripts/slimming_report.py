@@ -0,0 +1,106 @@
+"""
+Compares the size, load time, prediction time and predictions of a model file before and after slimming.
+
+The model is saved as it is, slimmed, downcast to float32 when its predictions on the first half of the sample stay
+the same, and saved again without and with compression. Every file is loaded with ModelStorage, memory-mapped when
+it is uncompressed, timed predicting the whole sample, and its predictions are compared with the ones of the original
+model. The support vectors of SVC and SVR models stay float64, since libsvm only predicts from double precision.
+
+Run from the backend directory:
+    python -m scripts.slimming_report -model_path ./model.mdl -dataset_path ./data/factcheck.csv
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from classes.modelSlimmer import ModelSlimmer
+from classes.modelStorage import ModelStorage
+
+
+def variants(model_path, texts, compress):
+    """
+    Yields the name of every variant of the model with a function saving it to a path.
+    """
+    def original(path):
+        joblib.dump(joblib.load(model_path), path)
+
+    def slimmed(path):
+        ModelStorage.save(joblib.load(model_path), path)
+
+    def downcast(path, level=0):
+        pipeline = ModelSlimmer.slim(joblib.load(model_path))
+        if hasattr(pipeline.steps[-1][1], 'support_vectors_'):
+            print('The support vectors were kept float64: libsvm only predicts from double precision')
+        elif not ModelSlimmer.downcast(pipeline, texts[:len(texts) // 2]):
+            print('The coefficients were kept as they are: already float32, not supported in float32 by the model, or '
+                  'the predictions changed')
+        ModelStorage.save(pipeline, path, compress=level)
+
+    yield 'original', original
+    yield 'slimmed', slimmed
+    yield 'slimmed, float32', downcast
+    yield f'slimmed, float32, zlib {compress}', lambda path: downcast(path, compress)
+
+
+def measure(path, texts, repeat):
+    """
+    Returns the median time to load a model file, to predict a first text with it and to predict all the texts, in
+    milliseconds, with the labels and probabilities the model predicts for the texts.
+    """
+    load_times, first_times, predict_times = [], [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pipeline = ModelStorage.load(path)
+        loaded = time.perf_counter()
+        pipeline.predict(texts[:1])
+        first = time.perf_counter()
+        labels = pipeline.predict(texts)
+        load_times.append((loaded - start) * 1000)
+        first_times.append((first - loaded) * 1000)
+        predict_times.append((time.perf_counter() - first) * 1000)
+    return (statistics.median(load_times), statistics.median(first_times), statistics.median(predict_times), labels,
+            pipeline.predict_proba(texts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Model artifact slimming report')
+    parser.add_argument('-model_path', type=str, required=True, help='Path to the trained model')
+    parser.add_argument('-dataset_path', type=str, required=True, help='Path to a dataset to compare predictions on')
+    parser.add_argument('-x', type=str, default='text', help='Name of the column containing the input text')
+    parser.add_argument('-samples', type=int, default=1000, help='Number of texts the predictions are compared on')
+    parser.add_argument('-compress', type=int, default=3, choices=range(1, 10), help='zlib compression level')
+    parser.add_argument('-repeat', type=int, default=5, help='Number of timed loads of every file')
+    args = parser.parse_args()
+
+    texts = pd.read_csv(args.dataset_path, usecols=[args.x], nrows=args.samples)[args.x].dropna().astype(str).tolist()
+    print(f'Model file: {os.path.getsize(args.model_path) / 1024:.1f} KB, {len(texts)} texts')
+
+    rows = []
+    reference = None
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, save in variants(args.model_path, texts, args.compress):
+            path = os.path.join(tmp_dir, 'model.mdl')
+            save(path)
+            size = os.path.getsize(path)
+            load_time, first_time, predict_time, labels, probabilities = measure(path, texts, args.repeat)
+            if reference is None:
+                reference = labels, probabilities
+            agreement = np.mean(labels == reference[0]) * 100
+            rows.append((name, size, load_time, first_time, predict_time, agreement,
+                         np.abs(probabilities - reference[1]).max()))
+
+    print(f'\n{"Artifact":<28}{"Size (KB)":>12}{"Load (ms)":>12}{"1st predict (ms)":>18}{"Predict all (ms)":>18}'
+          f'{"Same label (%)":>16}{"Max proba diff":>16}')
+    for name, size, load_time, first_time, predict_time, agreement, difference in rows:
+        print(f'{name:<28}{size / 1024:>12.1f}{load_time:>12.2f}{first_time:>18.2f}{predict_time:>18.2f}'
+              f'{agreement:>16.2f}{difference:>16.2e}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Measures the latency of the SQLite provider lookups before and after the schema migrations.
+
+A database with the schema of the first releases, without indexes, is filled with users and models, the lookups are
+timed, then the database is migrated in place by opening it with the SQLiteProvider and the lookups are timed again.
+
+Run from the backend directory:
+    python -m scripts.sqlite_benchmark -users 100000 -models 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+import uuid
+
+from classes.db_providers.sqlite_provider import SQLiteProvider
+
+legacy_schema = [
+    'CREATE TABLE users (sub TEXT PRIMARY KEY, uuid TEXT, token TEXT, auth_info TEXT)',
+    'CREATE TABLE models (name TEXT, uuid TEXT PRIMARY KEY, shared BOOLEAN, user_uuid TEXT, '
+    'FOREIGN KEY(user_uuid) REFERENCES users(uuid))',
+    'CREATE TABLE jobs (uuid TEXT PRIMARY KEY, user_uuid TEXT, status TEXT, params TEXT, folds TEXT, result TEXT, '
+    'error TEXT, created REAL, updated REAL, FOREIGN KEY(user_uuid) REFERENCES users(uuid))',
+]
+
+
+class LegacyProvider(SQLiteProvider):
+    """
+    The provider queries on a database left as the first releases created it, without migrations or pragmas.
+    """
+
+    def get_conn(self):
+        if not hasattr(self.local_storage, 'connection'):
+            self.local_storage.connection = sqlite3.connect(self.db_file)
+        return self.local_storage.connection
+
+    def check_and_create_tables(self):
+        pass
+
+
+def create_legacy_db(db_file, users, models, shared_ratio):
+    conn = sqlite3.connect(db_file)
+    for statement in legacy_schema:
+        conn.execute(statement)
+    user_uuids = [str(uuid.uuid4()) for _ in range(users)]
+    conn.executemany('INSERT INTO users VALUES (?, ?, ?, ?)',
+                     ((f'sub-{i}', user_uuid, 'token', '{"exp": 0}') for i, user_uuid in enumerate(user_uuids)))
+    conn.executemany('INSERT INTO models VALUES (?, ?, ?, ?)',
+                     ((f'model_{i}', str(uuid.uuid4()), random.random() < shared_ratio, random.choice(user_uuids))
+                      for i in range(models)))
+    conn.commit()
+    conn.close()
+    return user_uuids
+
+
+def lookups(provider, user_uuids):
+    return {
+        'get_user_by_uuid': lambda: provider.get_user_by_uuid(random.choice(user_uuids)),
+        'get_models': lambda: provider.get_models(random.choice(user_uuids)),
+        'get_model_by_name': lambda: provider.get_model_by_name(random.choice(user_uuids), 'model_0'),
+        'get_jobs': lambda: provider.get_jobs(random.choice(user_uuids)),
+    }
+
+
+def measure(lookup, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        lookup()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), max(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite provider lookup benchmark')
+    parser.add_argument('-users', type=int, default=100000, help='Number of users')
+    parser.add_argument('-models', type=int, default=1000000, help='Number of models')
+    parser.add_argument('-shared_ratio', type=float, default=0.001, help='Share of the models that are shared')
+    parser.add_argument('-repeat', type=int, default=20, help='Number of timed lookups of each kind')
+    args = parser.parse_args()
+
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = os.path.join(tmp_dir, 'sqlite.db')
+        start = time.perf_counter()
+        user_uuids = create_legacy_db(db_file, args.users, args.models, args.shared_ratio)
+        print(f'Created {args.users} users and {args.models} models in {time.perf_counter() - start:.1f}s')
+
+        legacy = LegacyProvider(db_file)
+        before = {name: measure(lookup, args.repeat) for name, lookup in lookups(legacy, user_uuids).items()}
+        legacy.close_connection()
+
+        start = time.perf_counter()
+        provider = SQLiteProvider(db_file)
+        print(f'Migrated the database in place in {time.perf_counter() - start:.1f}s')
+        after = {name: measure(lookup, args.repeat) for name, lookup in lookups(provider, user_uuids).items()}
+        provider.close_connection()
+
+    print(f'\n{"Lookup":<20}{"Before (median/max ms)":>26}{"After (median/max ms)":>26}{"Speedup":>10}')
+    for name in before:
+        print(f'{name:<20}{before[name][0]:>14.3f} / {before[name][1]:>8.3f}'
+              f'{after[name][0]:>14.3f} / {after[name][1]:>8.3f}{before[name][0] / after[name][0]:>9.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,9 @@
 import unittest
+
+import pandas as pd
+
 from classes.customPipeline import CustomPipeline
+from classes.textPreprocessing import TextNormalizer, preprocess_texts
 from sklearn.svm import SVC
 from sklearn.feature_extraction.text import TfidfVectorizer
 
@@ -21,9 +25,33 @@ class TestCustomPipeline(unittest.TestCase):
 
     def test_create_pipeline(self):
         pipeline = self.pipeline.create_pipeline('SVC', 'TfidfVectorizer')
-        self.assertEqual(len(pipeline.steps), 2)
-        self.assertIsInstance(pipeline.steps[0][1], TfidfVectorizer)
-        self.assertIsInstance(pipeline.steps[1][1], SVC)
+        self.assertEqual(len(pipeline.steps), 3)
+        self.assertIsInstance(pipeline.steps[0][1], TextNormalizer)
+        self.assertIsInstance(pipeline.steps[1][1], TfidfVectorizer)
+        self.assertIsInstance(pipeline.steps[2][1], SVC)
+
+    def test_with_and_without_normalizer(self):
+        pipeline = self.pipeline.create_pipeline('SVC', 'TfidfVectorizer')
+        estimator = CustomPipeline.without_normalizer(pipeline)
+        self.assertEqual(len(estimator.steps), 2)
+        self.assertIs(estimator.named_steps['model'], pipeline.named_steps['model'])
+        self.assertIs(CustomPipeline.without_normalizer(estimator), estimator)
+        self.assertIs(CustomPipeline.with_normalizer(pipeline), pipeline)
+        self.assertIsInstance(CustomPipeline.with_normalizer(estimator).steps[0][1], TextNormalizer)
+
+    def test_normalizer_matches_training_preprocessing(self):
+        pipeline = self.pipeline.create_pipeline('LogisticRegression', 'CountVectorizer')
+        texts = ['Running runners ran', 'The runner is running', 'Nothing here'] * 10
+        labels = [1, 1, 0] * 10
+        CustomPipeline.without_normalizer(pipeline).fit(preprocess_texts(pd.Series(texts)), labels)
+        self.assertEqual(list(pipeline.predict(['RUNNING runner'])), [1])
+
+    def test_is_incremental(self):
+        self.assertTrue(self.pipeline.is_incremental('SGDClassifier', 'HashingVectorizer'))
+        self.assertFalse(self.pipeline.is_incremental('SGDClassifier', 'TfidfVectorizer'))
+        self.assertFalse(self.pipeline.is_incremental('SVC', 'HashingVectorizer'))
+        with self.assertRaises(ValueError):
+            self.pipeline.is_incremental('invalid_model', 'HashingVectorizer')
 
     def test_create_pipeline_invalid_model(self):
         with self.assertRaises(ValueError):
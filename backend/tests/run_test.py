@@ -11,30 +11,44 @@ class MyTestCase(unittest.TestCase):
         self.model = './backend/tests/test_data/model.mdl'
         self.test_text = 'This is a test text'
         self.save_result = './backend/tests/test_data/result.html'
+        self.save_predictions = './backend/tests/test_data/predictions.csv'
         self.invalid_model = 'invalid_model.mdl'
 
     @patch('argparse.ArgumentParser.parse_args')
     def test_main_train(self, mock_args):
         mock_args.return_value = argparse.Namespace(command='train', dataset_path=self.dataset, model='SVC',
                                                     vectorizer='TfidfVectorizer', x='text', y='target', kfold=1,
-                                                    test_size=0, save_to=self.model)
+                                                    test_size=0, save_to=self.model, kfold_jobs=1, n_jobs=1,
+                                                    chunk_size=20000, cache_transformers=False, streaming=False,
+                                                    compress=0)
         main.main()
 
     @patch('argparse.ArgumentParser.parse_args')
     def test_main_predict(self, mock_args):
-        mock_args.return_value = argparse.Namespace(command='predict', model_path=self.model, text=self.test_text)
+        mock_args.return_value = argparse.Namespace(command='predict', model_path=self.model, text=self.test_text,
+                                                    input=None, output=self.save_predictions, x='text',
+                                                    chunk_size=1000, n_jobs=1)
+        main.main()
+
+    @patch('argparse.ArgumentParser.parse_args')
+    def test_main_predict_file(self, mock_args):
+        mock_args.return_value = argparse.Namespace(command='predict', model_path=self.model, text=None,
+                                                    input=self.dataset, output=self.save_predictions, x='text',
+                                                    chunk_size=1000, n_jobs=2)
         main.main()
 
     @patch('argparse.ArgumentParser.parse_args')
     def test_main_visualize(self, mock_args):
         mock_args.return_value = argparse.Namespace(command='visualize', model_path=self.model, text=self.test_text,
-                                                    features=40, save_to=self.save_result)
+                                                    features=40, save_to=self.save_result, output_format='image',
+                                                    explainer='auto')
         main.main()
 
     @patch('argparse.ArgumentParser.parse_args')
     def test_main_validate(self, mock_args):
         mock_args.return_value = argparse.Namespace(command='validate', model_path=self.model,
-                                                    dataset_path=self.dataset, x='text', y='target', test_size=0.2)
+                                                    dataset_path=self.dataset, x='text', y='target', test_size=0.2,
+                                                    n_jobs=1, chunk_size=20000)
         main.main()
 
 
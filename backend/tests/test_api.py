@@ -1,4 +1,8 @@
+import json
 import os
+import shutil
+import time
+import uuid
 from unittest.mock import patch
 
 import pytest
@@ -37,6 +41,15 @@ def client_svc():
         yield client_svc
 
 
+@pytest.fixture
+def tmp_model():
+    os.makedirs('./tmp', exist_ok=True)
+    model_name = str(uuid.uuid4())
+    shutil.copy(const_model_path, f'./tmp/{model_name}.mdl')
+    yield model_name
+    os.remove(f'./tmp/{model_name}.mdl')
+
+
 def test_validate_data():
     # Test with invalid host
     with pytest.raises(ValueError):
@@ -100,6 +113,22 @@ def test_visualize(client_svc):
                 print("No models available for testing. Skipping the check.")
 
 
+def test_visualize_svg(client_svc):
+    with patch('apis.api.auth_check', return_value=True):
+        with patch(const_patch) as mock_app:
+            instance = mock_app.return_value
+            model_name = check_models()
+            if model_name:
+                instance.visualize.return_value = '<svg></svg>'
+                response = client_svc.get('/model/visualize', query_string={'model': model_name, 'text': const_text,
+                                                                            'output_format': 'svg'})
+                assert response.status_code == 200
+                assert response.mimetype == 'image/svg+xml'
+                assert instance.visualize.call_args.kwargs['output_format'] == 'svg'
+            else:
+                print("No models available for testing. Skipping the check.")
+
+
 def mock_add_model(self, uuid, model, _, shared):
     return {'name': uuid, 'uuid': model, 'shared': shared}
 
@@ -232,3 +261,210 @@ def test_validate_with_wrong_model_name(client_svc):
                 }
                 response = client_svc.post('/model/validate?model=wrong_model', content_type=const_content_type, data=data)
                 assert response.status_code == 404
+
+
+def test_predict_batch(client_svc, tmp_model):
+    with patch('apis.api.auth_check', return_value=True):
+        client_svc.application.config['WTF_CSRF_ENABLED'] = False
+        response = client_svc.post(f'/model/predict/batch?model={tmp_model}&chunk_size=2',
+                                   json=[const_text, {'text': 'Another text'}, 'Last text'])
+        assert response.status_code == 200
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert [row['index'] for row in rows] == [0, 1, 2]
+        assert rows[0]['text'] == const_text.lower()
+
+        response = client_svc.post(f'/model/predict/batch?model={tmp_model}&output_format=csv',
+                                   data='"Hello"\n"World"\n', content_type='application/x-ndjson')
+        assert response.status_code == 200
+        assert response.get_data(as_text=True).splitlines()[0] == 'index,text,prediction'
+        assert len(response.get_data(as_text=True).splitlines()) == 3
+
+
+def test_predict_batch_with_dataset(client_svc, tmp_model):
+    with patch('apis.api.auth_check', return_value=True):
+        client_svc.application.config['WTF_CSRF_ENABLED'] = False
+        data = {'dataset': (open(const_dataset_path, 'rb'), const_dataset)}
+        response = client_svc.post(f'/model/predict/batch?model={tmp_model}', content_type=const_content_type,
+                                   data=data)
+        assert response.status_code == 200
+        assert len(response.get_data(as_text=True).splitlines()) == 4470
+
+
+def test_predict_batch_invalid_parameters(client_svc, tmp_model):
+    with patch('apis.api.auth_check', return_value=True):
+        client_svc.application.config['WTF_CSRF_ENABLED'] = False
+        response = client_svc.post('/model/predict/batch?model=wrong_model', json=[const_text])
+        assert response.status_code == 404
+        response = client_svc.post(f'/model/predict/batch?model={tmp_model}', json={'text': const_text})
+        assert response.status_code == 404
+        response = client_svc.post(f'/model/predict/batch?model={tmp_model}&output_format=xml', json=[const_text])
+        assert response.status_code == 404
+        data = {'dataset': (open(const_dataset_path, 'rb'), const_dataset)}
+        response = client_svc.post(f'/model/predict/batch?model={tmp_model}&x=missing',
+                                   content_type=const_content_type, data=data)
+        assert response.status_code == 404
+
+
+def test_predict_batch_invalid_items(client_svc, tmp_model):
+    with patch('apis.api.auth_check', return_value=True):
+        client_svc.application.config['WTF_CSRF_ENABLED'] = False
+        response = client_svc.post(f'/model/predict/batch?model={tmp_model}&chunk_size=2',
+                                   json=['a', 'b', 'c', 5, 'x'])
+        assert response.status_code == 404
+        assert 'Each item must be a string' in response.get_data(as_text=True)
+
+        response = client_svc.post(f'/model/predict/batch?model={tmp_model}&chunk_size=2',
+                                   data='5\n"b"\n', content_type='application/x-ndjson')
+        assert response.status_code == 404
+
+        response = client_svc.post(f'/model/predict/batch?model={tmp_model}&chunk_size=2',
+                                   data='"a"\n"b"\n"c"\n5\n"x"\n', content_type='application/x-ndjson')
+        assert response.status_code == 200
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert [row['index'] for row in rows[:-1]] == [0, 1]
+        assert 'Each item must be a string' in rows[-1]['error']
+
+
+def test_train_in_background(client_svc):
+    with patch('apis.api.auth_check', return_value=True):
+        with patch('apis.api.get_user_id', new=mock_get_user_id):
+            client_svc.application.config['WTF_CSRF_ENABLED'] = False
+            data = {'dataset': (open(const_dataset_path, 'rb'), const_dataset)}
+            response = client_svc.post('/model/train?background=true&model=LogisticRegression&test_size=0.2&kfold=2',
+                                       content_type=const_content_type, data=data)
+            assert response.status_code == 202
+            job_uuid = response.get_json()['job']
+            deadline = time.time() + 120
+            job = client_svc.get(f'/model/jobs/{job_uuid}').get_json()
+            while job['status'] in ('queued', 'running') and time.time() < deadline:
+                time.sleep(0.2)
+                job = client_svc.get(f'/model/jobs/{job_uuid}').get_json()
+            assert job['status'] == 'succeeded'
+            assert job['progress'] == 1.0
+            assert len(job['folds']) == 2
+            assert os.path.exists(f"./tmp/{job['result']['model']}.mdl")
+            os.remove(f"./tmp/{job['result']['model']}.mdl")
+            assert job_uuid in [job['uuid'] for job in client_svc.get('/model/jobs').get_json()['jobs']]
+            assert client_svc.delete(f'/model/jobs/{job_uuid}').status_code == 404
+
+
+def test_job_not_found(client_svc):
+    with patch('apis.api.auth_check', return_value=True):
+        with patch('apis.api.get_user_id', new=mock_get_user_id):
+            client_svc.application.config['WTF_CSRF_ENABLED'] = False
+            assert client_svc.get('/model/jobs/wrong_job').status_code == 404
+            assert client_svc.delete('/model/jobs/wrong_job').status_code == 404
+
+
+def test_auth_check_uses_session_cache(client_svc):
+    user_id = str(uuid.uuid4())
+    user = {'uuid': user_id, 'auth_info': {'exp': int(time.time()) + 3600}}
+    api.session_cache.clear()
+    with patch('classes.db_providers.sqlite_provider.SQLiteProvider.get_user_by_uuid',
+               return_value=user) as get_user:
+        with client_svc.application.test_request_context(headers={'Cookie': f'user_id={user_id}'}):
+            assert api.auth_check()
+            assert api.auth_check()
+        assert get_user.call_count == 1
+        client_svc.set_cookie('user_id', user_id)
+        client_svc.get('/logout')
+        with client_svc.application.test_request_context(headers={'Cookie': f'user_id={user_id}'}):
+            assert api.auth_check()
+        assert get_user.call_count == 2
+        # An expired cached token is read again, another worker may have stored a new one
+        api.session_cache.store(user_id, int(time.time()) - 1)
+        with client_svc.application.test_request_context(headers={'Cookie': f'user_id={user_id}'}):
+            assert api.auth_check()
+        assert get_user.call_count == 3
+
+
+def test_auth_check_expired_token(client_svc):
+    user_id = str(uuid.uuid4())
+    user = {'uuid': user_id, 'auth_info': {'exp': int(time.time()) - 1}}
+    with patch('classes.db_providers.sqlite_provider.SQLiteProvider.get_user_by_uuid', return_value=user):
+        with client_svc.application.test_request_context(headers={'Cookie': f'user_id={user_id}'}):
+            assert not api.auth_check()
+    with patch('classes.db_providers.sqlite_provider.SQLiteProvider.get_user_by_uuid', return_value=None):
+        with client_svc.application.test_request_context(headers={'Cookie': f'user_id={uuid.uuid4()}'}):
+            assert not api.auth_check()
+
+
+def test_model_list_pages(client_svc):
+    user_id = str(uuid.uuid4())
+    prefix = f'p{uuid.uuid4().hex[:8]}'
+    names = [f'{prefix}_{i}' for i in range(5)]
+    for name in names:
+        api.data.add_model(user_id, str(uuid.uuid4()), name, False)
+    for name in (f'{prefix}_shared_0', f'{prefix}_shared_1'):
+        api.data.add_model(str(uuid.uuid4()), str(uuid.uuid4()), name, True)
+    api.data.add_model(user_id, str(uuid.uuid4()), f'other_{prefix}', False)
+    with patch('apis.api.auth_check', return_value=True):
+        with patch('apis.api.get_user_id', return_value=user_id):
+            models, cursor, pages = [], '', 0
+            while cursor is not None:
+                response = client_svc.get('/model/list', query_string={'limit': 3, 'prefix': prefix, 'cursor': cursor})
+                assert response.status_code == 200
+                models += response.get_json()['models']
+                cursor = response.get_json()['next_cursor']
+                pages += 1
+            assert pages == 3
+            assert [model['name'] for model in models] == sorted(names + [f'{prefix}_shared_0', f'{prefix}_shared_1'])
+            assert len({model['uuid'] for model in models}) == 7
+
+
+def test_model_list_etag(client_svc):
+    user_id = str(uuid.uuid4())
+    api.data.add_model(user_id, str(uuid.uuid4()), f'p{uuid.uuid4().hex[:8]}', False)
+    with patch('apis.api.auth_check', return_value=True):
+        with patch('apis.api.get_user_id', return_value=user_id):
+            response = client_svc.get('/model/list', query_string={'limit': 1})
+            etag = response.headers['ETag']
+            assert response.headers['Cache-Control'] == 'private, no-cache'
+            response = client_svc.get('/model/list', query_string={'limit': 1}, headers={'If-None-Match': etag})
+            assert response.status_code == 304
+            assert response.get_data() == b''
+            assert client_svc.get('/model/list', query_string={'limit': 0}).status_code == 404
+            assert client_svc.get('/model/list', query_string={'cursor': 'invalid'}).status_code == 404
+
+
+def test_memory_provider():
+    app = api.create_app('127.0.0.1', 5000, './tmp', db_provider='memory')
+    assert isinstance(api.data, api.TempProvider)
+    user_id = str(uuid.uuid4())
+    api.data.add_model(user_id, str(uuid.uuid4()), 'in_memory', True)
+    with app.test_client() as client:
+        with patch('apis.api.auth_check', return_value=True):
+            with patch('apis.api.get_user_id', return_value=user_id):
+                models = client.get('/model/list').get_json()['models']
+                assert [model['name'] for model in models] == ['in_memory']
+    with pytest.raises(ValueError):
+        api.create_app('127.0.0.1', 5000, './tmp', db_provider='postgres')
+
+
+def test_request_returns_database_connection(client_svc):
+    with patch('apis.api.auth_check', return_value=True):
+        with patch('apis.api.get_user_id', return_value=str(uuid.uuid4())):
+            assert client_svc.get('/model/list').status_code == 200
+            stats = client_svc.get('/model/cache').get_json()['database']
+            assert stats['checkouts'] >= 1
+            assert api.data.stats()['active'] == 0
+
+
+def test_ready(tmp_model):
+    app = api.create_app('127.0.0.1', 5000, './tmp', preload='all', watch_interval=0)
+    with app.test_client() as client:
+        deadline = time.monotonic() + 30
+        response = client.get('/ready')
+        while response.status_code == 503 and time.monotonic() < deadline:
+            time.sleep(0.05)
+            response = client.get('/ready')
+        assert response.status_code == 200
+        # The probe needs no login, so it does not reveal the UUIDs of the models
+        assert response.get_json() == {'ready': True}
+        with patch('apis.api.auth_check', return_value=True):
+            with patch('apis.api.get_user_id', return_value=str(uuid.uuid4())):
+                stats = client.get('/model/cache').get_json()['model_registry']
+        assert stats['ready'] and stats['models'] >= 1 and stats['failed'] == 0
+        assert tmp_model not in json.dumps(stats)
+    with pytest.raises(ValueError):
+        api.create_app('127.0.0.1', 5000, './tmp', preload='some')
@@ -0,0 +1,86 @@
+import io
+import os
+import stat
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+from apis.model import read_postprocessing
+from classes.corpusCache import CorpusCache
+
+
+class TestCorpusCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = CorpusCache(directory=os.path.join(self.tmp_dir.name, 'corpora'))
+        self.dataset_path = os.path.join(self.tmp_dir.name, 'dataset.csv')
+        pd.DataFrame({'text': ['Running runners', 'The runner is running'], 'target': [1, 0]}).to_csv(
+            self.dataset_path, index=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_key_depends_on_content_and_columns(self):
+        key = self.cache.key(self.dataset_path, 'text', 'target')
+        with open(self.dataset_path, 'rb') as f:
+            stream = io.BytesIO(f.read())
+        self.assertEqual(key, self.cache.key(stream, 'text', 'target'))
+        self.assertEqual(stream.tell(), 0)
+        self.assertNotEqual(key, self.cache.key(self.dataset_path, 'text', 'label'))
+        self.assertNotEqual(key, self.cache.key(io.BytesIO(b'text,target\nother,1\n'), 'text', 'target'))
+
+    def test_store_and_load(self):
+        self.assertIsNone(self.cache.load('missing'))
+        data_x, data_y = pd.Series(['run runner']), pd.Series([1])
+        self.cache.store('key', data_x, data_y)
+        cached_x, cached_y = self.cache.load('key')
+        self.assertTrue(cached_x.equals(data_x))
+        self.assertTrue(cached_y.equals(data_y))
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_unreadable_entry_is_removed(self):
+        os.makedirs(self.cache.directory)
+        with open(os.path.join(self.cache.directory, 'key.pkl'), 'wb') as f:
+            f.write(b'not a pickle')
+        self.assertIsNone(self.cache.load('key'))
+        self.assertEqual(self.cache.stats()['datasets'], 0)
+
+    def test_directory_is_private(self):
+        self.cache.store('key', pd.Series(['run runner']), pd.Series([1]))
+        self.assertEqual(stat.S_IMODE(os.stat(self.cache.directory).st_mode), 0o700)
+
+    def test_shared_directory_is_not_used(self):
+        os.makedirs(self.cache.directory)
+        os.chmod(self.cache.directory, 0o777)
+        pd.to_pickle((pd.Series(['planted']), pd.Series([1])), os.path.join(self.cache.directory, 'key.pkl'))
+        self.assertIsNone(self.cache.load('key'))
+        self.cache.store('other', pd.Series(['run runner']), pd.Series([1]))
+        self.assertEqual(sorted(os.listdir(self.cache.directory)), ['key.pkl'])
+
+    def test_size_based_eviction(self):
+        data_x, data_y = pd.Series(['run runner'] * 100), pd.Series([1] * 100)
+        self.cache.store('first', data_x, data_y)
+        self.cache.max_bytes = self.cache.stats()['bytes'] * 2
+        os.utime(os.path.join(self.cache.directory, 'first.pkl'), (0, 0))
+        self.cache.store('second', data_x, data_y)
+        self.cache.store('third', data_x, data_y)
+        self.assertIsNone(self.cache.load('first'))
+        self.assertIsNotNone(self.cache.load('third'))
+        self.assertLessEqual(self.cache.stats()['bytes'], self.cache.max_bytes)
+
+    def test_read_postprocessing_uses_cache(self):
+        with patch('apis.model.corpus_cache', self.cache):
+            data_x, data_y = read_postprocessing(self.dataset_path, 'text', 'target')
+            with patch('apis.model.preprocess_texts') as preprocess:
+                cached_x, cached_y = read_postprocessing(self.dataset_path, 'text', 'target')
+                preprocess.assert_not_called()
+        self.assertEqual(list(cached_x), ['run runner', 'the runner is run'])
+        self.assertTrue(cached_x.equals(data_x))
+        self.assertTrue(cached_y.equals(data_y))
+
+
+if __name__ == '__main__':
+    unittest.main()
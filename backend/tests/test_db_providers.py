@@ -0,0 +1,284 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from classes.db_providers.sqlite_provider import SQLiteProvider, prefix_upper_bound
+from classes.db_providers.temp_provider import TempProvider
+from classes.sessionCache import session_cache
+
+
+def payload(sub, **claims):
+    return {'sub': sub, 'exp': 1700000000, **claims}
+
+
+class ProviderConformance:
+    """
+    The behaviour every database provider must share, run against each provider by the test cases below.
+    """
+
+    def make_provider(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.provider = self.make_provider()
+        self.provider.add_user('alice', 'token', payload('sub-alice', given_name='Alice'))
+        self.provider.add_user('bob', 'token', payload('sub-bob'))
+
+    def tearDown(self):
+        self.provider.close_connection()
+
+    def test_get_user(self):
+        user = self.provider.get_user_by_uuid('alice')
+        self.assertEqual(user['sub'], 'sub-alice')
+        self.assertEqual(user['token'], 'token')
+        self.assertEqual(user['auth_info']['given_name'], 'Alice')
+        self.assertEqual(self.provider.get_user_by_sub('sub-alice')['uuid'], 'alice')
+        self.assertIsNone(self.provider.get_user_by_uuid('nobody'))
+        self.assertIsNone(self.provider.get_user_by_sub('sub-nobody'))
+
+    def test_user_models(self):
+        self.provider.add_model('alice', 'model-1', 'first', False)
+        self.assertEqual(self.provider.get_user_by_uuid('alice')['models'],
+                         [{'name': 'first', 'uuid': 'model-1', 'shared': 0}])
+        self.assertEqual(self.provider.get_user_by_sub('sub-bob')['models'], [])
+
+    def test_update_user(self):
+        claims = payload('sub-alice', given_name='Alicia')
+        user = self.provider.update_user('new-token', claims)
+        self.assertEqual(user['token'], 'new-token')
+        self.assertEqual(user['auth_info']['given_name'], 'Alicia')
+        self.assertEqual(claims['sub'], 'sub-alice')
+        self.assertEqual(self.provider.get_user_by_uuid('alice')['token'], 'new-token')
+
+    def test_user_writes_invalidate_sessions(self):
+        session_cache.store('alice', 1)
+        session_cache.store('bob', 1)
+        self.provider.update_user('new-token', payload('sub-alice'))
+        self.provider.remove_user('bob')
+        self.assertIsNone(session_cache.get('alice'))
+        self.assertIsNone(session_cache.get('bob'))
+
+    def test_remove_user(self):
+        self.provider.remove_user('bob')
+        self.assertIsNone(self.provider.get_user_by_uuid('bob'))
+        self.assertIsNone(self.provider.get_user_by_sub('sub-bob'))
+        self.assertIsNotNone(self.provider.get_user_by_uuid('alice'))
+
+    def test_model_names(self):
+        self.provider.add_model('alice', 'model-1', 'first', False)
+        self.provider.add_model('alice', 'model-2', '', False)
+        self.provider.add_model('alice', 'model-3', 'not an identifier', False)
+        self.provider.add_model('alice', 'model-4', 'first', False)
+        self.provider.add_model('bob', 'model-5', 'first', False)
+        self.provider.add_model('alice', 'model-6', 'model-1', False)
+        names = {model['uuid']: model['name'] for model in self.provider.get_models('alice')}
+        self.assertEqual(names, {'model-1': 'first', 'model-2': 'model-2', 'model-3': 'model-3',
+                                 'model-4': 'model-4', 'model-6': 'model-6'})
+        self.assertEqual(self.provider.get_models('bob')[0]['name'], 'first')
+
+    def test_shared_model_names(self):
+        self.provider.add_model('alice', 'model-1', 'common', True)
+        self.provider.add_model('bob', 'model-2', 'common', True)
+        self.provider.add_model('bob', 'model-3', 'common', False)
+        self.assertEqual(self.provider.get_model_by_uuid('bob', 'model-2')['name'], 'model-2')
+        self.assertEqual(self.provider.get_model_by_uuid('bob', 'model-3')['name'], 'common')
+
+    def test_get_models(self):
+        self.provider.add_model('alice', 'model-1', 'zeta', False)
+        self.provider.add_model('alice', 'model-2', 'alpha', True)
+        self.provider.add_model('bob', 'model-3', 'beta', True)
+        self.provider.add_model('bob', 'model-4', 'gamma', False)
+        self.assertEqual([model['uuid'] for model in self.provider.get_models('alice')], ['model-2', 'model-1'])
+        self.assertEqual([model['uuid'] for model in self.provider.get_models('alice', True)],
+                         ['model-2', 'model-3', 'model-1'])
+        self.assertEqual(self.provider.get_models('alice', True)[0], {'name': 'alpha', 'uuid': 'model-2', 'shared': 1})
+        self.assertEqual(self.provider.get_models('nobody', True), self.provider.get_models('bob', True)[:2])
+
+    def test_get_models_pages(self):
+        for i in range(7):
+            self.provider.add_model('alice', f'model-{i}', f'name_{i % 3}', False)
+            self.provider.add_model('bob', f'shared-{i}', f'name_{i % 4}', True)
+        self.provider.add_model('alice', 'other', 'other', False)
+        models = self.provider.get_models('alice', True, prefix='name_')
+        # The private duplicates of alice's names are renamed to their UUIDs
+        self.assertEqual(len(models), 10)
+        self.assertEqual(models, sorted(models, key=lambda model: (model['name'], model['uuid'])))
+        pages, cursor = [], None
+        while True:
+            page = self.provider.get_models('alice', True, 4, cursor, 'name_')
+            pages.append(page)
+            if len(page) < 4:
+                break
+            cursor = (page[-1]['name'], page[-1]['uuid'])
+        self.assertEqual([len(page) for page in pages], [4, 4, 2])
+        self.assertEqual([model for page in pages for model in page], models)
+        self.assertEqual(self.provider.get_models('alice', True, 3, None, 'name_1'),
+                         [{'name': 'name_1', 'uuid': 'model-1', 'shared': 0},
+                          {'name': 'name_1', 'uuid': 'shared-1', 'shared': 1},
+                          {'name': 'name_1', 'uuid': 'shared-5', 'shared': 1}])
+        self.assertEqual(self.provider.get_models('alice', True, prefix='zzz'), [])
+        # The bound of a prefix ending before the surrogates skips them
+        self.assertEqual(self.provider.get_models('alice', True, prefix='name' + chr(0xD7FF)), [])
+
+    def test_get_models_pages_follow_edits(self):
+        for i in range(4):
+            self.provider.add_model('alice', f'model-{i}', f'name_{i}', False)
+        self.provider.add_model('bob', 'shared', 'name_9', True)
+        self.provider.edit_model('alice', 'model-0', 'name_5', True)
+        self.provider.edit_model('bob', 'shared', None, False)
+        self.provider.remove_model('alice', 'model-2')
+        self.assertEqual([model['uuid'] for model in self.provider.get_models('alice', True, 2, ('name_1', 'model-1'))],
+                         ['model-3', 'model-0'])
+        self.assertEqual([model['uuid'] for model in self.provider.get_models('bob', True)], ['model-0', 'shared'])
+
+    def test_get_model(self):
+        self.provider.add_model('alice', 'model-1', 'private', False)
+        self.provider.add_model('alice', 'model-2', 'public', True)
+        self.assertEqual(self.provider.get_model_by_uuid('alice', 'model-1'),
+                         {'name': 'private', 'uuid': 'model-1', 'shared': False})
+        self.assertEqual(self.provider.get_model_by_uuid('bob', 'model-2'),
+                         {'name': 'public', 'uuid': 'model-2', 'shared': True})
+        self.assertIsNone(self.provider.get_model_by_uuid('bob', 'model-1'))
+        self.assertIsNone(self.provider.get_model_by_uuid('alice', 'model-3'))
+        self.assertEqual(self.provider.get_model_by_name('alice', 'public')['uuid'], 'model-2')
+        self.assertIsNone(self.provider.get_model_by_name('bob', 'public'))
+        self.assertTrue(self.provider.model_is_shared('sub-alice', 'model-2'))
+        self.assertFalse(self.provider.model_is_shared('sub-alice', 'model-1'))
+
+    def test_edit_model(self):
+        self.provider.add_model('alice', 'model-1', 'first', False)
+        self.assertEqual(self.provider.edit_model('alice', 'model-1', 'renamed', True),
+                         {'name': 'renamed', 'uuid': 'model-1', 'shared': True})
+        self.assertEqual(self.provider.edit_model('alice', 'model-1', None, False),
+                         {'name': 'renamed', 'uuid': 'model-1', 'shared': False})
+        self.assertEqual(self.provider.edit_model('alice', 'model-1', 'again', None)['name'], 'again')
+        self.assertIsNone(self.provider.edit_model('alice', 'model-1', None, None))
+        self.assertEqual(self.provider.get_models('bob', True), [])
+        self.provider.edit_model('bob', 'model-1', 'stolen', True)
+        self.assertEqual(self.provider.get_model_by_uuid('alice', 'model-1')['name'], 'again')
+        self.assertEqual(self.provider.get_model_by_name('alice', 'again')['uuid'], 'model-1')
+        self.assertIsNone(self.provider.get_model_by_name('alice', 'renamed'))
+
+    def test_remove_model(self):
+        self.provider.add_model('alice', 'model-1', 'first', True)
+        self.provider.remove_model('bob', 'model-1')
+        self.assertIsNotNone(self.provider.get_model_by_uuid('alice', 'model-1'))
+        self.provider.remove_model('alice', 'model-1')
+        self.assertIsNone(self.provider.get_model_by_uuid('alice', 'model-1'))
+        self.assertEqual(self.provider.get_models('bob', True), [])
+        self.provider.add_model('alice', 'model-2', 'first', False)
+        self.assertEqual(self.provider.get_model_by_name('alice', 'first')['uuid'], 'model-2')
+
+    def test_jobs(self):
+        job = self.provider.add_job('job-1', 'alice', {'model': 'SVC'})
+        self.assertEqual(job['uuid'], 'job-1')
+        self.assertEqual(job['status'], 'queued')
+        self.assertEqual(job['params'], {'model': 'SVC'})
+        self.assertEqual(job['folds'], [])
+        self.assertIsNone(job['result'])
+        self.assertIsNone(job['error'])
+        self.assertEqual(set(job), {'uuid', 'status', 'params', 'folds', 'result', 'error', 'created', 'updated'})
+        time.sleep(0.01)
+        self.provider.add_job('job-2', 'alice', {})
+        self.provider.update_job('job-1', status='succeeded', folds=[{'fold': 1}], result={'accuracy': 1.0})
+        job = self.provider.get_job('alice', 'job-1')
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(job['folds'], [{'fold': 1}])
+        self.assertEqual(job['result'], {'accuracy': 1.0})
+        self.assertGreaterEqual(job['updated'], job['created'])
+        self.assertIsNone(self.provider.get_job('bob', 'job-1'))
+        self.assertEqual([job['uuid'] for job in self.provider.get_jobs('alice')], ['job-2', 'job-1'])
+        self.assertEqual(self.provider.get_jobs('bob'), [])
+
+    def test_returned_records_are_copies(self):
+        self.provider.add_job('job-1', 'alice', {'model': 'SVC'})
+        self.provider.get_job('alice', 'job-1')['params']['model'] = 'changed'
+        self.provider.get_user_by_uuid('alice')['auth_info']['given_name'] = 'changed'
+        self.assertEqual(self.provider.get_job('alice', 'job-1')['params'], {'model': 'SVC'})
+        self.assertEqual(self.provider.get_user_by_uuid('alice')['auth_info']['given_name'], 'Alice')
+
+    def test_finish_job(self):
+        self.provider.add_job('job-1', 'alice', {})
+        self.assertTrue(self.provider.finish_job('job-1', 'cancelled'))
+        self.assertFalse(self.provider.finish_job('job-1', 'succeeded', result={'accuracy': 1.0}))
+        job = self.provider.get_job('alice', 'job-1')
+        self.assertEqual(job['status'], 'cancelled')
+        self.assertIsNone(job['result'])
+        self.provider.add_job('job-2', 'alice', {})
+        self.provider.update_job('job-2', status='running')
+        self.assertTrue(self.provider.finish_job('job-2', 'failed', error='broken'))
+        self.assertEqual(self.provider.get_job('alice', 'job-2')['error'], 'broken')
+        self.assertFalse(self.provider.finish_job('missing', 'cancelled'))
+
+    def test_interrupt_jobs(self):
+        self.provider.add_job('job-1', 'alice', {})
+        self.provider.add_job('job-2', 'alice', {})
+        self.provider.add_job('job-3', 'bob', {})
+        self.provider.update_job('job-2', status='running')
+        self.provider.update_job('job-3', status='succeeded')
+        self.assertEqual(self.provider.interrupt_jobs('restart'), 2)
+        self.assertEqual(self.provider.get_job('alice', 'job-2')['status'], 'failed')
+        self.assertEqual(self.provider.get_job('alice', 'job-2')['error'], 'restart')
+        self.assertEqual(self.provider.get_job('bob', 'job-3')['status'], 'succeeded')
+        self.assertEqual(self.provider.interrupt_jobs('restart'), 0)
+
+    def test_interrupt_jobs_of_worker(self):
+        self.provider.add_job('job-1', 'alice', {}, worker=101)
+        self.provider.add_job('job-2', 'alice', {}, worker=102)
+        self.provider.add_job('job-3', 'alice', {})
+        self.assertEqual(self.provider.interrupt_jobs('worker exited', worker=101), 1)
+        self.assertEqual(self.provider.get_job('alice', 'job-1')['status'], 'failed')
+        self.assertEqual(self.provider.get_job('alice', 'job-2')['status'], 'queued')
+        self.assertEqual(self.provider.get_job('alice', 'job-3')['status'], 'queued')
+        self.assertNotIn('worker', self.provider.get_job('alice', 'job-1'))
+
+
+class TestSQLiteProvider(ProviderConformance, unittest.TestCase):
+    def make_provider(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        return SQLiteProvider(os.path.join(self.tmp_dir.name, 'sqlite.db'))
+
+    def test_prefix_upper_bound(self):
+        self.assertEqual(prefix_upper_bound('name_'), 'name`')
+        self.assertEqual(prefix_upper_bound('a' + chr(0xD7FF)), 'a' + chr(0xE000))
+        self.assertEqual(prefix_upper_bound('a' + chr(0x10FFFF)), 'b')
+        self.assertIsNone(prefix_upper_bound(chr(0x10FFFF)))
+
+
+class TestTempProvider(ProviderConformance, unittest.TestCase):
+    def make_provider(self):
+        return TempProvider()
+
+    def test_concurrent_writes(self):
+        def work(worker):
+            for i in range(200):
+                model_uuid = f'model-{worker}-{i}'
+                self.provider.add_model('alice', model_uuid, f'name_{worker}_{i}', i % 2 == 0)
+                self.provider.edit_model('alice', model_uuid, f'renamed_{worker}_{i}', None)
+                if i % 4 == 0:
+                    self.provider.remove_model('alice', model_uuid)
+                self.provider.get_models('bob', True, 10)
+
+        threads = [threading.Thread(target=work, args=(worker,)) for worker in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        models = self.provider.get_models('alice')
+        self.assertEqual(len(models), 8 * 150)
+        self.assertTrue(all(model['name'].startswith('renamed_') for model in models))
+        self.assertEqual(len(self.provider.get_models('bob', True)), 8 * 50)
+        self.assertEqual(sum(len(uuids) for uuids in self.provider.model_names.values()), 8 * 150)
+
+    def test_duplicate_model(self):
+        self.provider.add_model('alice', 'model-1', 'first', False)
+        with self.assertRaises(ValueError):
+            self.provider.add_model('bob', 'model-1', 'second', False)
+        self.assertEqual(self.provider.get_model_by_uuid('alice', 'model-1')['name'], 'first')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import base64
+import gc
+import json
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from matplotlib.figure import Figure
+import pandas as pd
+
+from classes.customPipeline import CustomPipeline
+from classes.explanationRenderer import ExplanationRenderer
+from classes.linearExplainer import LinearExplainer
+from classes.textPreprocessing import preprocess_texts
+
+# Number of renders of the soak test, raise it (for example to 5000) for a longer soak. The resident memory may grow by
+# a bounded amount while the allocator of every thread warms up, a leaked figure grows it by about 300 KB per render,
+# so the allowed growth is the warm-up plus a third of that per render, whatever the number of renders.
+soak_renders = int(os.environ.get('SOAK_RENDERS', 200))
+soak_warmup_bytes = 32 * 1024 * 1024
+soak_bytes_per_render = 100 * 1024
+
+
+def resident_bytes():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def live_figures():
+    gc.collect()
+    return sum(isinstance(o, Figure) for o in gc.get_objects())
+
+
+class TestExplanationRenderer(unittest.TestCase):
+    def setUp(self):
+        texts = ['Running runners ran fast', 'The runner is running', 'Nothing happened here',
+                 'Nothing is running', 'Fast runners run', 'Here nothing ran'] * 5
+        self.pipeline = CustomPipeline().create_pipeline('LogisticRegression', 'CountVectorizer')
+        CustomPipeline.without_normalizer(self.pipeline).fit(preprocess_texts(pd.Series(texts)),
+                                                             [1, 1, 0, 0, 1, 0] * 5)
+        self.texts = ['Runners running fast', 'Nothing happened here', 'The runner ran here']
+        self.explanation = LinearExplainer.explain(self.pipeline, self.texts[0])
+
+    def test_formats(self):
+        png = base64.b64decode(ExplanationRenderer.render(self.explanation, 'image'))
+        self.assertTrue(png.startswith(b'\x89PNG'))
+        self.assertIn('<svg', ExplanationRenderer.render(self.explanation, 'svg'))
+        self.assertIn('<html>', ExplanationRenderer.render(self.explanation, 'html'))
+        result = json.loads(ExplanationRenderer.render(self.explanation, 'json'))
+        self.assertEqual(result['class'], 1)
+        self.assertEqual([name for name, _ in result['weights']],
+                         [name for name, _ in self.explanation.as_list()])
+        self.assertAlmostEqual(sum(result['probabilities']), 1)
+
+    def test_invalid_format(self):
+        with self.assertRaises(ValueError):
+            ExplanationRenderer.render(self.explanation, 'invalid_format')
+
+    def test_concurrent_renders_match_sequential_renders(self):
+        explanations = [LinearExplainer.explain(self.pipeline, text) for text in self.texts] * 4
+        expected = [ExplanationRenderer.render(explanation, 'image') for explanation in explanations]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            rendered = list(executor.map(ExplanationRenderer.render, explanations))
+        self.assertEqual(rendered, expected)
+
+    def test_soak(self):
+        import matplotlib.pyplot as plt
+
+        def render(i):
+            return ExplanationRenderer.render(self.explanation, ('image', 'svg')[i % 2])
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            # The first renders fill the font and glyph caches
+            list(executor.map(render, range(100)))
+            figures = live_figures()
+            start = resident_bytes() if os.path.exists('/proc/self/statm') else None
+            for _ in executor.map(render, range(soak_renders)):
+                pass
+        self.assertEqual(plt.get_fignums(), [])
+        self.assertLessEqual(live_figures(), figures)
+        if start is not None:
+            self.assertLess(resident_bytes() - start, soak_warmup_bytes + soak_renders * soak_bytes_per_render)
+
+
+if __name__ == '__main__':
+    unittest.main()
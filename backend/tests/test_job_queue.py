@@ -0,0 +1,197 @@
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from classes.db_providers.sqlite_provider import SQLiteProvider
+from classes.jobQueue import JobQueue, interrupted_constant, lead_process_group, remove_temporary_files, watch_parent
+
+dataset_path = os.path.join(os.path.dirname(__file__), 'test_data', 'dataset.csv')
+train_params = {'model': 'LogisticRegression', 'test_size': 0.2, 'kfold': 2}
+
+
+def start_worker_process(pids):
+    # Stands for a job process which started a worker process to fit the folds
+    lead_process_group()
+    worker = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+    pids.put(worker.pid)
+    worker.wait()
+
+
+def is_running(pid):
+    try:
+        os.kill(pid, 0)
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except (ProcessLookupError, FileNotFoundError):
+        return False
+
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.provider = SQLiteProvider(db_file=os.path.join(self.tmp_dir.name, 'sqlite.db'))
+        self.model_path = os.path.join(self.tmp_dir.name, 'model.mdl')
+
+    def tearDown(self):
+        self.provider.close_connection()
+        self.tmp_dir.cleanup()
+
+    def copy_dataset(self):
+        path = os.path.join(self.tmp_dir.name, f'{time.time_ns()}.csv')
+        shutil.copy(dataset_path, path)
+        return path
+
+    def wait(self, job_uuid, timeout=120):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = self.provider.get_job('user', job_uuid)
+            if job['status'] in ('succeeded', 'failed', 'cancelled'):
+                return job
+            time.sleep(0.2)
+        self.fail(f'Job {job_uuid} did not finish')
+
+    def test_job_succeeds(self):
+        queue = JobQueue(self.provider, max_workers=1)
+        dataset = self.copy_dataset()
+        job = queue.submit('user', {'name': 'model'}, train_params, dataset, self.model_path,
+                           on_success=lambda result: {'link': 'link'})
+        self.assertEqual(job['status'], 'queued')
+        job = self.wait(job['uuid'])
+        self.assertEqual(job['status'], 'succeeded', job['error'])
+        self.assertEqual(len(job['folds']), 2)
+        self.assertEqual(job['result']['link'], 'link')
+        self.assertIn('accuracy', job['result'])
+        self.assertTrue(os.path.exists(self.model_path))
+        self.assertFalse(os.path.exists(dataset))
+
+    def test_job_fails(self):
+        queue = JobQueue(self.provider, max_workers=1)
+        job = queue.submit('user', {}, {**train_params, 'model': 'invalid_model'}, self.copy_dataset(),
+                           self.model_path)
+        job = self.wait(job['uuid'])
+        self.assertEqual(job['status'], 'failed')
+        self.assertIn('invalid_model', job['error'])
+
+    def test_cancel_jobs(self):
+        queue = JobQueue(self.provider, max_workers=1)
+        running = queue.submit('user', {}, {**train_params, 'kfold': 10}, self.copy_dataset(), self.model_path)
+        queued = queue.submit('user', {}, train_params, self.copy_dataset(), self.model_path)
+        queue.cancel(queued['uuid'])
+        while self.provider.get_job('user', running['uuid'])['status'] == 'queued':
+            time.sleep(0.1)
+        queue.cancel(running['uuid'])
+        self.assertEqual(self.wait(running['uuid'])['status'], 'cancelled')
+        self.assertEqual(self.wait(queued['uuid'])['status'], 'cancelled')
+        time.sleep(1)
+        self.assertEqual(self.provider.get_job('user', running['uuid'])['status'], 'cancelled')
+        self.assertFalse(os.path.exists(self.model_path))
+
+    def test_job_cancelled_while_finishing(self):
+        queue = JobQueue(self.provider, max_workers=1)
+        registered = []
+        job = queue.submit('user', {}, train_params, self.copy_dataset(), self.model_path,
+                           on_success=registered.append)
+        while self.provider.get_job('user', job['uuid'])['status'] == 'queued':
+            time.sleep(0.05)
+        # The cancellation is recorded after the queue checked it, just before the result is written
+        self.provider.finish_job(job['uuid'], 'cancelled')
+        deadline = time.time() + 60
+        while queue._running and time.time() < deadline:
+            time.sleep(0.1)
+        self.assertEqual(self.provider.get_job('user', job['uuid'])['status'], 'cancelled')
+        self.assertEqual(registered, [])
+        self.assertFalse(os.path.exists(self.model_path))
+
+    def test_shared_jobs(self):
+        self.provider.add_job('job', 'user', {})
+        queue = JobQueue(self.provider, max_workers=1, shared=True)
+        # The jobs of the other workers are left running
+        self.assertEqual(self.provider.get_job('user', 'job')['status'], 'queued')
+        running = queue.submit('user', {}, {**train_params, 'kfold': 10}, self.copy_dataset(), self.model_path)
+        while self.provider.get_job('user', running['uuid'])['status'] == 'queued':
+            time.sleep(0.1)
+        # Another worker cancels the job
+        self.provider.update_job(running['uuid'], status='cancelled')
+        deadline = time.time() + 10
+        while queue._running and time.time() < deadline:
+            time.sleep(0.1)
+        self.assertEqual(queue._running, {})
+        self.assertEqual(self.provider.get_job('user', running['uuid'])['status'], 'cancelled')
+        self.assertFalse(os.path.exists(self.model_path))
+        # The jobs of this worker can be failed once it exits
+        self.assertEqual(self.provider.interrupt_jobs('exited', worker=os.getpid()), 0)
+        queued = self.provider.add_job('other', 'user', {}, worker=os.getpid())
+        self.assertEqual(self.provider.interrupt_jobs('exited', worker=os.getpid()), 1)
+        self.assertEqual(self.provider.get_job('user', queued['uuid'])['status'], 'failed')
+
+    def test_shutdown(self):
+        queue = JobQueue(self.provider, max_workers=1)
+        running = queue.submit('user', {}, {**train_params, 'kfold': 10}, self.copy_dataset(), self.model_path)
+        queued_dataset = self.copy_dataset()
+        queued = queue.submit('user', {}, train_params, queued_dataset, self.model_path)
+        while self.provider.get_job('user', running['uuid'])['status'] == 'queued':
+            time.sleep(0.1)
+        process, _ = queue._running[running['uuid']]
+        queue.shutdown()
+        self.assertFalse(process.is_alive())
+        self.assertFalse(os.path.exists(queued_dataset))
+        self.provider = SQLiteProvider(db_file=os.path.join(self.tmp_dir.name, 'sqlite.db'))
+        for job in (running, queued):
+            job = self.provider.get_job('user', job['uuid'])
+            self.assertEqual(job['status'], 'failed')
+            self.assertEqual(job['error'], interrupted_constant)
+        time.sleep(0.5)
+        self.assertFalse(os.path.exists(self.model_path))
+
+    @unittest.skipUnless(hasattr(os, 'killpg') and os.path.exists('/proc'), 'Process groups of POSIX systems')
+    def test_terminated_job_process_terminates_its_workers(self):
+        context = multiprocessing.get_context('spawn')
+        pids = context.Queue()
+        job = context.Process(target=start_worker_process, args=(pids,))
+        job.start()
+        worker = pids.get(timeout=30)
+        self.assertTrue(is_running(worker))
+        job.terminate()
+        job.join(10)
+        deadline = time.time() + 10
+        while is_running(worker) and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(is_running(worker))
+
+    def test_temporary_model_files_are_removed(self):
+        model_dir = os.path.join(self.tmp_dir.name, 'models')
+        os.makedirs(model_dir)
+        for name in ('model.mdl', 'model.mdl.0123abcd.tmp', 'other.mdl.0123abcd.tmp'):
+            open(os.path.join(model_dir, name), 'w').close()
+        remove_temporary_files(os.path.join(model_dir, 'model.mdl'))
+        self.assertEqual(sorted(os.listdir(model_dir)), ['model.mdl', 'other.mdl.0123abcd.tmp'])
+
+    def test_job_process_exits_without_its_parent(self):
+        context = multiprocessing.get_context('spawn')
+        orphan = context.Process(target=watch_parent, args=(-1, 0.05))
+        orphan.start()
+        orphan.join(30)
+        self.assertEqual(orphan.exitcode, 1)
+        child = context.Process(target=watch_parent, args=(os.getpid(), 0.05))
+        child.start()
+        time.sleep(0.5)
+        self.assertTrue(child.is_alive())
+        child.terminate()
+        child.join()
+
+    def test_unfinished_jobs_are_interrupted_on_restart(self):
+        self.provider.add_job('job', 'user', {})
+        JobQueue(self.provider)
+        job = self.provider.get_job('user', 'job')
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['error'], interrupted_constant)
+        self.assertEqual([job['uuid'] for job in self.provider.get_jobs('user')], ['job'])
+
+
+if __name__ == '__main__':
+    unittest.main()
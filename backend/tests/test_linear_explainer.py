@@ -0,0 +1,70 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+
+from classes.customPipeline import CustomPipeline
+from classes.linearExplainer import LinearExplainer
+from classes.textPreprocessing import TextNormalizer, preprocess_texts
+
+
+class TestLinearExplainer(unittest.TestCase):
+    def setUp(self):
+        self.texts = ['Running runners ran fast', 'The runner is running', 'Nothing happened here',
+                      'Nothing is running', 'Fast runners run', 'Here nothing ran'] * 5
+        self.labels = [1, 1, 0, 0, 1, 0] * 5
+        self.text = 'Runners running RUNNERS and nothing here.'
+
+    def fit(self, model, vectorizer):
+        pipeline = CustomPipeline().create_pipeline(model, vectorizer)
+        CustomPipeline.without_normalizer(pipeline).fit(preprocess_texts(pd.Series(self.texts)), self.labels)
+        return pipeline
+
+    def test_contributions_sum_to_decision_value(self):
+        for model, vectorizer in [('LogisticRegression', 'TfidfVectorizer'), ('LinearSVM', 'CountVectorizer'),
+                                  ('SGDClassifier', 'HashingVectorizer'), ('SVC', 'CountVectorizer')]:
+            pipeline = self.fit(model, vectorizer)
+            self.assertTrue(LinearExplainer.supports(pipeline))
+            explanation = LinearExplainer.explain(pipeline, self.text, num_features=100)
+            weights = dict(explanation.as_list())
+            decision = pipeline.decision_function([self.text])[0]
+            self.assertAlmostEqual(explanation.intercept[1] + sum(weights.values()), decision)
+            self.assertAlmostEqual(explanation.local_pred[0], decision)
+            np.testing.assert_allclose(explanation.predict_proba, pipeline.predict_proba([self.text])[0])
+
+    def test_words_sharing_a_feature_share_its_contribution(self):
+        pipeline = self.fit('LogisticRegression', 'CountVectorizer')
+        weights = dict(LinearExplainer.explain(pipeline, self.text, num_features=100).as_list())
+        # 'Runners' and 'RUNNERS' are both stemmed to 'runner', and each occurs once
+        self.assertAlmostEqual(weights['Runners'], weights['RUNNERS'])
+        self.assertNotIn('and', weights)
+
+    def test_label_zero_is_the_opposite_of_label_one(self):
+        pipeline = self.fit('LogisticRegression', 'CountVectorizer')
+        one = LinearExplainer.explain(pipeline, self.text, label=1)
+        zero = LinearExplainer.explain(pipeline, self.text, label=0)
+        self.assertEqual([(word, -weight) for word, weight in one.as_list(label=1)], zero.as_list(label=0))
+
+    def test_num_features(self):
+        pipeline = self.fit('LogisticRegression', 'CountVectorizer')
+        explanation = LinearExplainer.explain(pipeline, self.text, num_features=2)
+        self.assertEqual(len(explanation.as_list()), 2)
+        self.assertIn('Runners', explanation.as_html())
+
+    def test_unsupported_pipelines(self):
+        self.assertFalse(LinearExplainer.supports(self.fit('SVR', 'CountVectorizer')))
+        rbf = Pipeline([('normalizer', TextNormalizer()), ('vectorizer', CountVectorizer()),
+                        ('model', CustomPipeline().get_model('SVC').set_params(kernel='rbf'))])
+        rbf.fit(self.texts, self.labels)
+        self.assertFalse(LinearExplainer.supports(rbf))
+        bigrams = Pipeline([('normalizer', TextNormalizer()), ('vectorizer', CountVectorizer(ngram_range=(1, 2))),
+                            ('model', LogisticRegression())])
+        bigrams.fit(self.texts, self.labels)
+        self.assertFalse(LinearExplainer.supports(bigrams))
+
+
+if __name__ == '__main__':
+    unittest.main()
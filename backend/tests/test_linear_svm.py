@@ -0,0 +1,52 @@
+import pickle
+import unittest
+
+import numpy as np
+from sklearn.datasets import make_classification
+
+from classes.linearSVM import LinearSVM
+
+
+class TestLinearSVM(unittest.TestCase):
+    def setUp(self):
+        self.x, self.y = make_classification(n_samples=400, n_features=20, random_state=0)
+
+    def test_fit_and_predict(self):
+        model = LinearSVM().fit(self.x, self.y)
+        self.assertEqual(list(model.classes_), [0, 1])
+        self.assertEqual(model.coef_.shape, (1, 20))
+        self.assertGreater((model.predict(self.x) == self.y).mean(), 0.8)
+
+    def test_predict_proba_is_calibrated(self):
+        model = LinearSVM().fit(self.x, self.y)
+        probabilities = model.predict_proba(self.x)
+        self.assertEqual(probabilities.shape, (400, 2))
+        np.testing.assert_allclose(probabilities.sum(axis=1), 1)
+        # The probability of the second class grows with the decision value
+        order = np.argsort(model.decision_function(self.x))
+        self.assertTrue(np.all(np.diff(probabilities[order, 1]) >= -1e-12))
+
+    def test_multiclass(self):
+        x, y = make_classification(n_samples=600, n_features=20, n_informative=6, n_classes=3, random_state=0)
+        probabilities = LinearSVM().fit(x, y).predict_proba(x)
+        self.assertEqual(probabilities.shape, (600, 3))
+        np.testing.assert_allclose(probabilities.sum(axis=1), 1)
+
+    def test_small_calibration_split(self):
+        model = LinearSVM(calibration_size=0.01).fit(self.x[:20], self.y[:20])
+        self.assertEqual(model.predict_proba(self.x).shape, (400, 2))
+
+    def test_invalid_calibration_size(self):
+        with self.assertRaises(ValueError):
+            LinearSVM(calibration_size=0).fit(self.x, self.y)
+        with self.assertRaises(ValueError):
+            LinearSVM(calibration_size=1).fit(self.x, self.y)
+
+    def test_pickle(self):
+        model = LinearSVM().fit(self.x, self.y)
+        restored = pickle.loads(pickle.dumps(model))
+        np.testing.assert_array_equal(restored.predict_proba(self.x), model.predict_proba(self.x))
+
+
+if __name__ == '__main__':
+    unittest.main()
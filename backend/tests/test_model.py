@@ -1,6 +1,17 @@
+import io
+import os
+import stat
+import tempfile
 import unittest
+from unittest.mock import patch
 
-from apis.model import App
+import joblib
+import pandas as pd
+from werkzeug.datastructures import FileStorage
+
+from apis.model import App, read_postprocessing
+from classes.textPreprocessing import preprocess_texts
+from classes.transformerCache import TransformerCache
 
 
 class TestModel(unittest.TestCase):
@@ -39,6 +50,115 @@ class TestModel(unittest.TestCase):
         model, _, _ = (self.app.train_model(dataset=self.dataset_path_constant, test_size=0.2))
         self.assertIsNotNone(model)
 
+    def test_train_model_parallel_preprocessing(self):
+        model, _, _ = self.app.train_model(dataset=self.dataset_path_constant, test_size=0.2, n_jobs=2,
+                                           chunk_size=1000)
+        self.assertIsNotNone(model)
+
+    def test_train_model_parallel_folds(self):
+        folds = []
+        model, accuracy, f1 = self.app.train_model(dataset=self.dataset_path_constant, test_size=0.2, kfold=3,
+                                                   model='LogisticRegression', kfold_jobs=2, on_fold=folds.append)
+        self.assertEqual([fold['fold'] for fold in folds], [0, 1, 2])
+        best = max(folds, key=lambda fold: (fold['f1'], fold['accuracy']))
+        self.assertEqual((accuracy, f1), (best['accuracy'], best['f1']))
+        self.assertTrue(all(fold['fit_time'] > 0 for fold in folds))
+        self.assertIsNotNone(model.predict(['This text was tested']))
+        # The folds fit with a single job each, the returned model keeps its own
+        self.assertEqual(model.get_params()['model__n_jobs'], -1)
+
+    def test_train_model_cache_transformers(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with patch('apis.model.transformer_cache', TransformerCache(tmp_dir)):
+                first, accuracy, f1 = self.app.train_model(dataset=self.dataset_path_constant, test_size=0.2,
+                                                           model='LogisticRegression', cache_transformers=True)
+                second, cached_accuracy, cached_f1 = self.app.train_model(
+                    dataset=self.dataset_path_constant, test_size=0.2, model='LogisticRegression',
+                    cache_transformers=True)
+        self.assertEqual((accuracy, f1), (cached_accuracy, cached_f1))
+        self.assertIsNone(second.memory)
+        self.assertEqual(list(first.predict(['This text was tested'])), list(second.predict(['This text was tested'])))
+
+    def test_transformer_cache_directory_is_private(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            directory = os.path.join(tmp_dir, 'transformers')
+            self.assertIsNotNone(TransformerCache(directory).memory)
+            self.assertEqual(stat.S_IMODE(os.stat(directory).st_mode), 0o700)
+            os.chmod(directory, 0o777)
+            with self.assertRaises(PermissionError):
+                TransformerCache(directory).memory
+
+    def test_train_model_linear_svm(self):
+        model, accuracy, f1 = self.app.train_model(dataset=self.dataset_path_constant, test_size=0.2,
+                                                   model='LinearSVM')
+        self.assertIsNotNone(accuracy)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model_path = os.path.join(tmp_dir, 'model.mdl')
+            joblib.dump(model, model_path)
+            self.assertIsNotNone(self.app.visualize(model_path, 'This text was tested', num_features=5))
+
+    def test_train_model_streaming(self):
+        folds = []
+        model, accuracy, f1 = self.app.train_model(dataset=self.dataset_path_constant, test_size=0.2, kfold=2,
+                                                   model='SGDClassifier', vectorizer='HashingVectorizer',
+                                                   streaming=True, chunk_size=100, on_fold=folds.append)
+        self.assertEqual([fold['fold'] for fold in folds], [0, 1])
+        best = max(folds, key=lambda fold: (fold['f1'], fold['accuracy']))
+        self.assertEqual((accuracy, f1), (best['accuracy'], best['f1']))
+        self.assertEqual(list(model.named_steps), ['normalizer', 'vectorizer', 'model'])
+        self.assertEqual(len(model.predict_proba(['This text was tested'])[0]), 2)
+
+    def test_train_model_streaming_upload(self):
+        with open(self.dataset_path_constant, 'rb') as f:
+            upload = FileStorage(stream=io.BytesIO(f.read()), filename='dataset.csv')
+        model, accuracy, f1 = self.app.train_model(dataset=upload, model='SGDClassifier',
+                                                   vectorizer='HashingVectorizer', streaming=True, chunk_size=100)
+        self.assertIsNone(accuracy)
+        self.assertIsNone(f1)
+        self.assertIsNotNone(model.predict(['This text was tested']))
+
+    def test_train_model_streaming_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            self.app.train_model(dataset=self.dataset_path_constant, model='SVC', vectorizer='HashingVectorizer',
+                                 streaming=True)
+        with self.assertRaises(ValueError):
+            self.app.train_model(dataset=self.dataset_path_constant, model='SGDClassifier',
+                                 vectorizer='TfidfVectorizer', streaming=True)
+        with self.assertRaises(ValueError):
+            self.app.train_model(dataset=self.dataset_path_constant, x='invalid_column', model='SGDClassifier',
+                                 vectorizer='HashingVectorizer', streaming=True)
+        with self.assertRaises(FileNotFoundError):
+            self.app.train_model(dataset=self.invalid_dataset_constant, model='SGDClassifier',
+                                 vectorizer='HashingVectorizer', streaming=True)
+
+    def test_read_postprocessing_in_chunks(self):
+        data = pd.read_csv(self.dataset_path_constant, na_values=[''])
+        data_x, data_y = read_postprocessing(self.dataset_path_constant, 'text', 'target', chunk_size=7, cache=False)
+        self.assertTrue(data_x.equals(preprocess_texts(data['text'])))
+        self.assertTrue(data_y.equals(data['target']))
+
+    def test_read_postprocessing_unseekable_upload(self):
+        class Unseekable(io.RawIOBase):
+            def __init__(self, content):
+                self.content = io.BytesIO(content)
+
+            def readable(self):
+                return True
+
+            def readinto(self, buffer):
+                return self.content.readinto(buffer)
+
+        with open(self.dataset_path_constant, 'rb') as f:
+            upload = FileStorage(stream=Unseekable(f.read()), filename='dataset.csv')
+        data_x, data_y = read_postprocessing(upload, 'text', 'target', chunk_size=7, cache=False)
+        expected_x, expected_y = read_postprocessing(self.dataset_path_constant, 'text', 'target', cache=False)
+        self.assertTrue(data_x.equals(expected_x))
+        self.assertTrue(data_y.equals(expected_y))
+
+    def test_read_postprocessing_missing_columns(self):
+        with self.assertRaisesRegex(ValueError, 'invalid_x, invalid_y'):
+            read_postprocessing(self.dataset_path_constant, 'invalid_x', 'invalid_y', cache=False)
+
     def test_predict(self):
         prediction = str(self.app.predict(self.model_path_constant, 'This text was tested by svc'))
         self.assertIsNotNone(prediction)
@@ -51,11 +171,53 @@ class TestModel(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.app.predict(self.model_path_constant, '')
 
+    def test_predict_batch(self):
+        texts = ['This text was tested by svc', 'Another text', 'And the last one']
+        chunks = list(self.app.predict_batch(self.model_path_constant, iter(texts), chunk_size=2))
+        self.assertEqual([len(chunk_texts) for chunk_texts, _ in chunks], [2, 1])
+        self.assertEqual(sum(len(predictions) for _, predictions in chunks), len(texts))
+
+    def test_predict_batch_invalid_parameters(self):
+        with self.assertRaises(FileNotFoundError):
+            self.app.predict_batch(self.invalid_model_constant, ['This text for invalid model'])
+        with self.assertRaises(ValueError):
+            self.app.predict_batch(self.model_path_constant, ['This text'], chunk_size=0)
+
+    def test_predict_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            serial_path = os.path.join(tmp_dir, 'serial.csv')
+            parallel_path = os.path.join(tmp_dir, 'parallel.csv')
+            rows = self.app.predict_file(self.model_path_constant, self.dataset_path_constant, serial_path,
+                                         chunk_size=1000)
+            self.app.predict_file(self.model_path_constant, self.dataset_path_constant, parallel_path,
+                                  chunk_size=500, n_jobs=2)
+            serial, parallel = pd.read_csv(serial_path), pd.read_csv(parallel_path)
+            self.assertEqual(rows, len(serial))
+            self.assertEqual(list(serial['index']), list(range(rows)))
+            self.assertIn('prediction', serial.columns)
+            self.assertTrue(serial.equals(parallel))
+
+    def test_predict_file_invalid_parameters(self):
+        with self.assertRaises(FileNotFoundError):
+            self.app.predict_file(self.invalid_model_constant, self.dataset_path_constant, 'predictions.csv')
+        with self.assertRaises(FileNotFoundError):
+            self.app.predict_file(self.model_path_constant, self.invalid_dataset_constant, 'predictions.csv')
+        with self.assertRaises(ValueError):
+            self.app.predict_file(self.model_path_constant, self.dataset_path_constant, 'predictions.csv',
+                                  x='invalid_column')
+
     def test_visualize(self):
         visualization = (self.app.visualize(self.model_path_constant, 'This text was written for visualization '
                                                                       'prediction'))
         self.assertIsNotNone(visualization)
 
+    def test_visualize_explainers(self):
+        for explainer in ('exact', 'lime'):
+            self.assertIsNotNone(self.app.visualize(self.model_path_constant, 'This text was tested', num_features=5,
+                                                    output_format='html', explainer=explainer))
+        with self.assertRaises(ValueError):
+            self.app.visualize(self.model_path_constant, 'This text was tested', explainer='invalid_explainer')
+
     def test_visualize_invalid_model(self):
         with self.assertRaises(FileNotFoundError):
             self.app.visualize(self.invalid_model_constant, 'This text for invalid model')
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import joblib
+
+from classes.modelCache import ModelCache
+
+
+class TestModelCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.model_path = self.save_model('first', [1, 2, 3])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def save_model(self, name, model):
+        path = os.path.join(self.tmp_dir.name, f'{name}.mdl')
+        joblib.dump(model, path)
+        return path
+
+    def test_hit_and_miss(self):
+        cache = ModelCache()
+        first = cache.get(self.model_path)
+        second = cache.get(self.model_path)
+        self.assertIs(first, second)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_reload_on_file_change(self):
+        cache = ModelCache()
+        cache.get(self.model_path)
+        joblib.dump([4, 5, 6, 7], self.model_path)
+        os.utime(self.model_path, ns=(0, os.stat(self.model_path).st_mtime_ns + 1))
+        self.assertEqual(cache.get(self.model_path), [4, 5, 6, 7])
+        self.assertEqual(cache.stats()['misses'], 2)
+
+    def test_invalidate(self):
+        cache = ModelCache()
+        cache.get(self.model_path)
+        cache.invalidate(self.model_path)
+        self.assertEqual(cache.stats()['models'], 0)
+        cache.get(self.model_path)
+        self.assertEqual(cache.stats()['misses'], 2)
+
+    def test_lru_eviction(self):
+        second_path = self.save_model('second', [1, 2, 3])
+        cache = ModelCache(max_bytes=os.path.getsize(self.model_path) + os.path.getsize(second_path))
+        cache.get(self.model_path)
+        cache.get(second_path)
+        cache.get(self.model_path)
+        cache.get(self.save_model('third', [1, 2, 3]))
+        stats = cache.stats()
+        self.assertEqual(stats['evictions'], 1)
+        self.assertLessEqual(stats['bytes'], stats['max_bytes'])
+        cache.get(self.model_path)
+        self.assertEqual(cache.stats()['hits'], 2)
+
+    def test_model_over_budget_is_not_cached(self):
+        cache = ModelCache(max_bytes=0)
+        self.assertEqual(cache.get(self.model_path), [1, 2, 3])
+        self.assertEqual(cache.stats()['models'], 0)
+
+    def test_missing_model(self):
+        with self.assertRaises(FileNotFoundError):
+            ModelCache().get(os.path.join(self.tmp_dir.name, 'missing.mdl'))
+
+    def test_load_locks_are_dropped(self):
+        cache = ModelCache()
+        for i in range(5):
+            cache.get(self.save_model(f'model-{i}', [i]))
+        corrupted_path = os.path.join(self.tmp_dir.name, 'corrupted.mdl')
+        with open(corrupted_path, 'wb') as file:
+            file.write(b'not a model')
+        with self.assertRaises(Exception):
+            cache.get(corrupted_path)
+        self.assertEqual(cache._load_locks, {})
+
+    def test_concurrent_load(self):
+        cache = ModelCache()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get(self.model_path))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.stats()['misses'], 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(cache._load_locks, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+
+import joblib
+
+from classes.modelCache import ModelCache
+from classes.modelRegistry import ModelRegistry, parse_preload, usage_file_name
+
+
+def save_usage_repeatedly(model_dir, model_uuid, times):
+    registry = ModelRegistry(ModelCache())
+    registry.start(model_dir, preload='none', interval=0)
+    for _ in range(times):
+        registry.cache.get(model_uuid)
+        registry.save_usage()
+
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = ModelCache()
+        self.registry = ModelRegistry(self.cache)
+
+    def tearDown(self):
+        self.registry.stop()
+        self.tmp_dir.cleanup()
+
+    def save_model(self, name, model, mtime=None):
+        path = os.path.join(self.tmp_dir.name, f'{name}.mdl')
+        joblib.dump(model, path)
+        if mtime is not None:
+            os.utime(path, ns=(mtime, mtime))
+        return path
+
+    def configure(self, preload='all'):
+        self.registry.start(self.tmp_dir.name, preload=preload, interval=0)
+        self.registry.stop()
+
+    def test_preload_all(self):
+        self.save_model('first', [1])
+        self.save_model('second', [2])
+        with open(os.path.join(self.tmp_dir.name, 'notes.txt'), 'w') as f:
+            f.write('not a model')
+        self.configure()
+        self.assertEqual(sorted(self.registry.preload()), ['first', 'second'])
+        status = self.registry.status()
+        self.assertTrue(status['ready'])
+        self.assertEqual(status['models'], ['first', 'second'])
+        self.assertEqual(self.cache.stats()['misses'], 0)
+        self.assertEqual(self.registry.stats(), {'ready': True, 'models': 2, 'failed': 0, 'watching': False})
+
+    def test_preload_most_used(self):
+        self.save_model('old', [1], mtime=1_000_000_000)
+        self.save_model('recent', [2], mtime=2_000_000_000)
+        self.save_model('used', [3], mtime=0)
+        with open(os.path.join(self.tmp_dir.name, usage_file_name), 'w') as f:
+            json.dump({'used': 5}, f)
+        self.configure(preload='2')
+        self.assertEqual(self.registry.preload(), ['used', 'recent'])
+
+    def test_preload_within_budget(self):
+        first = self.save_model('first', list(range(100)), mtime=2)
+        self.save_model('second', list(range(100)), mtime=1)
+        self.cache.resize(os.path.getsize(first) + 10)
+        self.configure()
+        self.assertEqual(self.registry.preload(), ['first'])
+        self.assertEqual(self.cache.stats()['evictions'], 0)
+
+    def test_poll(self):
+        first = self.save_model('first', [1])
+        second = self.save_model('second', [2])
+        self.configure()
+        self.registry.preload()
+        pipeline = self.cache.get(first)
+
+        self.save_model('third', [3])
+        joblib.dump([1, 1], first)
+        os.utime(first, ns=(0, os.stat(first).st_mtime_ns + 1))
+        os.remove(second)
+        changes = self.registry.poll()
+        self.assertEqual(changes, {'loaded': ['third'], 'reloaded': ['first'], 'removed': ['second']})
+        self.assertEqual(sorted(self.cache.models()), ['first', 'third'])
+        # The previous version stays usable by the requests holding it
+        self.assertEqual(pipeline, [1])
+        self.assertEqual(self.cache.get(first), [1, 1])
+        self.assertEqual(self.cache.stats()['misses'], 0)
+        self.assertEqual(self.registry.poll(), {'loaded': [], 'reloaded': [], 'removed': []})
+
+    def test_poll_without_preload(self):
+        first = self.save_model('first', [1])
+        self.configure(preload='none')
+        self.registry.poll()
+        self.save_model('second', [2])
+        self.assertEqual(self.registry.poll()['loaded'], [])
+        self.cache.get(first)
+        joblib.dump([1, 1], first)
+        os.utime(first, ns=(0, os.stat(first).st_mtime_ns + 1))
+        self.assertEqual(self.registry.poll()['reloaded'], ['first'])
+
+    def test_failed_model(self):
+        path = os.path.join(self.tmp_dir.name, 'broken.mdl')
+        with open(path, 'wb') as f:
+            f.write(b'not a pickle')
+        self.configure()
+        self.assertEqual(self.registry.preload(), [])
+        self.assertIn('broken', self.registry.status()['failed'])
+        self.assertTrue(self.registry.status()['ready'])
+        self.save_model('broken', [1])
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+        self.assertEqual(self.registry.poll()['loaded'], ['broken'])
+        self.assertEqual(self.registry.status()['failed'], {})
+
+    def test_usage_is_saved(self):
+        first = self.save_model('first', [1])
+        self.configure()
+        self.cache.get(first)
+        self.cache.get(first)
+        self.registry.save_usage()
+        with open(os.path.join(self.tmp_dir.name, usage_file_name)) as f:
+            self.assertEqual(json.load(f), {'first': 2})
+        # Restarting in the same process does not count the same requests twice
+        self.configure()
+        self.cache.get(first)
+        self.registry.save_usage()
+        with open(os.path.join(self.tmp_dir.name, usage_file_name)) as f:
+            self.assertEqual(json.load(f), {'first': 3})
+
+    def test_usage_of_several_workers(self):
+        first = self.save_model('first', [1])
+        other = ModelRegistry(ModelCache())
+        self.configure()
+        other.start(self.tmp_dir.name, preload='none', interval=0)
+        self.cache.get(first)
+        other.cache.get(first)
+        other.cache.get(first)
+        self.registry.save_usage()
+        other.save_usage()
+        with open(os.path.join(self.tmp_dir.name, usage_file_name)) as f:
+            self.assertEqual(json.load(f), {'first': 3})
+
+    def test_concurrent_usage_saves(self):
+        first = self.save_model('first', [1])
+        context = multiprocessing.get_context('spawn')
+        processes = [context.Process(target=save_usage_repeatedly, args=(self.tmp_dir.name, first, 25))
+                     for _ in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+            self.assertEqual(process.exitcode, 0)
+        with open(os.path.join(self.tmp_dir.name, usage_file_name)) as f:
+            self.assertEqual(json.load(f), {'first': 100})
+
+    def test_load(self):
+        self.save_model('first', [1])
+        self.save_model('second', [2])
+        self.assertEqual(sorted(self.registry.load(self.tmp_dir.name)), ['first', 'second'])
+        self.assertTrue(self.registry.status()['ready'])
+        self.assertFalse(self.registry.status()['watching'])
+        self.assertEqual(self.registry.load(self.tmp_dir.name, preload='none'), [])
+
+    def test_background_thread(self):
+        self.save_model('first', [1])
+        self.registry.start(self.tmp_dir.name, preload='all', interval=0.05)
+        deadline = time.monotonic() + 5
+        while not self.registry.status()['ready'] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.registry.status()['models'], ['first'])
+        self.assertTrue(self.registry.status()['watching'])
+        self.save_model('second', [2])
+        while 'second' not in self.cache.models() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertIn('second', self.cache.models())
+        self.registry.stop()
+        self.assertFalse(self.registry.status()['watching'])
+
+    def test_parse_preload(self):
+        self.assertIsNone(parse_preload('all'))
+        self.assertEqual(parse_preload('none'), 0)
+        self.assertEqual(parse_preload('3'), 3)
+        for value in ['some', '-1', '']:
+            with self.assertRaises(ValueError):
+                parse_preload(value)
+        with self.assertRaises(ValueError):
+            self.registry.start(self.tmp_dir.name, preload='all', interval=-1)
+
+
+if __name__ == '__main__':
+    unittest.main()
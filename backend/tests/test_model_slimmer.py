@@ -0,0 +1,99 @@
+import io
+import os
+import tempfile
+import unittest
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from classes.customPipeline import CustomPipeline
+from classes.linearExplainer import LinearExplainer
+from classes.modelSlimmer import ModelSlimmer
+from classes.modelStorage import ModelStorage
+
+dataset_path = os.path.join(os.path.dirname(__file__), 'test_data', 'dataset.csv')
+
+
+def train(model, vectorizer='TfidfVectorizer'):
+    dataset = pd.read_csv(dataset_path, encoding='latin-1').dropna()[:300]
+    pipeline = CustomPipeline(max_iter=1000).create_pipeline(model, vectorizer)
+    return pipeline.fit(dataset['text'], dataset['target'])
+
+
+def size(value):
+    buffer = io.BytesIO()
+    joblib.dump(value, buffer)
+    return len(buffer.getvalue())
+
+
+class TestModelSlimmer(unittest.TestCase):
+    texts = ['The senate passed the budget bill', 'Aliens built the pyramids, scientists say']
+
+    def test_slim(self):
+        for vectorizer in ['TfidfVectorizer', 'CountVectorizer']:
+            with self.subTest(vectorizer=vectorizer):
+                pipeline = train('LogisticRegression', vectorizer)
+                features = pipeline[1].get_feature_names_out()
+                probabilities = pipeline.predict_proba(self.texts)
+                before = size(pipeline)
+                ModelSlimmer.slim(pipeline)
+                self.assertFalse(hasattr(pipeline[1], 'stop_words_'))
+                self.assertIs(type(pipeline[1].vocabulary_), dict)
+                self.assertLess(size(pipeline), before / 2)
+                np.testing.assert_array_equal(pipeline[1].get_feature_names_out(), features)
+                np.testing.assert_array_equal(pipeline.predict_proba(self.texts), probabilities)
+
+    def test_slim_other_objects(self):
+        self.assertEqual(ModelSlimmer.slim([1, 2, 3]), [1, 2, 3])
+        pipeline = train('SGDClassifier', 'HashingVectorizer')
+        self.assertIs(ModelSlimmer.slim(pipeline), pipeline)
+
+    def test_slimmed_pipeline_is_explained(self):
+        pipeline = train('LogisticRegression', 'CountVectorizer')
+        text = self.texts[0]
+        expected = LinearExplainer.explain(pipeline, text).as_list(label=1)
+        self.assertEqual(LinearExplainer.explain(ModelSlimmer.slim(pipeline), text).as_list(label=1), expected)
+
+    def test_downcast(self):
+        for model in ['LogisticRegression', 'LinearSVM', 'SGDClassifier']:
+            with self.subTest(model=model):
+                pipeline = train(model, 'HashingVectorizer' if model == 'SGDClassifier' else 'TfidfVectorizer')
+                predictions = pipeline.predict(self.texts)
+                self.assertTrue(ModelSlimmer.downcast(pipeline, self.texts))
+                self.assertEqual(pipeline.named_steps['model'].coef_.dtype, np.float32)
+                np.testing.assert_array_equal(pipeline.predict(self.texts), predictions)
+
+    def test_downcast_keeps_shared_arrays(self):
+        pipeline = train('LinearSVM')
+        self.assertTrue(ModelSlimmer.downcast(pipeline, self.texts))
+        model = pipeline.named_steps['model']
+        self.assertIs(model.coef_, model.svc_.coef_)
+        self.assertEqual(pipeline[1]._tfidf.idf_.dtype, np.float32)
+
+    def test_downcast_is_reverted(self):
+        pipeline = train('SVC')
+        # libsvm only predicts from float64 support vectors
+        self.assertFalse(ModelSlimmer.downcast(pipeline, self.texts))
+        self.assertEqual(pipeline.named_steps['model'].support_vectors_.dtype, np.float64)
+        self.assertEqual(len(pipeline.predict(self.texts)), 2)
+
+        pipeline = train('LogisticRegression')
+        self.assertFalse(ModelSlimmer.downcast(pipeline, []))
+        self.assertFalse(ModelSlimmer.downcast(pipeline, self.texts, tolerance=-1))
+        self.assertEqual(pipeline.named_steps['model'].coef_.dtype, np.float64)
+
+    def test_saved_models_are_slimmed(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'model.mdl')
+            pipeline = train('LogisticRegression')
+            probabilities = pipeline.predict_proba(self.texts)
+            ModelStorage.save(pipeline, path)
+            loaded = ModelStorage.load(path)
+            self.assertFalse(hasattr(loaded[1], 'stop_words_'))
+            self.assertIs(type(loaded[1].vocabulary_), dict)
+            np.testing.assert_array_equal(loaded.predict_proba(self.texts), probabilities)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from classes.customPipeline import CustomPipeline
+from classes.modelStorage import ModelStorage
+
+dataset_path = os.path.join(os.path.dirname(__file__), 'test_data', 'dataset.csv')
+model_path = os.path.join(os.path.dirname(__file__), 'test_data', 'model.mdl')
+
+
+def train(model, vectorizer='TfidfVectorizer'):
+    dataset = pd.read_csv(dataset_path, encoding='latin-1').dropna()[:300]
+    pipeline = CustomPipeline(max_iter=1000).create_pipeline(model, vectorizer)
+    return pipeline.fit(dataset['text'], dataset['target'])
+
+
+def memmaps(value, seen=None):
+    """
+    Counts the memory-mapped arrays reachable from the attributes of an object.
+    """
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, np.memmap):
+        return 1
+    if isinstance(value, (list, tuple)):
+        return sum(memmaps(item, seen) for item in value)
+    if isinstance(value, dict):
+        return sum(memmaps(item, seen) for item in value.values())
+    if hasattr(value, '__dict__'):
+        return memmaps(vars(value), seen)
+    return 0
+
+
+class TestModelStorage(unittest.TestCase):
+    texts = ['The senate passed the budget bill', 'Aliens built the pyramids, scientists say']
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'model.mdl')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_arrays_are_memory_mapped(self):
+        for model, vectorizer in [('SVC', 'TfidfVectorizer'), ('LogisticRegression', 'CountVectorizer'),
+                                  ('LinearSVM', 'TfidfVectorizer'), ('SGDClassifier', 'HashingVectorizer')]:
+            with self.subTest(model=model):
+                pipeline = train(model, vectorizer)
+                ModelStorage.save(pipeline, self.path)
+                loaded = ModelStorage.load(self.path)
+                self.assertGreater(memmaps(loaded), 0)
+                np.testing.assert_array_equal(loaded.predict(self.texts), pipeline.predict(self.texts))
+                np.testing.assert_allclose(loaded.predict_proba(self.texts), pipeline.predict_proba(self.texts))
+
+    def test_load_without_mmap(self):
+        ModelStorage.save(train('LogisticRegression'), self.path)
+        self.assertEqual(memmaps(ModelStorage.load(self.path, mmap=False)), 0)
+
+    def test_no_mmap_mode(self):
+        # As on Windows, where a mapped file could not be deleted or replaced
+        ModelStorage.save(train('LogisticRegression'), self.path)
+        mmap_mode = ModelStorage.mmap_mode
+        ModelStorage.mmap_mode = None
+        try:
+            loaded = ModelStorage.load(self.path)
+        finally:
+            ModelStorage.mmap_mode = mmap_mode
+        self.assertEqual(memmaps(loaded), 0)
+        os.remove(self.path)
+        self.assertEqual(len(loaded.predict(self.texts)), 2)
+
+    def test_existing_models_load(self):
+        pipeline = ModelStorage.load(model_path)
+        self.assertEqual(len(pipeline.predict(self.texts)), 2)
+        with open(model_path, 'rb') as f:
+            self.assertEqual(len(ModelStorage.load(f).predict(self.texts)), 2)
+
+    def test_compressed_models_load_in_memory(self):
+        pipeline = train('LogisticRegression')
+        joblib.dump(pipeline, self.path, compress=3)
+        self.assertFalse(ModelStorage.is_mappable(self.path))
+        loaded = ModelStorage.load(self.path)
+        self.assertEqual(memmaps(loaded), 0)
+        np.testing.assert_array_equal(loaded.predict(self.texts), pipeline.predict(self.texts))
+
+    def test_compressed_save(self):
+        pipeline = train('LogisticRegression')
+        ModelStorage.save(pipeline, self.path, compress=3)
+        self.assertFalse(ModelStorage.is_mappable(self.path))
+        np.testing.assert_array_equal(ModelStorage.load(self.path).predict(self.texts), pipeline.predict(self.texts))
+
+    def test_replacing_a_mapped_model(self):
+        first = train('LogisticRegression')
+        ModelStorage.save(first, self.path)
+        mapped = ModelStorage.load(self.path)
+        ModelStorage.save(train('SVC'), self.path)
+        # The mapped arrays still read the replaced file
+        np.testing.assert_allclose(mapped.predict_proba(self.texts), first.predict_proba(self.texts))
+        self.assertEqual(ModelStorage.load(self.path).named_steps['model'].__class__.__name__, 'SVC')
+        self.assertEqual(os.listdir(self.tmp_dir.name), ['model.mdl'])
+
+    def test_failed_save_keeps_the_model(self):
+        ModelStorage.save([1, 2, 3], self.path)
+        with self.assertRaises(Exception):
+            ModelStorage.save(lambda: None, self.path)
+        self.assertEqual(ModelStorage.load(self.path), [1, 2, 3])
+        self.assertEqual(os.listdir(self.tmp_dir.name), ['model.mdl'])
+
+
+if __name__ == '__main__':
+    unittest.main()
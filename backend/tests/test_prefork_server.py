@@ -0,0 +1,117 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+
+from classes.preforkServer import PreforkServer
+
+
+def app_factory():
+    def app(environ, start_response):
+        if environ['PATH_INFO'] == '/exit':
+            os._exit(3)
+        if environ['PATH_INFO'] == '/slow':
+            time.sleep(1)
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [str(os.getpid()).encode()]
+    return app
+
+
+def broken_factory():
+    raise RuntimeError('broken application')
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('Condition not met in time')
+        time.sleep(0.01)
+
+
+class TestPreforkServer(unittest.TestCase):
+    def start(self, factory=app_factory, workers=2, on_stop=None):
+        self.exited = []
+        server = PreforkServer(factory, '127.0.0.1', 0, workers, restart_delay=0.05, shutdown_timeout=5,
+                               on_stop=on_stop, on_exit=self.exited.append)
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        wait_for(lambda: len(server.pids()) == workers)
+        self.addCleanup(self.stop, server, thread)
+        return server, thread
+
+    @staticmethod
+    def stop(server, thread):
+        server.stop()
+        thread.join(10)
+
+    @staticmethod
+    def get(server, path='/'):
+        with urllib.request.urlopen(f'http://127.0.0.1:{server.port}{path}', timeout=5) as response:
+            return int(response.read())
+
+    def test_workers_share_the_socket(self):
+        server, _ = self.start()
+        self.assertNotEqual(server.port, 0)
+        self.assertNotIn(os.getpid(), server.pids())
+        for _ in range(10):
+            self.assertIn(self.get(server), server.pids())
+
+    def test_exited_worker_is_restarted(self):
+        server, _ = self.start()
+        pids = server.pids()
+        with self.assertRaises((urllib.error.URLError, ConnectionError)):
+            self.get(server, '/exit')
+        wait_for(lambda: server.restarts == 1 and len(server.pids()) == 2)
+        self.assertEqual(len(set(server.pids()) & set(pids)), 1)
+        self.assertEqual(self.exited, list(set(pids) - set(server.pids())))
+        self.assertIn(self.get(server), server.pids())
+
+    def test_failing_workers_are_restarted_with_backoff(self):
+        server, _ = self.start(broken_factory, workers=1)
+        wait_for(lambda: server.restarts >= 2)
+        self.assertGreaterEqual(server._failures, 2)
+
+    def test_stop(self):
+        server, thread = self.start()
+        pids = server.pids()
+        self.stop(server, thread)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(server.pids(), [])
+        self.assertEqual(sorted(self.exited), sorted(pids))
+        for pid in pids:
+            with self.assertRaises(ProcessLookupError):
+                os.kill(pid, 0)
+
+    def test_stop_completes_requests_in_progress(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        stopped = os.path.join(tmp_dir.name, 'stopped')
+
+        def on_stop(app):
+            # Runs in the worker process
+            with open(stopped, 'a') as f:
+                f.write(f'{os.getpid()}\n')
+
+        server, thread = self.start(workers=1, on_stop=on_stop)
+        pids = server.pids()
+        responses = []
+        request = threading.Thread(target=lambda: responses.append(self.get(server, '/slow')))
+        request.start()
+        time.sleep(0.3)
+        self.stop(server, thread)
+        request.join(5)
+        self.assertEqual(responses, pids)
+        with open(stopped) as f:
+            self.assertEqual([int(line) for line in f], pids)
+
+    def test_invalid_workers(self):
+        with self.assertRaises(ValueError):
+            PreforkServer(app_factory, '127.0.0.1', 0, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+from unittest.mock import patch
+
+from classes.sessionCache import SessionCache
+
+
+class TestSessionCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = SessionCache(ttl=60, max_sessions=2)
+
+    def test_store_and_get(self):
+        self.assertIsNone(self.cache.get('user'))
+        self.cache.store('user', 1000)
+        self.assertEqual(self.cache.get('user'), 1000)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_sessions_expire_after_ttl(self):
+        with patch('classes.sessionCache.time.monotonic', return_value=100.0):
+            self.cache.store('user', 1000)
+        with patch('classes.sessionCache.time.monotonic', return_value=159.0):
+            self.assertEqual(self.cache.get('user'), 1000)
+        with patch('classes.sessionCache.time.monotonic', return_value=161.0):
+            self.assertIsNone(self.cache.get('user'))
+        self.assertEqual(self.cache.stats()['sessions'], 0)
+
+    def test_invalidate(self):
+        self.cache.store('user', 1000)
+        self.cache.invalidate('user')
+        self.cache.invalidate('unknown')
+        self.assertIsNone(self.cache.get('user'))
+
+    def test_cache_is_bounded(self):
+        self.cache.store('first', 1)
+        self.cache.store('second', 2)
+        self.cache.get('first')
+        self.cache.store('third', 3)
+        self.assertIsNone(self.cache.get('second'))
+        self.assertEqual(self.cache.get('first'), 1)
+        self.assertEqual(self.cache.get('third'), 3)
+
+    def test_zero_ttl_disables_caching(self):
+        self.cache.configure(ttl=0)
+        self.cache.store('user', 1000)
+        self.assertIsNone(self.cache.get('user'))
+
+
+if __name__ == '__main__':
+    unittest.main()
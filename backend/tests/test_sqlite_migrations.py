@@ -0,0 +1,123 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from classes.db_providers import sqlite_migrations
+from classes.db_providers.sqlite_migrations import get_version, migrate, schema_version
+from classes.db_providers.sqlite_provider import SQLiteProvider
+
+legacy_schema = [
+    'CREATE TABLE users (sub TEXT PRIMARY KEY, uuid TEXT, token TEXT, auth_info TEXT)',
+    'CREATE TABLE models (name TEXT, uuid TEXT PRIMARY KEY, shared BOOLEAN, user_uuid TEXT, '
+    'FOREIGN KEY(user_uuid) REFERENCES users(uuid))',
+]
+
+
+def query_plan(conn, sql, params):
+    return ' '.join(row[-1] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params))
+
+
+class TestSQLiteMigrations(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.tmp_dir.name, 'sqlite.db')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def create_legacy_db(self):
+        conn = sqlite3.connect(self.db_file)
+        for statement in legacy_schema:
+            conn.execute(statement)
+        conn.execute("INSERT INTO users VALUES ('sub', 'user', 'token', '{}')")
+        conn.execute("INSERT INTO models VALUES ('name', 'model', 1, 'user')")
+        conn.commit()
+        conn.close()
+
+    def test_new_database_is_at_latest_version(self):
+        provider = SQLiteProvider(self.db_file)
+        conn = provider.get_conn()
+        self.assertEqual(get_version(conn), schema_version)
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.assertTrue({'users', 'models', 'jobs'} <= tables)
+        provider.close_connection()
+
+    def test_legacy_database_is_migrated_in_place(self):
+        self.create_legacy_db()
+        provider = SQLiteProvider(self.db_file)
+        conn = provider.get_conn()
+        self.assertEqual(get_version(conn), schema_version)
+        self.assertEqual(provider.get_user_by_uuid('user')['sub'], 'sub')
+        self.assertEqual(provider.get_models('user'), [{'name': 'name', 'uuid': 'model', 'shared': 1}])
+        provider.add_job('job', 'user', {})
+        self.assertEqual(provider.get_jobs('user')[0]['uuid'], 'job')
+        provider.close_connection()
+
+    def test_lookups_use_indexes(self):
+        provider = SQLiteProvider(self.db_file)
+        conn = provider.get_conn()
+        plans = [
+            query_plan(conn, 'SELECT * FROM users WHERE uuid = ?', ('user',)),
+            query_plan(conn, 'SELECT * FROM models WHERE user_uuid = ?', ('user',)),
+            query_plan(conn, 'SELECT * FROM models WHERE name = ? AND user_uuid = ?', ('name', 'user')),
+            query_plan(conn, 'SELECT * FROM jobs WHERE user_uuid = ? ORDER BY created DESC', ('user',)),
+        ]
+        for plan in plans:
+            self.assertIn('USING', plan)
+            self.assertNotIn('SCAN users', plan)
+            self.assertNotIn('SCAN models', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+        provider.close_connection()
+
+    def test_catalog_pages_use_indexes(self):
+        provider = SQLiteProvider(self.db_file)
+        conn = provider.get_conn()
+        statements = []
+        conn.set_trace_callback(statements.append)
+        provider.get_models('user', True, 10, ('name', 'model'), 'na')
+        conn.set_trace_callback(None)
+        plan = query_plan(conn, statements[-1], ())
+        self.assertIn('models_user_uuid_catalog', plan)
+        self.assertIn('models_shared_catalog', plan)
+        self.assertNotIn('SCAN models', plan)
+        provider.close_connection()
+
+    def test_connections_use_wal(self):
+        provider = SQLiteProvider(self.db_file)
+        conn = provider.get_conn()
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        self.assertEqual(conn.execute('PRAGMA synchronous').fetchone()[0], 1)
+        provider.close_connection()
+
+    def test_migrations_are_applied_once(self):
+        conn = sqlite3.connect(self.db_file)
+        self.assertEqual(migrate(conn), schema_version)
+        self.assertEqual(migrate(conn), schema_version)
+        conn.close()
+
+    def test_failed_migration_is_rolled_back(self):
+        self.create_legacy_db()
+        failing = [(schema_version + 1, 'Failing migration', ['CREATE INDEX broken ON models(missing)'])]
+        conn = sqlite3.connect(self.db_file)
+        original = sqlite_migrations.migrations
+        sqlite_migrations.migrations = original + failing
+        try:
+            with self.assertRaises(sqlite3.OperationalError):
+                migrate(conn)
+        finally:
+            sqlite_migrations.migrations = original
+        self.assertEqual(get_version(conn), schema_version)
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertNotIn('broken', indexes)
+        conn.close()
+
+    def test_newer_database_is_left_untouched(self):
+        conn = sqlite3.connect(self.db_file)
+        conn.execute(f'PRAGMA user_version = {schema_version + 1}')
+        self.assertEqual(migrate(conn), schema_version + 1)
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from classes.db_providers.sqlite_pool import ConnectionPool
+from classes.db_providers.sqlite_provider import SQLiteProvider
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.tmp_dir.name, 'sqlite.db')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_connections_are_reused(self):
+        pool = ConnectionPool(self.db_file, max_connections=2)
+        conn = pool.acquire()
+        pool.release(conn)
+        self.assertIs(pool.acquire(), conn)
+        self.assertEqual(pool.stats()['connections'], 1)
+        self.assertEqual(pool.stats()['active'], 1)
+        pool.close()
+
+    def test_checkout_waits_for_a_free_connection(self):
+        pool = ConnectionPool(self.db_file, max_connections=2)
+        first, second = pool.acquire(), pool.acquire()
+        threading.Timer(0.2, pool.release, args=(first,)).start()
+        self.assertIs(pool.acquire(), first)
+        stats = pool.stats()
+        self.assertEqual(stats['connections'], 2)
+        self.assertEqual(stats['waits'], 1)
+        self.assertGreater(stats['max_wait_time'], 0.1)
+        pool.release(first)
+        pool.release(second)
+        self.assertEqual(pool.stats()['idle'], 2)
+        pool.close()
+        self.assertEqual(pool.stats()['connections'], 0)
+
+    def test_checkout_times_out(self):
+        pool = ConnectionPool(self.db_file, max_connections=1, timeout=0.1)
+        conn = pool.acquire()
+        with self.assertRaises(TimeoutError):
+            pool.acquire()
+        self.assertEqual(pool.stats()['timeouts'], 1)
+        pool.release(conn)
+        pool.close()
+
+    def test_release_rolls_back(self):
+        pool = ConnectionPool(self.db_file, max_connections=1)
+        conn = pool.acquire()
+        conn.execute('CREATE TABLE items (id INTEGER)')
+        conn.execute('INSERT INTO items VALUES (1)')
+        self.assertTrue(conn.in_transaction)
+        pool.release(conn)
+        conn = pool.acquire()
+        self.assertFalse(conn.in_transaction)
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM items').fetchone()[0], 0)
+        pool.release(conn)
+        pool.close()
+
+
+class TestPooledProvider(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.provider = SQLiteProvider(os.path.join(self.tmp_dir.name, 'sqlite.db'), max_connections=4)
+
+    def tearDown(self):
+        self.provider.close()
+        self.tmp_dir.cleanup()
+
+    def test_connections_are_returned(self):
+        self.assertEqual(self.provider.stats()['active'], 0)
+        self.provider.add_model('user', 'model', 'name', False)
+        self.assertEqual(self.provider.stats()['active'], 1)
+        self.provider.close_connection()
+        self.assertEqual(self.provider.stats()['active'], 0)
+
+    def test_concurrent_writes(self):
+        errors = []
+
+        def work(worker):
+            try:
+                for i in range(50):
+                    self.provider.add_model(f'user-{worker}', f'model-{worker}-{i}', f'name_{i}', i % 2 == 0)
+                    self.provider.close_connection()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=work, args=(worker,)) for worker in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.provider.get_models('user-0', True)), 50 + 11 * 25)
+        self.assertLessEqual(self.provider.stats()['connections'], 4)
+
+    def test_write_is_retried_while_locked(self):
+        self.provider.pool.busy_timeout = 0.05
+        self.provider.pool.close()
+        blocker = sqlite3.connect(self.provider.db_file, isolation_level=None, check_same_thread=False)
+        blocker.execute('BEGIN EXCLUSIVE')
+        threading.Timer(0.3, blocker.execute, args=('COMMIT',)).start()
+        self.provider.add_model('user', 'model', 'name', False)
+        self.assertEqual(self.provider.get_model_by_uuid('user', 'model')['name'], 'name')
+        self.assertGreaterEqual(self.provider.stats()['retries'], 1)
+        self.provider.close_connection()
+        time.sleep(0.05)
+        blocker.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import re
+import unittest
+
+import pandas as pd
+from nltk.stem import PorterStemmer
+
+from classes.textPreprocessing import StemCache, TextNormalizer, preprocess_chunks, preprocess_texts, \
+    preprocess_text, punctuation_pattern
+
+
+class TestTextPreprocessing(unittest.TestCase):
+    def setUp(self):
+        self.texts = pd.Series(['Running runners RAN quickly', 'The runner is running!', 'Quickly, quickly'],
+                               index=[3, 1, 2])
+
+    def test_matches_word_by_word_stemming(self):
+        stemmer = PorterStemmer()
+        expected = self.texts.str.lower().apply(
+            lambda g: ' '.join([stemmer.stem(word) for word in re.sub(punctuation_pattern, '', g).split()]))
+        self.assertTrue(preprocess_texts(self.texts).equals(expected))
+
+    def test_parallel_matches_serial(self):
+        texts = pd.concat([self.texts] * 5)
+        self.assertTrue(preprocess_texts(texts, n_jobs=2, chunk_size=4).equals(preprocess_texts(texts)))
+
+    def test_preprocess_chunks(self):
+        chunks = [self.texts.iloc[:2], self.texts.iloc[2:]] * 3
+        expected = [preprocess_texts(chunk) for chunk in chunks]
+        for n_jobs in (1, 2):
+            for result, chunk in zip(preprocess_chunks(iter(chunks), n_jobs=n_jobs), expected):
+                self.assertTrue(result.equals(chunk))
+
+    def test_invalid_chunk_size(self):
+        with self.assertRaises(ValueError):
+            preprocess_texts(self.texts, chunk_size=0)
+
+    def test_preprocess_text(self):
+        self.assertEqual(preprocess_text('Running runners'), 'run runner')
+
+    def test_missing_text(self):
+        self.assertEqual(list(preprocess_texts(pd.Series(['Running', None]))), ['run', ''])
+
+    def test_text_normalizer(self):
+        normalizer = TextNormalizer().fit(self.texts)
+        self.assertEqual(normalizer.transform(self.texts), list(preprocess_texts(self.texts)))
+        self.assertEqual(normalizer.transform(['Running runners']), ['run runner'])
+
+    def test_stem_cache_stems_each_word_once(self):
+        cache = StemCache()
+        cache.lookup({'running', 'runners'})
+        table = cache.lookup({'running', 'quickly'})
+        self.assertEqual(table, {'running': 'run', 'quickly': 'quickli'})
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 3)
+
+    def test_stem_cache_is_bounded(self):
+        cache = StemCache(max_words=2)
+        cache.lookup(['running', 'runners', 'quickly'])
+        self.assertEqual(cache.stats()['words'], 2)
+        self.assertEqual(cache.stem('quickly'), 'quickli')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from apis.model import App
+from classes.visualizationCache import VisualizationCache
+
+
+class TestVisualizationCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.model_path = os.path.join(self.tmp_dir.name, 'model-uuid.mdl')
+        with open(self.model_path, 'wb') as f:
+            f.write(b'model')
+        self.disk_dir = os.path.join(self.tmp_dir.name, 'visualizations')
+        self.cache = VisualizationCache(directory=self.disk_dir)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_key_depends_on_model_text_and_options(self):
+        key = self.cache.key(self.model_path, 'text', features=40, output_format='image')
+        self.assertTrue(key.startswith('model-uuid-'))
+        self.assertEqual(key, self.cache.key(self.model_path, 'text', output_format='image', features=40))
+        self.assertNotEqual(key, self.cache.key(self.model_path, 'other text', features=40, output_format='image'))
+        self.assertNotEqual(key, self.cache.key(self.model_path, 'text', features=10, output_format='image'))
+        self.assertNotEqual(key, self.cache.key(self.model_path, 'text', features=40, output_format='html'))
+        stat = os.stat(self.model_path)
+        os.utime(self.model_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+        self.assertNotEqual(key, self.cache.key(self.model_path, 'text', features=40, output_format='image'))
+
+    def test_key_uses_the_normalized_text(self):
+        key = self.cache.key(self.model_path, 'Runners RUNNING  fast')
+        self.assertEqual(key, self.cache.key(self.model_path, 'runner running fast'))
+        self.assertNotEqual(key, self.cache.key(self.model_path, 'runners walking fast'))
+
+    def test_memory_and_disk_tiers(self):
+        key = self.cache.key(self.model_path, 'text')
+        self.assertIsNone(self.cache.get(key))
+        self.cache.store(key, 'visualization')
+        self.assertEqual(self.cache.get(key), 'visualization')
+        restarted = VisualizationCache(directory=self.disk_dir)
+        self.assertEqual(restarted.get(key), 'visualization')
+        self.assertEqual(restarted.get(key), 'visualization')
+        stats = restarted.stats()
+        self.assertEqual((stats['hits'], stats['disk_hits'], stats['misses']), (1, 1, 0))
+        self.assertEqual(stats['hit_rate'], 1.0)
+
+    def test_memory_tier_is_bounded(self):
+        cache = VisualizationCache(max_bytes=10)
+        cache.store('a', '123456')
+        cache.store('b', '123456')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), '123456')
+        self.assertEqual(cache.stats()['bytes'], 6)
+        # The budget is in bytes, not characters
+        cache.store('c', 'éééé')
+        self.assertEqual(cache.stats()['bytes'], 8)
+        self.assertIsNone(cache.get('b'))
+
+    def test_disk_tier_is_bounded(self):
+        cache = VisualizationCache(max_bytes=0, directory=self.disk_dir, max_disk_bytes=10)
+        cache.store('a', '123456')
+        time.sleep(0.01)
+        cache.store('b', '123456')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), '123456')
+        self.assertEqual(cache.stats()['disk_visualizations'], 1)
+        self.assertEqual(cache.stats()['disk_bytes'], 6)
+
+    def test_disk_tier_is_only_listed_over_budget(self):
+        cache = VisualizationCache(max_bytes=0, directory=self.disk_dir, max_disk_bytes=20)
+        cache.store('a', '123456')
+        time.sleep(0.01)
+        with patch.object(VisualizationCache, '_files', wraps=VisualizationCache._files) as files:
+            cache.store('b', '123456')
+            cache.store('c', '123456')
+            files.assert_not_called()
+            time.sleep(0.01)
+            cache.store('d', 'éé')
+            files.assert_called_once()
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['disk_bytes'], 16)
+
+    def test_invalidate(self):
+        key = self.cache.key(self.model_path, 'text')
+        other_path = os.path.join(self.tmp_dir.name, 'other-uuid.mdl')
+        with open(other_path, 'wb') as f:
+            f.write(b'model')
+        other_key = self.cache.key(other_path, 'text')
+        self.cache.store(key, 'visualization')
+        self.cache.store(other_key, 'other visualization')
+        self.cache.invalidate(self.model_path)
+        self.assertIsNone(self.cache.get(key))
+        self.assertEqual(self.cache.get(other_key), 'other visualization')
+        self.assertEqual(self.cache.stats()['disk_visualizations'], 1)
+
+    def test_visualize_uses_cache(self):
+        model_path = './backend/tests/test_data/model.mdl'
+        cache = VisualizationCache()
+        with patch('apis.model.visualization_cache', cache):
+            first = App.visualize(model_path, 'This text was tested', num_features=5, output_format='html')
+            with patch('apis.model.LinearExplainer.explain') as explain:
+                second = App.visualize(model_path, 'This text was tested', num_features=5, output_format='html')
+            explain.assert_not_called()
+            App.visualize(model_path, 'This text was tested', num_features=6, output_format='html')
+        self.assertEqual(first, second)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -55,7 +55,7 @@ export const tminginRequest = {
     predictModel: (queries: IPredictQuery) => axiosService.get(urls.predict, { params: queries, withCredentials: true  }),
     visualizeModel: (queries: IVisualizeQuery) => axiosService.get(urls.visualize, { params: queries, withCredentials: true  }),
     logout: () => axiosService.get(urls.logout, {withCredentials: true}),
-    getModelList: () => axiosService.get(urls.model_list, {withCredentials: true}),
+    getModelList: (queries?: { prefix?: string; limit?: number; cursor?: string }, signal?: AbortSignal) => axiosService.get(urls.model_list, { params: queries, withCredentials: true, signal }),
     getUserModels: () => axiosService.get(urls.user_models, {withCredentials: true}),
     editModel: (queries: { shared: boolean; new_model_name: string; model_uuid: string }, formData: FormData, csrfToken: string | null) => axiosService.put(urls.edit_model, formData, { params: queries, withCredentials: true, headers: getHeaders(csrfToken)}),
     csrfToken: () => axiosService.get(urls.csrf_token, {withCredentials: true}),
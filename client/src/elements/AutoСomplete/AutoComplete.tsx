@@ -1,24 +1,43 @@
 import { Autocomplete, TextField } from "@mui/material";
 import { Controller} from "react-hook-form";
-import { useEffect, useState, FC } from "react";
+import { useEffect, useRef, useState, FC } from "react";
+import axios from "axios";
 import {tminginRequest} from "../../api/requests/tminingRequests";
 import {IProps, ModelOption} from "../../interfaces/auto.complete.interface"
 
+const inputDelay = 300;
+
 const AutoComplete: FC<IProps> = ({name, label, control, error, helperText}) => {
     const [models, setModels] = useState<ModelOption[]>([]);
+    const request = useRef<AbortController | null>(null);
+    const timer = useRef<ReturnType<typeof setTimeout> | null>(null);
 
-    const requestModels = async () => {
-    tminginRequest.getModelList()
-        .then(response => {
-            setModels(response.data.models.map((model: any) => ({name: model.name, uuid: model.uuid, shared: model.shared})));
-        })
-        .catch(error => {
-            console.error(error);
-        });
-}
+    const requestModels = (prefix?: string) => {
+        // Only the response for the latest input may update the options
+        request.current?.abort();
+        const controller = new AbortController();
+        request.current = controller;
+        tminginRequest.getModelList(prefix ? {prefix} : undefined, controller.signal)
+            .then(response => {
+                if (request.current !== controller) return;
+                setModels(response.data.models.map((model: any) => ({name: model.name, uuid: model.uuid, shared: model.shared})));
+            })
+            .catch(error => {
+                if (!axios.isCancel(error)) console.error(error);
+            });
+    }
+
+    const requestModelsLater = (prefix: string) => {
+        if (timer.current) clearTimeout(timer.current);
+        timer.current = setTimeout(() => requestModels(prefix), inputDelay);
+    }
 
     useEffect(() => {
         requestModels()
+        return () => {
+            if (timer.current) clearTimeout(timer.current);
+            request.current?.abort();
+        }
     }, []);
 
     return (
@@ -44,7 +63,10 @@ const AutoComplete: FC<IProps> = ({name, label, control, error, helperText}) =>
                           <TextField error={Boolean(error)} helperText={error ? String(error.message) : helperText}  {...params} label={label} inputRef={ref}/>
                         )}
                         onChange={(_, data) => onChange(data?.uuid)}
-                        onOpen={requestModels}
+                        onOpen={() => requestModels()}
+                        onInputChange={(_, input, reason) => {
+                            if (reason === 'input') requestModelsLater(input);
+                        }}
                     />
                 )
             }}